@@ -1,48 +1,395 @@
-import streamlit as st
-import pandas as pd
 import hashlib
-import requests
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import streamlit as st
+from cache_resultados import CacheLRUBytes, huella_contenido, tamano_dataframe
+from checkpoints import CARPETA_CHECKPOINTS, CheckpointOcupado, borrar_checkpoint, ruta_checkpoint, usar_checkpoint
+from cola_trabajos import ColaLlena, ColaTrabajos
+from detector_columnas import TIPOS
+from indice_dedup import CARPETA_POR_DEFECTO, MODOS_DEDUP, CorridaDedup, IndiceDedup
+from instrumentacion import Medicion, etapa
+from licencias import validar_con_lemon_squeezy, validar_en_segundo_plano
+from motor_hash import CacheHash
+from motor_limpieza import (COL_IGNORAR, COMPRESIONES, EXTENSIONES_ENTRADA, FORMATOS_SALIDA,
+                            MAX_SALIDA_EN_MEMORIA, VARIANTES, combinar_salidas, descartar_corridas,
+                            detectar_columnas_archivo, empaquetar_salidas, extension, extraer_zip,
+                            hojas_excel, leer_vista_previa, nombre_salida, nuevo_archivo_salida, procesar_archivo,
+                            procesar_lote, ruta_libre)
 
 # --- CONFIGURACIÓN ---
 st.set_page_config(page_title="AdData Cleaner PRO", page_icon="💎", layout="centered")
 
-# --- CONFIGURACIÓN DE CLAVES ---
-# Tu clave maestra para entrar siempre sin validar en Lemon Squeezy
-MASTER_KEY = "ADMIN-2026" 
+# Filas que se leen de un CSV solo para la vista previa y el mapeo de columnas
+FILAS_PREVIEW = 100
+
+# Tipo MIME de cada formato de descarga
+MIME_SALIDA = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+MIME_COMPRESION = {"gzip": "application/gzip", "zstd": "application/zstd", "zip": "application/zip"}
+# Nombre base del archivo descargado
+NOMBRE_DESCARGA = "secure_data_processed"
+# Salidas CSV en curso, con checkpoints: sobreviven a que la sesion se corte
+CARPETA_REANUDABLES = os.path.join(CARPETA_CHECKPOINTS, "salidas")
+
+# Limites de cache (compartidas entre sesiones): archivos parseados y resultados
+MAX_BYTES_UPLOADS = 1024 * 1024 * 1024
+MAX_BYTES_RESULTADOS = 512 * 1024 * 1024
 
-def validar_con_lemon_squeezy(license_key):
+# RAM estimada de un trabajo: los bloques en proceso pesan unas veces el archivo,
+# con tope porque se procesa por bloques; mas la salida que vive en RAM
+FACTOR_MEMORIA = 4
+MAX_MEMORIA_BLOQUES = 512 * 1024 * 1024
+# Segundos entre actualizaciones de la barra de progreso de un trabajo
+INTERVALO_PROGRESO = 0.5
+
+def descarga_diferida(archivo):
+    """Callable para st.download_button: el archivo solo se lee al hacer click"""
+    def _abrir():
+        archivo.seek(0)
+        return archivo
+    return _abrir
+
+@st.cache_resource
+def cache_uploads():
+    """DataFrames ya parseados, por huella de contenido; sobrevive a los reruns"""
+    return CacheLRUBytes(MAX_BYTES_UPLOADS)
+
+@st.cache_resource
+def cache_resultados():
     """
-    Valida la clave contra la API oficial de Lemon Squeezy.
-    Retorna: (Es_Valida, Mensaje_o_Nombre)
+    Salidas ya procesadas, una cache por servidor para que el limite de bytes
+    sea global. Las claves llevan el id de sesion (ver id_sesion); al desalojar
+    no se cierra el archivo, que la sesion dueña puede estar descargando.
     """
-    # Si usas tu clave maestra, pase directo
-    if license_key == MASTER_KEY:
-        return True, "Administrador (Master Key)"
+    return CacheLRUBytes(MAX_BYTES_RESULTADOS, cerrar=False)
 
-    url = "https://api.lemonsqueezy.com/v1/licenses/activate"
-    
-    # Datos para la API
-    payload = {
-        "license_key": license_key,
-        "instance_name": "AdDataCleaner_Web_User"
-    }
-    
+def id_sesion():
+    """Identificador estable de la sesion de Streamlit, para separar sus resultados"""
+    return st.session_state.setdefault('id_sesion', uuid.uuid4().hex)
+
+@st.cache_resource
+def indice_dedup():
+    """Indice de deduplicacion en disco, uno por servidor (compartido entre sesiones)"""
+    return IndiceDedup(CARPETA_POR_DEFECTO)
+
+def opciones_dedup():
+    """Casilla de deduplicacion y modo; retorna None o "eliminar"/"marcar" """
+    if not st.checkbox(t["dedup"], value=False):
+        return None
+    return st.radio(t["dedup_modo"], MODOS_DEDUP, format_func=lambda m: t[f"dedup_{m}"], horizontal=True)
+
+def procesar_reanudable(uploaded_file, clave, compresion, **opciones):
+    """
+    Procesa a un archivo en disco con checkpoints por bloque: si la sesion se
+    corta, subir el mismo archivo con las mismas opciones sigue desde el ultimo
+    bloque. Retorna la salida terminada abierta; el archivo en disco se borra
+    (el archivo abierto sigue legible hasta cerrarse). Retorna None si otra
+    sesion esta procesando el mismo archivo con las mismas opciones.
+    """
+    os.makedirs(CARPETA_REANUDABLES, exist_ok=True)
+    nombre = hashlib.sha256(repr(clave).encode()).hexdigest()[:32]
+    ruta = os.path.join(CARPETA_REANUDABLES, nombre_salida(nombre, "csv", compresion))
+    checkpoint = ruta_checkpoint(ruta)
     try:
-        response = requests.post(url, data=payload)
-        data = response.json()
-        
-        # Verificar si la respuesta fue exitosa
-        if data.get("activated") is True:
-            # Clave válida y activa
-            meta = data.get("meta", {})
-            return True, f"Licencia Activa ({license_key})"
-        else:
-            # Clave inválida, expirada o ya usada al máximo
-            error_msg = data.get("error", "Clave no válida")
-            return False, error_msg
+        # Bloqueado hasta borrar la salida: otra sesion no puede retomarla ni truncarla a medias
+        with usar_checkpoint(checkpoint):
+            uploaded_file.seek(0)
+            try:
+                procesar_archivo(uploaded_file, ruta, compresion=compresion, checkpoint=checkpoint, **opciones)
+            except Exception:
+                # Cancelado o con error (no un corte del servidor): la corrida no se retoma ni se entrega
+                if opciones.get("dedup") is not None:
+                    opciones["dedup"].descartar()
+                borrar_checkpoint(checkpoint)
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+                raise
+            salida = open(ruta, "rb")
+            salida.seek(0, os.SEEK_END)
+            os.remove(ruta)
+            borrar_checkpoint(checkpoint)
+    except CheckpointOcupado:
+        return None
+    return salida
 
-    except Exception as e:
-        return False, f"Error de conexión: {str(e)}"
+@st.cache_resource
+def cola_trabajos():
+    """Cola de trabajos del servidor: todas las sesiones comparten los mismos workers"""
+    return ColaTrabajos()
+
+def memoria_estimada(bytes_entrada, procesos=1):
+    """RAM estimada para la admision en la cola (ver FACTOR_MEMORIA)"""
+    return min(bytes_entrada * FACTOR_MEMORIA, MAX_MEMORIA_BLOQUES) * procesos + MAX_SALIDA_EN_MEMORIA
+
+def copia_upload(uploaded_file):
+    """
+    Archivo subido propio para un trabajo: los reruns del script mueven la
+    posicion del UploadedFile (vista previa, deteccion) mientras el trabajo lo
+    lee en otro hilo. Comparte los bytes, no los copia.
+    """
+    copia = io.BytesIO(uploaded_file.getvalue())
+    copia.name = uploaded_file.name
+    copia.size = uploaded_file.size
+    return copia
+
+def cache_sesion():
+    """
+    Cache de hashes de la sesion (sirve entre bloques y entre archivos). CacheHash
+    no es thread-safe y cancelar es cooperativo: si el trabajo anterior sigue
+    corriendo se queda con su cache y el nuevo empieza con otra.
+    """
+    info = st.session_state.get('trabajo')
+    if info is not None and (anterior := cola_trabajos().obtener(info["id"])) is not None and anterior.activo:
+        st.session_state['cache_hash'] = CacheHash()
+    return st.session_state.setdefault('cache_hash', CacheHash())
+
+def trabajo_archivo(trabajo, uploaded_file, formato, compresion, reanudable, clave, **opciones):
+    """Trabajo de la cola para un archivo: reporta filas leidas (y fraccion del CSV leida)"""
+    total = uploaded_file.size or 1
+    es_csv = extension(uploaded_file) == ".csv"
+    def progreso(filas):
+        trabajo.reportar(uploaded_file.tell() / total if es_csv else None, filas=filas)
+
+    medicion = Medicion("addata_archivo", formato=formato, compresion=compresion, motor=opciones.get("motor"),
+                        bytes_entrada=uploaded_file.size, extension=extension(uploaded_file))
+    try:
+        with medicion.activa():
+            salida = None
+            if reanudable:
+                salida = procesar_reanudable(uploaded_file, clave, compresion, progreso=progreso, **opciones)
+            if salida is None:
+                # Sin checkpoints, o el mismo trabajo sigue en curso en otra sesion: salida propia
+                salida = nuevo_archivo_salida()
+                uploaded_file.seek(0)
+                procesar_archivo(uploaded_file, salida, formato=formato, compresion=compresion,
+                                 nombre_interno=nombre_salida(NOMBRE_DESCARGA, formato), progreso=progreso,
+                                 **opciones)
+    finally:
+        medicion.escribir_jsonl()
+    dedup = opciones.get("dedup")
+    return {"salida": salida, "dedup": dedup.estadisticas() if dedup is not None else None, "resultados": [],
+            "metricas": medicion.registro()}
+
+def copia_lote(rutas):
+    """
+    Carpeta propia de un trabajo con las entradas del lote (enlaces duros; se
+    copian solo si no se puede enlazar): la sesion borra su carpeta al cambiar
+    la seleccion aunque el trabajo siga en cola o leyendo. Retorna (carpeta, rutas);
+    si el trabajo se descarta sin correr, la carpeta se borra al liberarse.
+    """
+    carpeta = tempfile.TemporaryDirectory(prefix="addata_trabajo_")
+    copias = []
+    for ruta in rutas:
+        copia = os.path.join(carpeta.name, os.path.basename(ruta))
+        try:
+            os.link(ruta, copia)
+        except OSError:
+            shutil.copyfile(ruta, copia)
+        copias.append(copia)
+    return carpeta, copias
+
+def trabajo_lote(trabajo, entradas, rutas, formato, compresion, combinar, **opciones):
+    """
+    Trabajo de la cola para un lote: un proceso por archivo (procesar_lote) y
+    al final la salida combinada o el ZIP. Cancelar corta entre archivos.
+    `entradas` es la carpeta del trabajo (copia_lote): se borra al terminar.
+    """
+    with entradas:
+        return _trabajo_lote(trabajo, rutas, formato, compresion, combinar, **opciones)
+
+def _trabajo_lote(trabajo, rutas, formato, compresion, combinar, **opciones):
+    completados, resultados = [], []
+    salida = None
+    trabajo.reportar(0.0, hechos=0, total=len(rutas))
+    # Las etapas de cada archivo se miden en su proceso y se suman aqui
+    medicion = Medicion("addata_lote", formato=formato, compresion=compresion, combinar=combinar,
+                        archivos=len(rutas), bytes_entrada=sum(os.path.getsize(r) for r in rutas))
+    try:
+        with medicion.activa(), tempfile.TemporaryDirectory(prefix="addata_salidas_") as carpeta:
+            lote = procesar_lote(rutas, carpeta, formato=formato, **opciones)
+            try:
+                for hechos, r in enumerate(lote, 1):
+                    resultados.append(r)
+                    medicion.combinar(r.pop("etapas", {}))
+                    if "error" not in r:
+                        completados.append(r)
+                    trabajo.reportar(hechos / len(rutas), hechos=hechos, total=len(rutas))
+            except BaseException:
+                # Lote cancelado: nada se entrega, asi que las claves de los archivos terminados no cuentan
+                lote.close()
+                descartar_corridas(opciones.get("carpeta_dedup"), completados)
+                raise
+            finally:
+                lote.close()
+
+            if completados:
+                # Mismo orden que las entradas, no el orden en que terminaron
+                orden = {ruta: i for i, ruta in enumerate(rutas)}
+                salidas = [r["salida"] for r in sorted(completados, key=lambda r: orden[r["archivo"]])]
+                salida = nuevo_archivo_salida()
+                with etapa("exportar", len(salidas)):
+                    if combinar:
+                        combinar_salidas(salidas, salida, formato, compresion,
+                                         nombre_interno=nombre_salida(NOMBRE_DESCARGA, formato))
+                    else:
+                        empaquetar_salidas(salidas, salida)
+    finally:
+        medicion.escribir_jsonl()
+    return {"salida": salida, "dedup": None, "resultados": resultados, "metricas": medicion.registro()}
+
+def enviar_trabajo(descarga, funcion, *args, memoria, **kwargs):
+    """
+    Encola funcion(trabajo, *args, **kwargs) y lo anota en la sesion junto con
+    `descarga` (clave de cache, nombre y MIME del resultado). Un trabajo anterior
+    de la misma sesion se cancela. Con la cola llena avisa en lugar de procesar.
+    """
+    anterior = st.session_state.pop('trabajo', None)
+    if anterior is not None and (trabajo := cola_trabajos().obtener(anterior["id"])) is not None:
+        trabajo.cancelar()
+    try:
+        trabajo = cola_trabajos().enviar(funcion, *args, memoria=memoria, **kwargs)
+    except ColaLlena:
+        st.warning(t["cola_llena"])
+        return
+    st.session_state['trabajo'] = dict(descarga, id=trabajo.id)
+    st.session_state['ready'] = False
+
+def texto_trabajo(trabajo):
+    if trabajo.estado == "en_cola":
+        return t["en_cola"].format(delante=cola_trabajos().posicion(trabajo))
+    if "total" in trabajo.datos:
+        return t["progreso"].format(**trabajo.datos)
+    return t["filas_procesadas"].format(filas=trabajo.datos.get("filas", 0))
+
+def seguir_trabajo():
+    """
+    Muestra el trabajo de la sesion (posicion en la cola o progreso, con boton
+    de cancelar) hasta que termina, y retorna (datos del envio, Trabajo).
+    """
+    info = st.session_state['trabajo']
+    trabajo = cola_trabajos().obtener(info["id"])
+    if trabajo is None:
+        # Reinicio del servidor o trabajo vencido: no hay nada que seguir
+        del st.session_state['trabajo']
+        return info, None
+    if trabajo.activo:
+        if st.button(t["cancelar"]):
+            trabajo.cancelar()
+        barra = st.progress(0.0, text=texto_trabajo(trabajo))
+        while trabajo.activo:
+            barra.progress(trabajo.progreso, text=texto_trabajo(trabajo))
+            time.sleep(INTERVALO_PROGRESO)
+        barra.empty()
+    cola_trabajos().retirar(info["id"])
+    del st.session_state['trabajo']
+    return info, trabajo
+
+def validar_clave_guardada():
+    """
+    Valida en segundo plano la ultima clave escrita en la sesion. Se lee de
+    'clave_licencia' y no del widget: mientras no hay descarga el widget no
+    se muestra y Streamlit borra su valor.
+    """
+    if st.session_state.get('clave_licencia'):
+        validar_en_segundo_plano(st.session_state['clave_licencia'])
+
+def opciones_perfil():
+    """Variantes de salida por columna (VARIANTES); retorna None si no se elige ninguna"""
+    perfil = st.multiselect(t["perfil"], list(VARIANTES), help=t["perfil_ayuda"])
+    return perfil or None
+
+def mostrar_dedup(estadisticas):
+    st.caption(t["dedup_stats"].format(**estadisticas))
+
+def huella_upload(uploaded_file):
+    """Huella SHA256 del archivo subido, calculada una sola vez por upload"""
+    huellas = st.session_state.setdefault('huellas', {})
+    if uploaded_file.file_id not in huellas:
+        huellas[uploaded_file.file_id] = huella_contenido(uploaded_file.getbuffer())
+    return huellas[uploaded_file.file_id]
+
+def hojas_upload(uploaded_file, huella):
+    """Hojas de un XLSX subido (abrir el libro lee la tabla de textos compartidos: se cachea)"""
+    cache = cache_uploads()
+    clave = (huella, "hojas")
+    hojas = cache.obtener(clave)
+    if hojas is None:
+        hojas = hojas_excel(uploaded_file)
+        cache.guardar(clave, hojas, 0)
+    return hojas
+
+def leer_upload(uploaded_file, huella, hoja=None):
+    """
+    Vista previa del archivo (o de la cache). Todos los formatos se procesan
+    en streaming, asi que aqui nunca se lee el archivo completo.
+    """
+    cache = cache_uploads()
+    clave = (huella, hoja)
+    df = cache.obtener(clave)
+    if df is None:
+        df = leer_vista_previa(uploaded_file, FILAS_PREVIEW, hoja)
+        cache.guardar(clave, df, tamano_dataframe(df))
+    return df
+
+def detectar_upload(uploaded_file, huella, hoja=None):
+    """Columnas sugeridas para el archivo subido (muestra acotada, se cachea por huella)"""
+    cache = cache_uploads()
+    clave = (huella, hoja, "deteccion")
+    deteccion = cache.obtener(clave)
+    if deteccion is None:
+        deteccion = detectar_columnas_archivo(uploaded_file, hoja)
+        cache.guardar(clave, deteccion, 0)
+    return deteccion
+
+def preparar_lote(uploads):
+    """
+    Copia los archivos subidos (y el contenido de los ZIP) a una carpeta
+    temporal de la sesion: los procesos del lote leen desde disco. Solo se
+    rehace cuando cambia la seleccion de archivos.
+    """
+    ids = tuple(f.file_id for f in uploads)
+    lote = st.session_state.get('lote')
+    if lote is None or lote["ids"] != ids:
+        if lote is not None:
+            lote["carpeta"].cleanup()
+        carpeta = tempfile.TemporaryDirectory(prefix="addata_lote_")
+        rutas = []
+        for f in uploads:
+            if extension(f) == ".zip":
+                rutas += extraer_zip(f, carpeta.name)
+            else:
+                ruta = ruta_libre(carpeta.name, f.name)
+                with open(ruta, "wb") as archivo:
+                    archivo.write(f.getbuffer())
+                rutas.append(ruta)
+        lote = st.session_state['lote'] = {"ids": ids, "carpeta": carpeta, "rutas": rutas}
+    return lote["rutas"]
+
+def mapeo_columnas(df, deteccion=None):
+    """Selectores de columna email / telefono / user id, prellenados con la deteccion automatica"""
+    st.subheader(t["config"])
+    cols = [COL_IGNORAR] + df.columns.tolist()
+    deteccion = deteccion or dict.fromkeys(TIPOS)
+    sugeridas = [cols.index(d["columna"]) if d and d["columna"] in cols else 0 for d in deteccion.values()]
+
+    c1, c2, c3 = st.columns(3)
+    with c1: email_col = st.selectbox(t["col_email"], cols, index=sugeridas[0])
+    with c2: phone_col = st.selectbox(t["col_tel"], cols, index=sugeridas[1])
+    with c3: id_col = st.selectbox(t["col_id"], cols, index=sugeridas[2])
+
+    detalle = ", ".join(f"{t['tipo_' + tipo]}: {d['columna']} ({t['confianza_' + d['confianza']]})"
+                        for tipo, d in deteccion.items() if d)
+    if detalle:
+        st.caption(t["deteccion"].format(detalle=detalle))
+    return email_col, phone_col, id_col
 
 # --- TEXTOS TRILINGÜES ---
 textos = {
@@ -50,7 +397,7 @@ textos = {
         "titulo": "💎 AdData Cleaner PRO",
         "subtitulo": "Herramienta Enterprise: Limpieza y Hashing (Email, Teléfono, User ID).",
         "aviso": "Procesamiento seguro en memoria.",
-        "subir": "Sube tu archivo (CSV o Excel)",
+        "subir": "Sube tu archivo (CSV, Excel, Parquet o Feather)",
         "config": "Mapeo de Columnas",
         "col_email": "Columna de Email (Opcional)",
         "col_tel": "Columna de Teléfono (Opcional)",
@@ -61,14 +408,49 @@ textos = {
         "bloqueo_titulo": "🔒 Activación de Producto",
         "bloqueo_msg": "Ingresa tu Licencia Oficial (Lemon Squeezy) para descargar.",
         "exito_auth": "✅ Licencia Verificada: ",
-        "descargar": "📥 Descargar Archivo Seguro (.csv)",
-        "error_clave": "🚫 Error de validación: "
+        "descargar": "📥 Descargar Archivo Seguro",
+        "error_clave": "🚫 Error de validación: ",
+        "cache_stats": "♻️ Hashes reutilizados: {ahorro:.0%} de las filas ({calculados:,} calculados)",
+        "motor_arrow": "🚀 Lector CSV rápido (Arrow, multihilo)",
+        "formato": "Formato de salida",
+        "hoja": "Hoja de Excel",
+        "compresion": "Compresión de la descarga",
+        "sin_compresion": "Sin comprimir",
+        "dedup": "🧹 Quitar duplicados (también contra cargas anteriores)",
+        "dedup_modo": "Filas duplicadas",
+        "dedup_eliminar": "Quitar",
+        "dedup_marcar": "Marcar en la columna es_duplicado",
+        "dedup_stats": "🧹 {nuevas:,} filas nuevas, {duplicadas_archivo:,} repetidas en el archivo, {duplicadas_historial:,} ya subidas antes, {sin_clave:,} sin identificadores",
+        "modo_lote": "📦 Modo lote (varios archivos)",
+        "subir_lote": "Sube tus archivos (CSV, Excel, Parquet, Feather o ZIP)",
+        "lote_vacio": "No hay archivos soportados en la selección.",
+        "lote_info": "{n} archivo(s). Vista previa de {archivo}:",
+        "salida_lote": "Salida del lote",
+        "combinar": "Un solo archivo combinado",
+        "por_archivo": "Un archivo por entrada (ZIP)",
+        "progreso": "{hechos}/{total} archivos",
+        "resultado_archivo": "{archivo}: {filas:,} filas en {segundos:.2f} s",
+        "perfil": "Variantes de salida (opcional)",
+        "perfil_ayuda": "Genera en una sola pasada varias versiones de cada columna mapeada, cada una en <columna>_<variante>: limpio, hash (SHA256), e164 (teléfono +52...), *_bin (digest binario, solo Parquet/Feather). Reemplaza la casilla de hashing.",
+        "deteccion": "🔎 Detectadas automáticamente (revisa antes de procesar): {detalle}",
+        "tipo_email": "email", "tipo_telefono": "teléfono", "tipo_id": "user id",
+        "confianza_alta": "confianza alta", "confianza_media": "confianza media", "confianza_baja": "confianza baja",
+        "cola_llena": "⏳ El servidor está ocupado y la cola de trabajos está llena. Intenta de nuevo en unos minutos.",
+        "en_cola": "⏳ En cola: {delante} trabajo(s) antes que el tuyo",
+        "filas_procesadas": "{filas:,} filas procesadas",
+        "cancelar": "✖️ Cancelar",
+        "cancelado": "Procesamiento cancelado.",
+        "trabajo_perdido": "El trabajo se perdió (el servidor se reinició). Vuelve a procesar.",
+        "debug": "🔧 Panel de debug",
+        "debug_vacio": "Procesa un archivo para ver el tiempo, filas/s y memoria de cada etapa.",
+        "debug_total": "Corrida {corrida}: {segundos:.2f} s, RSS pico del proceso {rss:,.0f} MB",
+        "debug_cola": "Cola: {corriendo} corriendo, {en_cola} en espera, {workers} workers"
     },
     "English": {
         "titulo": "💎 AdData Cleaner PRO",
         "subtitulo": "Enterprise Tool: Cleaning & Hashing (Email, Phone, User ID).",
         "aviso": "Secure in-memory processing.",
-        "subir": "Upload File (CSV or Excel)",
+        "subir": "Upload File (CSV, Excel, Parquet or Feather)",
         "config": "Column Mapping",
         "col_email": "Email Column (Optional)",
         "col_tel": "Phone Column (Optional)",
@@ -79,14 +461,49 @@ textos = {
         "bloqueo_titulo": "🔒 Product Activation",
         "bloqueo_msg": "Enter your Official License Key (Lemon Squeezy) to download.",
         "exito_auth": "✅ License Verified: ",
-        "descargar": "📥 Download Secure File (.csv)",
-        "error_clave": "🚫 Validation Error: "
+        "descargar": "📥 Download Secure File",
+        "error_clave": "🚫 Validation Error: ",
+        "cache_stats": "♻️ Reused hashes: {ahorro:.0%} of rows ({calculados:,} computed)",
+        "motor_arrow": "🚀 Fast CSV reader (Arrow, multithreaded)",
+        "formato": "Output format",
+        "hoja": "Excel sheet",
+        "compresion": "Download compression",
+        "sin_compresion": "Uncompressed",
+        "dedup": "🧹 Remove duplicates (also against previous uploads)",
+        "dedup_modo": "Duplicate rows",
+        "dedup_eliminar": "Remove",
+        "dedup_marcar": "Flag in the es_duplicado column",
+        "dedup_stats": "🧹 {nuevas:,} new rows, {duplicadas_archivo:,} repeated in the file, {duplicadas_historial:,} already uploaded, {sin_clave:,} without identifiers",
+        "modo_lote": "📦 Batch mode (multiple files)",
+        "subir_lote": "Upload Files (CSV, Excel, Parquet, Feather or ZIP)",
+        "lote_vacio": "No supported files in the selection.",
+        "lote_info": "{n} file(s). Preview of {archivo}:",
+        "salida_lote": "Batch output",
+        "combinar": "One merged file",
+        "por_archivo": "One file per input (ZIP)",
+        "progreso": "{hechos}/{total} files",
+        "resultado_archivo": "{archivo}: {filas:,} rows in {segundos:.2f} s",
+        "perfil": "Output variants (optional)",
+        "perfil_ayuda": "Builds several versions of each mapped column in a single pass, each in <column>_<variant>: limpio (clean), hash (SHA256), e164 (phone +52...), *_bin (binary digest, Parquet/Feather only). Replaces the hashing checkbox.",
+        "deteccion": "🔎 Auto-detected (review before processing): {detalle}",
+        "tipo_email": "email", "tipo_telefono": "phone", "tipo_id": "user id",
+        "confianza_alta": "high confidence", "confianza_media": "medium confidence", "confianza_baja": "low confidence",
+        "cola_llena": "⏳ The server is busy and the job queue is full. Please try again in a few minutes.",
+        "en_cola": "⏳ Queued: {delante} job(s) ahead of yours",
+        "filas_procesadas": "{filas:,} rows processed",
+        "cancelar": "✖️ Cancel",
+        "cancelado": "Processing cancelled.",
+        "trabajo_perdido": "The job was lost (the server restarted). Please process again.",
+        "debug": "🔧 Debug panel",
+        "debug_vacio": "Process a file to see the time, rows/s and memory of each stage.",
+        "debug_total": "Run {corrida}: {segundos:.2f} s, process peak RSS {rss:,.0f} MB",
+        "debug_cola": "Queue: {corriendo} running, {en_cola} waiting, {workers} workers"
     },
     "Português": {
         "titulo": "💎 AdData Cleaner PRO",
         "subtitulo": "Ferramenta Enterprise: Limpeza e Hashing (Email, Telefone, User ID).",
         "aviso": "Processamento seguro na memória.",
-        "subir": "Carregue seu arquivo (CSV ou Excel)",
+        "subir": "Carregue seu arquivo (CSV, Excel, Parquet ou Feather)",
         "config": "Mapeamento de Colunas",
         "col_email": "Coluna de Email (Opcional)",
         "col_tel": "Coluna de Telefone (Opcional)",
@@ -97,28 +514,46 @@ textos = {
         "bloqueo_titulo": "🔒 Ativação do Produto",
         "bloqueo_msg": "Insira sua Licença Oficial (Lemon Squeezy) para baixar.",
         "exito_auth": "✅ Licença Verificada: ",
-        "descargar": "📥 Baixar Arquivo Seguro (.csv)",
-        "error_clave": "🚫 Erro de validação: "
+        "descargar": "📥 Baixar Arquivo Seguro",
+        "error_clave": "🚫 Erro de validação: ",
+        "cache_stats": "♻️ Hashes reutilizados: {ahorro:.0%} das linhas ({calculados:,} calculados)",
+        "motor_arrow": "🚀 Leitor CSV rápido (Arrow, multithread)",
+        "formato": "Formato de saída",
+        "hoja": "Planilha do Excel",
+        "compresion": "Compressão do download",
+        "sin_compresion": "Sem compressão",
+        "dedup": "🧹 Remover duplicados (também contra envios anteriores)",
+        "dedup_modo": "Linhas duplicadas",
+        "dedup_eliminar": "Remover",
+        "dedup_marcar": "Marcar na coluna es_duplicado",
+        "dedup_stats": "🧹 {nuevas:,} linhas novas, {duplicadas_archivo:,} repetidas no arquivo, {duplicadas_historial:,} já enviadas antes, {sin_clave:,} sem identificadores",
+        "modo_lote": "📦 Modo lote (vários arquivos)",
+        "subir_lote": "Carregue seus arquivos (CSV, Excel, Parquet, Feather ou ZIP)",
+        "lote_vacio": "Nenhum arquivo suportado na seleção.",
+        "lote_info": "{n} arquivo(s). Prévia de {archivo}:",
+        "salida_lote": "Saída do lote",
+        "combinar": "Um único arquivo combinado",
+        "por_archivo": "Um arquivo por entrada (ZIP)",
+        "progreso": "{hechos}/{total} arquivos",
+        "resultado_archivo": "{archivo}: {filas:,} linhas em {segundos:.2f} s",
+        "perfil": "Variantes de saída (opcional)",
+        "perfil_ayuda": "Gera em uma única passada várias versões de cada coluna mapeada, cada uma em <coluna>_<variante>: limpio (limpo), hash (SHA256), e164 (telefone +52...), *_bin (digest binário, só Parquet/Feather). Substitui a caixa de hashing.",
+        "deteccion": "🔎 Detectadas automaticamente (revise antes de processar): {detalle}",
+        "tipo_email": "email", "tipo_telefono": "telefone", "tipo_id": "user id",
+        "confianza_alta": "confiança alta", "confianza_media": "confiança média", "confianza_baja": "confiança baixa",
+        "cola_llena": "⏳ O servidor está ocupado e a fila de trabalhos está cheia. Tente novamente em alguns minutos.",
+        "en_cola": "⏳ Na fila: {delante} trabalho(s) antes do seu",
+        "filas_procesadas": "{filas:,} linhas processadas",
+        "cancelar": "✖️ Cancelar",
+        "cancelado": "Processamento cancelado.",
+        "trabajo_perdido": "O trabalho foi perdido (o servidor reiniciou). Processe novamente.",
+        "debug": "🔧 Painel de debug",
+        "debug_vacio": "Processe um arquivo para ver o tempo, linhas/s e memória de cada etapa.",
+        "debug_total": "Execução {corrida}: {segundos:.2f} s, pico de RSS do processo {rss:,.0f} MB",
+        "debug_cola": "Fila: {corriendo} em execução, {en_cola} aguardando, {workers} workers"
     }
 }
 
-# --- FUNCIONES DE LIMPIEZA ---
-def clean_generic(val):
-    """Limpia espacios y nulos basicos"""
-    s = str(val).strip()
-    return "" if s.lower() in ['nan', 'none', '', 'null'] else s
-
-def clean_phone_logic(val):
-    """Solo digitos"""
-    s = clean_generic(val)
-    if not s: return ""
-    return "".join(filter(str.isdigit, s))
-
-def apply_hash(val):
-    """Aplica SHA256 si hay valor"""
-    if not val: return ""
-    return hashlib.sha256(val.lower().encode()).hexdigest()
-
 # --- INTERFAZ ---
 idioma = st.sidebar.selectbox("Language / Idioma / Idioma", ["English", "Español", "Português"])
 t = textos[idioma]
@@ -127,65 +562,188 @@ st.title(t["titulo"])
 st.markdown(t["subtitulo"])
 st.info(t["aviso"])
 
-uploaded_file = st.file_uploader(t["subir"], type=["csv", "xlsx"])
+modo_lote = st.sidebar.toggle(t["modo_lote"])
+debug = st.sidebar.toggle(t["debug"])
+tipos = [ext.lstrip(".") for ext in EXTENSIONES_ENTRADA]
+if modo_lote:
+    uploaded_file = None
+    uploads = st.file_uploader(t["subir_lote"], type=tipos + ["zip"], accept_multiple_files=True)
+else:
+    uploaded_file = st.file_uploader(t["subir"], type=tipos)
+    uploads = []
 
 if uploaded_file is not None:
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        es_csv = extension(uploaded_file) == ".csv"
+        huella = huella_upload(uploaded_file)
+        hoja = None
+        if extension(uploaded_file) == ".xlsx":
+            hojas = hojas_upload(uploaded_file, huella)
+            if len(hojas) > 1:
+                hoja = st.selectbox(t["hoja"], hojas)
+        df = leer_upload(uploaded_file, huella, hoja)
 
         st.write("Preview:", df.head(3))
-        st.subheader(t["config"])
-        cols = ["-- Ignorar --"] + df.columns.tolist()
-        
-        c1, c2, c3 = st.columns(3)
-        with c1: email_col = st.selectbox(t["col_email"], cols)
-        with c2: phone_col = st.selectbox(t["col_tel"], cols)
-        with c3: id_col = st.selectbox(t["col_id"], cols)
+        email_col, phone_col, id_col = mapeo_columnas(df, detectar_upload(uploaded_file, huella, hoja))
         
         st.divider()
         
         # --- AQUÍ ESTABA EL ERROR, YA ESTÁ CORREGIDO ---
         hashing = st.checkbox(t["encriptar"], value=True)
+        motor = "arrow" if es_csv and st.checkbox(t["motor_arrow"], value=False) else "pandas"
+        formato = st.selectbox(t["formato"], FORMATOS_SALIDA)
+        compresion = st.selectbox(t["compresion"], (None,) + COMPRESIONES,
+                                  format_func=lambda c: c or t["sin_compresion"])
+        perfil = opciones_perfil()
+        modo_dedup = opciones_dedup()
 
         if st.button(t["boton"]):
-            clean_df = df.copy()
-
-            with st.spinner("Processing..."):
-                # 1. EMAIL
-                if email_col != "-- Ignorar --":
-                    clean_df[email_col] = clean_df[email_col].apply(clean_generic).str.lower()
-                    if hashing:
-                        clean_df[email_col] = clean_df[email_col].apply(apply_hash)
-
-                # 2. TELÉFONO
-                if phone_col != "-- Ignorar --":
-                    clean_df[phone_col] = clean_df[phone_col].apply(clean_phone_logic)
-                    if hashing:
-                        clean_df[phone_col] = clean_df[phone_col].apply(apply_hash)
-                
-                # 3. USER ID
-                if id_col != "-- Ignorar --":
-                    # Solo quitamos espacios, no borramos simbolos raros de IDs
-                    clean_df[id_col] = clean_df[id_col].apply(clean_generic)
-                    if hashing:
-                        clean_df[id_col] = clean_df[id_col].apply(apply_hash)
-
-                st.session_state['data_final'] = clean_df.to_csv(index=False).encode('utf-8')
+            cache = cache_sesion()
+            resultados = cache_resultados()
+            clave = (id_sesion(), huella, hoja, email_col, phone_col, id_col, hashing, motor, formato, compresion,
+                     tuple(perfil or ()))
+            nombre = nombre_salida(NOMBRE_DESCARGA, formato, compresion)
+            mime = MIME_COMPRESION[compresion] if compresion else MIME_SALIDA[formato]
+
+            # Si ya hay una clave escrita, se valida en paralelo mientras se procesa
+            validar_clave_guardada()
+
+            # Con deduplicacion el resultado depende del historial: nunca sale de la cache
+            salida = None if modo_dedup else resultados.obtener(clave)
+            if salida is not None:
+                st.session_state['data_final'] = salida
+                st.session_state['nombre_final'] = nombre
+                st.session_state['mime_final'] = mime
                 st.session_state['ready'] = True
+            else:
+                # El proceso corre en la cola del servidor; la sesion solo sigue su progreso
+                descarga = {"clave": None if modo_dedup else clave, "nombre": nombre, "mime": mime,
+                            "stats_cache": bool(hashing or perfil)}
+                dedup = CorridaDedup(indice_dedup()) if modo_dedup else None
+                enviar_trabajo(descarga, trabajo_archivo, copia_upload(uploaded_file), formato, compresion,
+                               formato == "csv" and compresion != "zip", clave + (modo_dedup,),
+                               memoria=memoria_estimada(uploaded_file.size), email_col=email_col,
+                               phone_col=phone_col, id_col=id_col, hashing=hashing, cache=cache, motor=motor,
+                               hoja=hoja, dedup=dedup, modo_dedup=modo_dedup, perfil=perfil)
 
     except Exception as e:
         st.error(f"Error: {e}")
 
+# --- MODO LOTE ---
+if uploads:
+    try:
+        rutas = preparar_lote(uploads)
+        if not rutas:
+            st.warning(t["lote_vacio"])
+            st.stop()
+        df = leer_vista_previa(rutas[0], FILAS_PREVIEW)
+        st.write(t["lote_info"].format(n=len(rutas), archivo=os.path.basename(rutas[0])), df.head(3))
+        # La deteccion sobre el primer archivo se hace una vez por seleccion de archivos
+        lote = st.session_state['lote']
+        if 'deteccion' not in lote:
+            lote['deteccion'] = detectar_columnas_archivo(rutas[0])
+        email_col, phone_col, id_col = mapeo_columnas(df, lote['deteccion'])
+
+        st.divider()
+
+        hashing = st.checkbox(t["encriptar"], value=True)
+        hay_csv = any(extension(r) == ".csv" for r in rutas)
+        motor = "arrow" if hay_csv and st.checkbox(t["motor_arrow"], value=False) else "pandas"
+        formato = st.selectbox(t["formato"], FORMATOS_SALIDA)
+        combinar = st.radio(t["salida_lote"], (True, False),
+                            format_func=lambda c: t["combinar"] if c else t["por_archivo"])
+        # Un archivo por entrada siempre se entrega como ZIP
+        compresion = None
+        if combinar:
+            compresion = st.selectbox(t["compresion"], (None,) + COMPRESIONES,
+                                      format_func=lambda c: c or t["sin_compresion"])
+        perfil = opciones_perfil()
+        modo_dedup = opciones_dedup()
+
+        if st.button(t["boton"]):
+            resultados = cache_resultados()
+            huellas = tuple(huella_upload(f) for f in uploads)
+            clave = (id_sesion(), "lote", huellas, email_col, phone_col, id_col, hashing, motor, formato, combinar,
+                     compresion, tuple(perfil or ()))
+            if combinar:
+                nombre = nombre_salida(NOMBRE_DESCARGA, formato, compresion)
+                mime = MIME_COMPRESION[compresion] if compresion else MIME_SALIDA[formato]
+            else:
+                nombre, mime = NOMBRE_DESCARGA + ".zip", MIME_COMPRESION["zip"]
+
+            validar_clave_guardada()
+
+            salida = None if modo_dedup else resultados.obtener(clave)
+            if salida is not None:
+                st.session_state['data_final'] = salida
+                st.session_state['nombre_final'] = nombre
+                st.session_state['mime_final'] = mime
+                st.session_state['ready'] = True
+            else:
+                # Un proceso por archivo (procesar_lote): el tiempo total escala con los nucleos
+                procesos = min(os.cpu_count() or 1, len(rutas))
+                descarga = {"clave": None if modo_dedup else clave, "nombre": nombre, "mime": mime,
+                            "stats_cache": False}
+                enviar_trabajo(descarga, trabajo_lote, *copia_lote(rutas), formato, compresion, combinar,
+                               memoria=memoria_estimada(max(os.path.getsize(r) for r in rutas), procesos),
+                               email_col=email_col, phone_col=phone_col, id_col=id_col, hashing=hashing,
+                               motor=motor, carpeta_dedup=CARPETA_POR_DEFECTO if modo_dedup else None,
+                               modo_dedup=modo_dedup or "eliminar", perfil=perfil)
+
+    except Exception as e:
+        st.error(f"Error: {e}")
+
+# --- TRABAJO EN CURSO ---
+if 'trabajo' in st.session_state:
+    info, trabajo = seguir_trabajo()
+    if trabajo is None:
+        st.warning(t["trabajo_perdido"])
+    elif trabajo.estado == "cancelado":
+        st.warning(t["cancelado"])
+    elif trabajo.estado == "error":
+        st.error(f"Error: {trabajo.error}")
+    else:
+        r = trabajo.resultado
+        fallidos = 0
+        for archivo in r["resultados"]:
+            nombre = os.path.basename(archivo["archivo"])
+            if "error" in archivo:
+                fallidos += 1
+                st.error(f"❌ {nombre}: {archivo['error']}")
+            else:
+                st.write("✅ " + t["resultado_archivo"].format(archivo=nombre, filas=archivo["filas"],
+                                                              segundos=archivo["segundos"]))
+                if "dedup" in archivo:
+                    mostrar_dedup(archivo["dedup"])
+        if r["dedup"] is not None:
+            mostrar_dedup(r["dedup"])
+        if info["stats_cache"]:
+            stats = st.session_state['cache_hash'].estadisticas()
+            st.caption(t["cache_stats"].format(ahorro=stats["tasa_ahorro_filas"], calculados=stats["hashes_calculados"]))
+
+        st.session_state['metricas'] = r["metricas"]
+        salida = r["salida"]
+        if salida is not None:
+            # Con archivos fallidos no se guarda: al reintentar se vuelven a procesar
+            if info["clave"] is not None and not fallidos:
+                resultados = cache_resultados()
+                resultados.guardar(info["clave"], salida, salida.tell())
+            st.session_state['data_final'] = salida
+            st.session_state['nombre_final'] = info["nombre"]
+            st.session_state['mime_final'] = info["mime"]
+            st.session_state['ready'] = True
+
 # --- COBRO / ACTIVACIÓN ---
 if st.session_state.get('ready'):
     st.divider()
     st.subheader(t["bloqueo_titulo"])
     st.write(t["bloqueo_msg"])
     
-    key_input = st.text_input("License Key:", type="password")
+    # Streamlit borra la clave del widget en las ejecuciones en que no se muestra: se siembra con la guardada
+    if 'license_key' not in st.session_state and st.session_state.get('clave_licencia'):
+        st.session_state['license_key'] = st.session_state['clave_licencia']
+    key_input = st.text_input("License Key:", type="password", key="license_key")
+    st.session_state['clave_licencia'] = key_input
     
     # Validamos si se presionó el botón o si ya hay una clave ingresada y se dio Enter
     if st.button("Validar / Validate / Validar"):
@@ -194,11 +752,24 @@ if st.session_state.get('ready'):
             
             if es_valida:
                 st.success(f"{t['exito_auth']} {mensaje}")
+                nombre = st.session_state['nombre_final']
                 st.download_button(
-                    label=t["descargar"],
-                    data=st.session_state['data_final'],
-                    file_name="secure_data_processed.csv",
-                    mime="text/csv"
+                    label=f"{t['descargar']} ({nombre[len(NOMBRE_DESCARGA):]})",
+                    data=descarga_diferida(st.session_state['data_final']),
+                    file_name=nombre,
+                    mime=st.session_state['mime_final']
                 )
             else:
-                st.error(f"{t['error_clave']} {mensaje}")
\ No newline at end of file
+                st.error(f"{t['error_clave']} {mensaje}")
+
+# --- PANEL DE DEBUG ---
+if debug:
+    with st.sidebar.expander(t["debug"], expanded=True):
+        metricas = st.session_state.get('metricas')
+        if metricas is None:
+            st.caption(t["debug_vacio"])
+        else:
+            st.caption(t["debug_total"].format(segundos=metricas["segundos"], rss=metricas["rss_pico_proceso_mb"],
+                                               corrida=metricas["corrida"]))
+            st.dataframe(metricas["etapas"], hide_index=True)
+        st.caption(t["debug_cola"].format(**cola_trabajos().estadisticas()))
@@ -0,0 +1,49 @@
+"""
+Benchmark: auditoria de CFDI en serie vs en el pool de procesos de motor_cfdi.
+
+Replica los XML de valida_xmls/test_xmls_cfdi N veces y los audita con todas
+las reglas con 1, 2, 4... workers hasta --workers, verificando que los
+resultados (y su orden) sean los mismos que en serie.
+
+Uso: python benchmarks/bench_cfdi.py [--factor 500] [--workers N]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls"))
+from motor_cfdi import REGLAS, auditar_xmls
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls", "test_xmls_cfdi")
+LISTA_NEGRA = {"AAA010101AAA", "SAT970701NN3"}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=500, help="Veces que se replica el corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Maximo de procesos a probar")
+    args = parser.parse_args()
+
+    base = []
+    for ruta in sorted(glob.glob(os.path.join(CARPETA, "*.xml"))):
+        with open(ruta, "rb") as archivo:
+            base.append((os.path.basename(ruta), archivo.read()))
+    xmls = [(f"{i}/{nombre}", contenido) for i in range(args.factor) for nombre, contenido in base]
+    print(f"📊 {len(base)} XML x{args.factor} ({len(xmls):,} XML)")
+
+    serie = None
+    workers = 1
+    while workers <= args.workers:
+        inicio = time.perf_counter()
+        resultados = list(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=workers))
+        segundos = time.perf_counter() - inicio
+        if serie is None:
+            serie = (resultados, segundos)
+        identico = resultados == serie[0]
+        print(f"   {workers:2d} workers  {segundos:8.3f} s  ({len(xmls) / segundos:,.0f} XML/s)  "
+              f"speedup {serie[1] / segundos:.1f}x  | mismos resultados: {'✅' if identico else '❌'}")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: salida sin comprimir vs comprimida en streaming (gzip, zstd, zip).
+
+Replica los CSV de test_files_large N veces en un archivo temporal y mide
+la limpieza completa (leer -> limpiar -> escribir) con cada compresion:
+tiempo total, tamaño de la salida y proporcion respecto a la salida sin comprimir.
+
+Uso: python benchmarks/bench_compresion.py [--factor 200] [--formato csv] [--sin-hash]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_limpieza import COMPRESIONES, FORMATOS_SALIDA, nombre_salida, procesar_archivo
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files_large")
+
+# Archivo -> (email, telefono, user id)
+DATASETS = {
+    "1k_ecommerce_users.csv": ("Buyer_Email", "Contact_Phone", "Order_ID"),
+    "3k_legacy_database.csv": ("Raw_Email_String", "Mobile_Number_V2", "Legacy_ID"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=200, help="Veces que se replica cada dataset")
+    parser.add_argument("--formato", choices=FORMATOS_SALIDA, default="csv")
+    parser.add_argument("--sin-hash", action="store_true", help="Medir solo lectura + limpieza")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, columnas in DATASETS.items():
+            base = pd.read_csv(os.path.join(CARPETA, nombre), dtype=str)
+            grande = os.path.join(carpeta, nombre)
+            pd.concat([base] * args.factor, ignore_index=True).to_csv(grande, index=False)
+            megas = os.path.getsize(grande) / 1024 / 1024
+            print(f"📊 {nombre} x{args.factor} ({len(base) * args.factor:,} filas, {megas:.1f} MB)")
+
+            tamano_plano = None
+            for compresion in (None,) + COMPRESIONES:
+                salida = os.path.join(carpeta, nombre_salida("salida", args.formato, compresion))
+                inicio = time.perf_counter()
+                try:
+                    filas = procesar_archivo(grande, salida, *columnas, hashing=not args.sin_hash, workers=1,
+                                             formato=args.formato, compresion=compresion)
+                except ValueError as e:
+                    print(f"   {compresion:8s} omitido: {e}")
+                    continue
+                segundos = time.perf_counter() - inicio
+                tamano = os.path.getsize(salida)
+                tamano_plano = tamano_plano or tamano
+                print(f"   {compresion or 'ninguna':8s} {segundos:8.3f} s  ({filas / segundos:,.0f} filas/s)  "
+                      f"{tamano / 1024 / 1024:8.1f} MB  ({tamano / tamano_plano:.0%} del original)")
+
+if __name__ == "__main__":
+    main()
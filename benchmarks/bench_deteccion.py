@@ -0,0 +1,81 @@
+"""
+Benchmark: deteccion automatica de columnas sobre archivos grandes.
+
+Replica los CSV de test_files_large N veces (copiando bytes, sin pasar por
+pandas) y mide leer_muestra + detectar_columnas en CSV y Parquet. El tiempo
+no debe crecer con el tamaño del archivo: solo se lee una muestra acotada.
+
+Uso: python benchmarks/bench_deteccion.py [--factor 5000] [--sin-parquet]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detector_columnas import describir_deteccion, detectar_columnas
+from motor_limpieza import leer_muestra
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files_large")
+
+# Archivo -> (email, telefono, user id) esperados. Order_ID (pedidos) y Legacy_ID (valores
+# repetidos) no identifican personas: no se detectan como user id
+DATASETS = {
+    "1k_ecommerce_users.csv": ("Buyer_Email", "Contact_Phone", None),
+    "3k_legacy_database.csv": ("Raw_Email_String", "Mobile_Number_V2", None),
+}
+
+def replicar_csv(origen, destino, factor):
+    """Encabezado una vez y el cuerpo `factor` veces"""
+    with open(origen, "rb") as f:
+        encabezado = f.readline()
+        cuerpo = f.read()
+    if not cuerpo.endswith(b"\n"):
+        cuerpo += b"\n"
+    with open(destino, "wb") as f:
+        f.write(encabezado)
+        for _ in range(factor):
+            f.write(cuerpo)
+
+def medir(ruta, esperadas):
+    inicio = time.perf_counter()
+    muestra = leer_muestra(ruta)
+    leida = time.perf_counter()
+    deteccion = detectar_columnas(muestra)
+    fin = time.perf_counter()
+    ok = tuple(d and d["columna"] for d in deteccion.values()) == esperadas
+    print(f"   {os.path.basename(ruta):32s} muestra {len(muestra):5,} filas en {(leida - inicio) * 1000:7.1f} ms, "
+          f"deteccion {(fin - leida) * 1000:6.1f} ms  {'✅' if ok else '❌'} {describir_deteccion(deteccion)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=5_000, help="Veces que se replica cada dataset")
+    parser.add_argument("--sin-parquet", action="store_true", help="Medir solo CSV")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, esperadas in DATASETS.items():
+            grande = os.path.join(carpeta, nombre)
+            replicar_csv(os.path.join(CARPETA, nombre), grande, args.factor)
+            filas = len(pd.read_csv(os.path.join(CARPETA, nombre), dtype=str)) * args.factor
+            megas = os.path.getsize(grande) / 1024 / 1024
+            print(f"📊 {nombre} x{args.factor} ({filas:,} filas, {megas:,.0f} MB)")
+            medir(grande, esperadas)
+
+            if not args.sin_parquet:
+                import pyarrow.csv as pacsv
+                import pyarrow.parquet as pq
+
+                parquet = os.path.splitext(grande)[0] + ".parquet"
+                lector = pacsv.open_csv(grande, convert_options=pacsv.ConvertOptions(
+                    column_types={c: "string" for c in pd.read_csv(grande, nrows=0).columns}))
+                with pq.ParquetWriter(parquet, lector.schema) as escritor:
+                    for lote in lector:
+                        escritor.write_batch(lote)
+                medir(parquet, esperadas)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: pd.read_excel completo vs lectura XLSX en streaming (openpyxl read-only).
+
+Genera un XLSX replicando test_files_large/2k_agency_leads.xlsx N veces y
+limpia el archivo con cada modo en un subproceso aparte, para medir el pico
+real de memoria (RSS maximo) de cada uno.
+
+Uso: python benchmarks/bench_excel.py [--factor 50]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from motor_limpieza import limpiar_dataframe, procesar_archivo
+
+BASE = os.path.join(RAIZ, "test_files_large", "2k_agency_leads.xlsx")
+COLUMNAS = ("Target_Email", "Target_Phone", "User_ID_CRM")
+MODOS = ("read_excel", "streaming")
+
+def medir(modo, ruta):
+    """Corre un modo y reporta tiempo y RSS maximo del proceso"""
+    inicio = time.perf_counter()
+    with tempfile.TemporaryFile() as salida:
+        if modo == "read_excel":
+            df = pd.read_excel(ruta)
+            limpiar_dataframe(df, *COLUMNAS, workers=1).to_csv(salida, index=False, encoding="utf-8")
+            filas = len(df)
+        else:
+            filas = procesar_archivo(ruta, salida, *COLUMNAS, workers=1)
+    segundos = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"filas": filas, "segundos": segundos, "pico_mb": pico_mb}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=50, help="Veces que se replica el dataset")
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--ruta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        medir(args.modo, args.ruta)
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "grande.xlsx")
+        print(f"⚡ Generando XLSX x{args.factor}...")
+        pd.concat([pd.read_excel(BASE)] * args.factor, ignore_index=True).to_excel(ruta, index=False)
+        print(f"📊 {os.path.getsize(ruta) / 1024 / 1024:.1f} MB")
+
+        for modo in MODOS:
+            salida = subprocess.run([sys.executable, __file__, "--modo", modo, "--ruta", ruta],
+                                    capture_output=True, text=True, check=True).stdout
+            r = json.loads(salida.strip().splitlines()[-1])
+            print(f"   {modo:10s} {r['segundos']:8.2f} s  ({r['filas'] / r['segundos']:,.0f} filas/s)  "
+                  f"pico RSS: {r['pico_mb']:,.0f} MB")
+
+if __name__ == "__main__":
+    main()
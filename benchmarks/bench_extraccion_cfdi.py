@@ -0,0 +1,114 @@
+"""
+Benchmark: lectura de CFDI con el arbol completo (ET.parse) vs extraer_cfdi.
+
+Audita facturas chicas (el corpus de valida_xmls/test_xmls_cfdi) y facturas
+con muchos Conceptos (una factura del corpus con --conceptos conceptos), con
+la version anterior de parse_cfdi y con la de motor_cfdi. Verifica que los
+datos sean identicos y mide tiempo y memoria pico (tracemalloc) por factura.
+
+Uso: python benchmarks/bench_extraccion_cfdi.py [--factor 20] [--conceptos 5000]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls"))
+import motor_cfdi
+from motor_cfdi import REGLAS, parse_cfdi
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls", "test_xmls_cfdi")
+LISTA_NEGRA = {"AAA010101AAA", "SAT970701NN3"}
+TIMBRE = ('<cfdi:Complemento><tfd:TimbreFiscalDigital xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital" '
+          'Version="1.1" UUID="6F1E2A7C-0B3D-4E5F-9A8B-7C6D5E4F3A2B" FechaTimbrado="2025-06-01T12:00:00"/>'
+          '</cfdi:Complemento>')
+
+def parse_cfdi_arbol(file_content, reglas_activas, blacklist_set):
+    """parse_cfdi anterior: ET.parse del XML completo"""
+    try:
+        root = ET.parse(BytesIO(file_content)).getroot()
+        ns = {'cfdi': 'http://www.sat.gob.mx/cfd/4', 'tfd': 'http://www.sat.gob.mx/TimbreFiscalDigital'}
+        subtotal = float(root.get("SubTotal", 0))
+        total = float(root.get("Total", 0))
+        emisor = root.find("cfdi:Emisor", ns)
+        rfc_emisor = emisor.get("Rfc", "").upper().strip() if emisor is not None else ""
+        total_impuestos = 0.0
+        impuestos = root.find("cfdi:Impuestos", ns)
+        if impuestos is not None:
+            traslados = impuestos.get("TotalImpuestosTrasladados")
+            if traslados: total_impuestos = float(traslados)
+            else:
+                for tras in impuestos.findall(".//cfdi:Traslado", ns):
+                    total_impuestos += float(tras.get("Importe", 0))
+        tfd_node = None
+        complemento = root.find("cfdi:Complemento", ns)
+        if complemento is not None: tfd_node = complemento.find("tfd:TimbreFiscalDigital", ns)
+        fecha = root.get("Fecha", "")
+        data = {
+            "Archivo": "...",
+            "UUID": tfd_node.get("UUID") if tfd_node is not None else "SIN TIMBRE",
+            "Fecha": fecha[:10],
+            "RFC Emisor": rfc_emisor,
+            "Nombre Emisor": emisor.get("Nombre", "") if emisor is not None else "",
+            "Total": total,
+        }
+        data["Val. EFOS"] = motor_cfdi.validar_efos(rfc_emisor, blacklist_set)
+        data["Val. Timbrado"] = motor_cfdi.validar_timbrado(tfd_node)
+        data["Val. Aritmética"] = motor_cfdi.validar_aritmetica(subtotal, total_impuestos, total)
+        data["Val. RFC"] = motor_cfdi.validar_rfc_estructura(rfc_emisor)
+        data["Val. Divisa"] = motor_cfdi.validar_moneda_cambio(root.get("Moneda", "MXN"), root.get("TipoCambio", ""))
+        data["Val. Pago"] = motor_cfdi.validar_metodo_pago(root.get("MetodoPago", ""), root.get("FormaPago", ""))
+        data["Val. Fecha"] = motor_cfdi.validar_fecha_reciente(fecha)
+        return data, True
+    except Exception as e:
+        return {"Error": str(e)}, False
+
+def factura_grande(contenido, conceptos):
+    """La factura con su Concepto repetido `conceptos` veces y timbrada"""
+    texto = contenido.decode("utf-8")
+    concepto = re.search(r"\s*<cfdi:Concepto .*?</cfdi:Concepto>", texto, re.S).group(0)
+    texto = texto.replace(concepto, concepto * conceptos, 1)
+    return texto.replace("</cfdi:Comprobante>", TIMBRE + "</cfdi:Comprobante>").encode("utf-8")
+
+def medir(funcion, xmls):
+    """(resultados, segundos, KB pico por factura)"""
+    inicio = time.perf_counter()
+    resultados = [funcion(contenido, REGLAS, LISTA_NEGRA) for contenido in xmls]
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    funcion(xmls[0], REGLAS, LISTA_NEGRA)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultados, segundos, pico / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=20, help="Veces que se replica el corpus de facturas chicas")
+    parser.add_argument("--conceptos", type=int, default=5000, help="Conceptos de cada factura grande")
+    parser.add_argument("--grandes", type=int, default=20, help="Facturas grandes a auditar")
+    args = parser.parse_args()
+
+    base = []
+    for ruta in sorted(glob.glob(os.path.join(CARPETA, "*.xml"))):
+        with open(ruta, "rb") as archivo:
+            base.append(archivo.read())
+    casos = {
+        f"chicas ({len(base) * args.factor:,} XML)": base * args.factor,
+        f"grandes ({args.grandes} XML de {args.conceptos:,} conceptos)":
+            [factura_grande(contenido, args.conceptos) for contenido in base[:args.grandes]],
+    }
+    for nombre, xmls in casos.items():
+        viejo, t_viejo, m_viejo = medir(parse_cfdi_arbol, xmls)
+        nuevo, t_nuevo, m_nuevo = medir(parse_cfdi, xmls)
+        print(f"📊 Facturas {nombre}, {sum(map(len, xmls)) / len(xmls) / 1024:,.1f} KB en promedio")
+        print(f"   ET.parse:     {t_viejo:8.3f} s  ({len(xmls) / t_viejo:,.0f} XML/s)  pico {m_viejo:,.0f} KB")
+        print(f"   extraer_cfdi: {t_nuevo:8.3f} s  ({len(xmls) / t_nuevo:,.0f} XML/s)  pico {m_nuevo:,.0f} KB")
+        print(f"   speedup: {t_viejo / t_nuevo:.1f}x  | mismos datos: {'✅' if viejo == nuevo else '❌'}")
+
+if __name__ == "__main__":
+    main()
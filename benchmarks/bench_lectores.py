@@ -0,0 +1,50 @@
+"""
+Benchmark: lector CSV de pandas (por bloques) vs lector Arrow multihilo.
+
+Replica los CSV de test_files_large N veces en un archivo temporal y mide
+la limpieza completa (leer -> limpiar -> escribir CSV) con cada motor.
+
+Uso: python benchmarks/bench_lectores.py [--factor 500] [--sin-hash]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_limpieza import MOTORES_CSV, procesar_archivo
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files_large")
+
+# Archivo -> (email, telefono, user id)
+DATASETS = {
+    "1k_ecommerce_users.csv": ("Buyer_Email", "Contact_Phone", "Order_ID"),
+    "3k_legacy_database.csv": ("Raw_Email_String", "Mobile_Number_V2", "Legacy_ID"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=500, help="Veces que se replica cada dataset")
+    parser.add_argument("--sin-hash", action="store_true", help="Medir solo lectura + limpieza")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, columnas in DATASETS.items():
+            base = pd.read_csv(os.path.join(CARPETA, nombre), dtype=str)
+            grande = os.path.join(carpeta, nombre)
+            pd.concat([base] * args.factor, ignore_index=True).to_csv(grande, index=False)
+            megas = os.path.getsize(grande) / 1024 / 1024
+            print(f"📊 {nombre} x{args.factor} ({len(base) * args.factor:,} filas, {megas:.1f} MB)")
+
+            for motor in MOTORES_CSV:
+                salida = os.path.join(carpeta, f"salida_{motor}.csv")
+                inicio = time.perf_counter()
+                filas = procesar_archivo(grande, salida, *columnas, hashing=not args.sin_hash, workers=1, motor=motor)
+                segundos = time.perf_counter() - inicio
+                print(f"   {motor:7s} {segundos:8.3f} s  ({filas / segundos:,.0f} filas/s, {megas / segundos:.1f} MB/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: limpieza por celda (.apply) vs motor vectorizado.
+
+Usa los datasets de test_files_large, replicados N veces para simular
+exportaciones grandes, y verifica que la salida CSV sea identica byte a byte.
+
+Uso: python benchmarks/bench_limpieza.py [--factor 1000] [--sin-hash] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_limpieza import apply_hash, clean_generic, clean_phone_logic, limpiar_dataframe
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files_large")
+
+# Archivo -> (email, telefono, user id)
+DATASETS = {
+    "1k_ecommerce_users.csv": ("Buyer_Email", "Contact_Phone", "Order_ID"),
+    "2k_agency_leads.xlsx": ("Target_Email", "Target_Phone", "User_ID_CRM"),
+    "3k_legacy_database.csv": ("Raw_Email_String", "Mobile_Number_V2", "Legacy_ID"),
+}
+
+def limpiar_con_apply(df, email_col, phone_col, id_col, hashing):
+    """Ruta original de app.py: una llamada a Python por celda"""
+    clean_df = df.copy()
+    clean_df[email_col] = clean_df[email_col].apply(clean_generic).str.lower()
+    clean_df[phone_col] = clean_df[phone_col].apply(clean_phone_logic)
+    clean_df[id_col] = clean_df[id_col].apply(clean_generic)
+    if hashing:
+        for col in (email_col, phone_col, id_col):
+            clean_df[col] = clean_df[col].apply(apply_hash)
+    return clean_df
+
+def cronometrar(fn, *args):
+    inicio = time.perf_counter()
+    resultado = fn(*args)
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=1000, help="Veces que se replica cada dataset")
+    parser.add_argument("--sin-hash", action="store_true", help="Medir solo la limpieza")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para el hashing (por defecto: todos)")
+    args = parser.parse_args()
+    hashing = not args.sin_hash
+
+    for nombre, (email_col, phone_col, id_col) in DATASETS.items():
+        ruta = os.path.join(CARPETA, nombre)
+        base = pd.read_csv(ruta) if nombre.endswith(".csv") else pd.read_excel(ruta)
+        df = pd.concat([base] * args.factor, ignore_index=True)
+
+        viejo, t_viejo = cronometrar(limpiar_con_apply, df, email_col, phone_col, id_col, hashing)
+        nuevo, t_nuevo = cronometrar(limpiar_dataframe, df, email_col, phone_col, id_col, hashing, args.workers)
+
+        identico = viejo.to_csv(index=False).encode("utf-8") == nuevo.to_csv(index=False).encode("utf-8")
+        print(f"📊 {nombre} x{args.factor} ({len(df):,} filas)")
+        print(f"   .apply:      {t_viejo:8.3f} s  ({len(df) / t_viejo:,.0f} filas/s)")
+        print(f"   vectorizado: {t_nuevo:8.3f} s  ({len(df) / t_nuevo:,.0f} filas/s)")
+        print(f"   speedup: {t_viejo / t_nuevo:.1f}x  | salida identica: {'✅' if identico else '❌'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: pico de memoria de limpiar_dataframe con copia completa vs sin copia.
+
+"copia" reproduce el comportamiento anterior (df.copy() profundo antes de
+limpiar); "sin_copia" es el actual: las columnas no mapeadas se comparten con
+el DataFrame original y solo se reemplazan las mapeadas. Cada modo corre en un
+subproceso aparte y reporta el RSS maximo durante la limpieza y cuanto crecio
+sobre el DataFrame ya cargado (VmHWM de Linux). --extra agrega columnas no mapeadas para simular exportaciones anchas.
+
+Uso: python benchmarks/bench_memoria.py [--factor 300] [--extra 20] [--dtype object]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from motor_limpieza import limpiar_dataframe
+
+BASE = os.path.join(RAIZ, "test_files_large", "3k_legacy_database.csv")
+COLUMNAS = ("Raw_Email_String", "Mobile_Number_V2", "Legacy_ID")
+MODOS = ("copia", "sin_copia")
+
+def memoria_mb(campo):
+    """VmRSS (actual) o VmHWM (pico) del proceso, de /proc/self/status"""
+    with open("/proc/self/status") as status:
+        for linea in status:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1]) / 1024
+
+def reiniciar_pico():
+    """Linux: escribir 5 en clear_refs reinicia VmHWM, asi la lectura del CSV no cuenta"""
+    with open("/proc/self/clear_refs", "w") as refs:
+        refs.write("5")
+
+def medir(modo, ruta, texto):
+    """Carga el CSV, limpia con el modo pedido y reporta tiempo y memoria"""
+    df = pd.read_csv(ruta, dtype=texto)
+    reiniciar_pico()
+    cargado = memoria_mb("VmRSS")
+    inicio = time.perf_counter()
+    limpio = limpiar_dataframe(df.copy() if modo == "copia" else df, *COLUMNAS, workers=1)
+    segundos = time.perf_counter() - inicio
+    pico = memoria_mb("VmHWM")
+    print(json.dumps({"filas": len(limpio), "segundos": segundos, "pico_mb": pico, "incremento_mb": pico - cargado}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=300, help="Veces que se replica el dataset")
+    parser.add_argument("--extra", type=int, default=20, help="Columnas no mapeadas adicionales")
+    parser.add_argument("--dtype", choices=("str", "object"), default="str",
+                        help="Tipo de las columnas al leer: str (texto de pandas) u object (strings de Python)")
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--ruta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        medir(args.modo, args.ruta, args.dtype)
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "grande.csv")
+        base = pd.read_csv(BASE, dtype=str)
+        for i in range(args.extra):
+            base[f"Extra_{i}"] = base["Region"] + f"_{i}"
+        pd.concat([base] * args.factor, ignore_index=True).to_csv(ruta, index=False)
+        print(f"📊 {len(base) * args.factor:,} filas x {len(base.columns)} columnas "
+              f"({os.path.getsize(ruta) / 1024 / 1024:.1f} MB)")
+
+        for modo in MODOS:
+            salida = subprocess.run([sys.executable, __file__, "--modo", modo, "--ruta", ruta, "--dtype", args.dtype],
+                                    capture_output=True, text=True, check=True).stdout
+            r = json.loads(salida.strip().splitlines()[-1])
+            print(f"   {modo:10s} {r['segundos']:8.2f} s  pico RSS: {r['pico_mb']:,.0f} MB  "
+                  f"(+{r['incremento_mb']:,.0f} MB sobre el DataFrame cargado)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: perfil de salida con varias variantes en una pasada vs una pasada por variante.
+
+Replica los CSV de test_files_large N veces y genera las mismas variantes
+(hash, E.164 + hash y digest binario) de dos formas: un solo procesar_archivo
+con el perfil completo, o un procesar_archivo por variante.
+
+Uso: python benchmarks/bench_perfiles.py [--factor 300] [--perfil hash,e164_hash,hash_bin]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_limpieza import COL_IGNORAR, TIPO_NORMALIZACION, VARIANTES, procesar_archivo, validar_perfil
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_files_large")
+
+# Archivo -> (email, telefono, user id)
+DATASETS = {
+    "1k_ecommerce_users.csv": ("Buyer_Email", "Contact_Phone", "Order_ID"),
+    "3k_legacy_database.csv": ("Raw_Email_String", "Mobile_Number_V2", "Legacy_ID"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=300, help="Veces que se replica cada dataset")
+    parser.add_argument("--perfil", default="hash,e164_hash,hash_bin", help="Variantes a generar")
+    args = parser.parse_args()
+    perfil = validar_perfil(args.perfil, "parquet")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, columnas in DATASETS.items():
+            base = pd.read_csv(os.path.join(CARPETA, nombre), dtype=str)
+            grande = os.path.join(carpeta, nombre)
+            pd.concat([base] * args.factor, ignore_index=True).to_csv(grande, index=False)
+            print(f"📊 {nombre} x{args.factor} ({len(base) * args.factor:,} filas), perfil {','.join(perfil)}")
+
+            salida = os.path.join(carpeta, "salida.parquet")
+            inicio = time.perf_counter()
+            procesar_archivo(grande, salida, *columnas, workers=1, formato="parquet", perfil=perfil)
+            una_pasada = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            for variante in perfil:
+                # Una variante de un solo tipo (e164*) solo se pide para esa columna
+                tipo = TIPO_NORMALIZACION.get(VARIANTES[variante][0])
+                propias = [c if tipo in (None, t) else COL_IGNORAR
+                           for c, t in zip(columnas, ("email", "telefono", "id"))]
+                procesar_archivo(grande, salida, *propias, workers=1, formato="parquet", perfil=[variante])
+            por_variante = time.perf_counter() - inicio
+
+            print(f"   una pasada      {una_pasada:8.3f} s")
+            print(f"   {len(perfil)} pasadas       {por_variante:8.3f} s  ({por_variante / una_pasada:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cache LRU acotada por tamaño (bytes) para AdData Cleaner.
+
+Streamlit vuelve a ejecutar app.py en cada interaccion; con esta cache los
+archivos ya parseados y los resultados ya procesados se reutilizan por
+huella de contenido en lugar de recalcularse.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+def huella_contenido(datos):
+    """SHA256 de bytes/memoryview: identifica un archivo por su contenido"""
+    return hashlib.sha256(datos).hexdigest()
+
+def tamano_dataframe(df):
+    """Bytes que ocupa un DataFrame en memoria (incluye el texto de columnas object)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class CacheLRUBytes:
+    """
+    Diccionario LRU con limite de bytes: al pasarse del limite desaloja las
+    entradas menos usadas. Los valores desalojados con close() (archivos
+    temporales de salida) se cierran, para liberar su disco enseguida; con
+    cerrar=False solo se sueltan (otra sesion puede seguir descargandolos).
+    Seguro entre hilos (sesiones de Streamlit).
+    """
+
+    def __init__(self, max_bytes, cerrar=True):
+        self.max_bytes = max_bytes
+        self.cerrar = cerrar
+        self.bytes_usados = 0
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._datos
+
+    def __len__(self):
+        return len(self._datos)
+
+    def obtener(self, clave, default=None):
+        with self._lock:
+            if clave not in self._datos:
+                return default
+            self._datos.move_to_end(clave)
+            return self._datos[clave][0]
+
+    def guardar(self, clave, valor, tamano):
+        """Guarda `valor`; si por si solo supera max_bytes no se guarda"""
+        if tamano > self.max_bytes:
+            return
+        desalojados = []
+        with self._lock:
+            if clave in self._datos:
+                anterior, tamano_anterior = self._datos.pop(clave)
+                self.bytes_usados -= tamano_anterior
+                if anterior is not valor:
+                    desalojados.append(anterior)
+            self._datos[clave] = (valor, tamano)
+            self.bytes_usados += tamano
+            while self.bytes_usados > self.max_bytes:
+                _, (viejo, tamano_viejo) = self._datos.popitem(last=False)
+                self.bytes_usados -= tamano_viejo
+                desalojados.append(viejo)
+        for viejo in desalojados:
+            if self.cerrar and hasattr(viejo, "close"):
+                viejo.close()
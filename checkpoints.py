@@ -0,0 +1,123 @@
+"""
+Checkpoints de AdData Cleaner para retomar limpiezas largas.
+
+Al terminar cada bloque se guarda cuantos bloques y filas de la entrada ya se
+procesaron, cuantos bytes lleva la salida y el estado de la deduplicacion.
+Si el proceso muere (falta de memoria, reinicio del contenedor, sesion de
+Streamlit vencida), volver a correr con el mismo archivo y las mismas
+opciones retoma desde el ultimo bloque completo.
+
+Cada trabajo se identifica por una firma: la entrada (ruta, tamaño y fecha
+de modificacion, o el SHA256 del contenido si es un archivo en memoria), la
+salida y todas las opciones que cambian el resultado. Un checkpoint con otra
+firma se ignora y el trabajo empieza de cero.
+
+Mientras un trabajo usa un checkpoint lo tiene bloqueado (usar_checkpoint):
+dos procesos o sesiones con el mismo trabajo no escriben la misma salida.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se protege entre hilos del mismo proceso
+    fcntl = None
+
+CARPETA_CHECKPOINTS = os.environ.get(
+    "ADDATA_CHECKPOINT_DIR", os.path.join(os.path.expanduser("~"), ".addata_checkpoints"))
+# Cambia si cambia el formato del checkpoint o el de la salida por bloques
+VERSION = 1
+
+# Checkpoints bloqueados por este proceso: {ruta: [hilo, usos anidados]}
+_en_uso = {}
+_lock_en_uso = threading.Lock()
+
+class CheckpointOcupado(Exception):
+    """Otro trabajo esta usando el mismo checkpoint (y la misma salida)"""
+
+def identidad_origen(origen):
+    """Lo que identifica a la entrada: ruta + tamaño + fecha, o SHA256 del contenido subido"""
+    if isinstance(origen, (str, os.PathLike)):
+        info = os.stat(origen)
+        return {"ruta": os.path.abspath(origen), "bytes": info.st_size, "modificado": info.st_mtime_ns}
+    if hasattr(origen, "getbuffer"):
+        return {"sha256": hashlib.sha256(origen.getbuffer()).hexdigest()}
+    raise ValueError("Los checkpoints necesitan una ruta o un archivo en memoria como entrada")
+
+def firma_trabajo(origen, destino, **opciones):
+    """SHA256 de la entrada, la salida y las opciones del trabajo"""
+    datos = {"version": VERSION, "origen": identidad_origen(origen), "destino": os.path.abspath(destino),
+             "opciones": opciones}
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+def ruta_checkpoint(destino, carpeta=CARPETA_CHECKPOINTS):
+    """Archivo de checkpoint de una salida (fuera de la carpeta de salida, para no mezclarse con los datos)"""
+    nombre = hashlib.sha256(os.path.abspath(destino).encode()).hexdigest()[:32]
+    return os.path.join(carpeta, nombre + ".json")
+
+def leer_checkpoint(ruta, firma):
+    """Estado guardado para esta firma, o None (sin checkpoint, otra firma o archivo dañado)"""
+    try:
+        with open(ruta) as archivo:
+            guardado = json.load(archivo)
+    except (OSError, ValueError):
+        return None
+    if guardado.get("firma") != firma:
+        return None
+    return guardado["estado"]
+
+def guardar_checkpoint(ruta, firma, estado):
+    """Escribe el checkpoint de forma atomica: un corte a medias deja el anterior intacto"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w") as archivo:
+        json.dump({"firma": firma, "estado": estado}, archivo)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+def borrar_checkpoint(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+@contextlib.contextmanager
+def usar_checkpoint(ruta):
+    """
+    Bloqueo exclusivo del checkpoint mientras dura el trabajo, entre hilos y,
+    con fcntl, entre procesos. No espera: si otro trabajo lo tiene, lanza
+    CheckpointOcupado. El mismo hilo puede anidarlo (procesar y luego leer
+    la salida sin soltarlo).
+    """
+    ruta = os.path.abspath(ruta)
+    hilo = threading.get_ident()
+    with _lock_en_uso:
+        uso = _en_uso.get(ruta)
+        if uso is not None and uso[0] != hilo:
+            raise CheckpointOcupado(f"Otro trabajo esta usando el checkpoint {ruta}")
+        if uso is not None:
+            uso[1] += 1
+        else:
+            _en_uso[ruta] = [hilo, 1]
+    try:
+        if uso is not None:
+            yield
+            return
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # El .lock no se borra nunca: borrarlo con el bloqueo tomado deja entrar a otro
+        with open(ruta + ".lock", "a") as archivo_lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(archivo_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise CheckpointOcupado(f"Otro proceso esta usando el checkpoint {ruta}") from None
+            yield
+    finally:
+        with _lock_en_uso:
+            _en_uso[ruta][1] -= 1
+            if _en_uso[ruta][1] == 0:
+                del _en_uso[ruta]
@@ -0,0 +1,200 @@
+"""
+Cola de trabajos en segundo plano compartida por todas las sesiones de Streamlit.
+
+Cada sesion procesaba su archivo en el hilo del script: diez usuarios con
+archivos grandes podian tumbar el contenedor. Aqui los trabajos pesados
+corren en un numero fijo de hilos y:
+
+- Control de admision por memoria: cada trabajo declara cuanta RAM estima
+  usar y solo arranca si cabe junto a los que ya corren (uno mas grande que
+  el limite corre solo). Si no cabe, espera su turno en la cola (FIFO).
+- La cola es acotada: con MAX_EN_COLA trabajos esperando, enviar() lanza
+  ColaLlena y la interfaz pide reintentar, en lugar de aceptar trabajo sin fin.
+- Progreso y cancelacion por trabajo: la funcion del trabajo llama a
+  trabajo.reportar(); si se pidio cancelar, ahi se lanza TrabajoCancelado.
+
+Las funciones de los trabajos no deben llamar a st.*: corren fuera del script.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# Hilos que procesan trabajos a la vez
+WORKERS = int(os.environ.get("ADDATA_WORKERS_TRABAJOS", 2))
+# Trabajos esperando antes de rechazar nuevos
+MAX_EN_COLA = int(os.environ.get("ADDATA_MAX_EN_COLA", 20))
+# Segundos que se guarda un trabajo terminado que nadie recogio (sesion cerrada)
+TTL_TERMINADOS = 30 * 60
+
+def memoria_disponible():
+    """RAM para trabajos: ADDATA_MEMORIA_TRABAJOS (MB) o la mitad de la RAM del equipo"""
+    megas = int(os.environ.get("ADDATA_MEMORIA_TRABAJOS", 0))
+    if megas:
+        return megas * 1024 * 1024
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2
+    except (ValueError, OSError, AttributeError):
+        return 2 * 1024 ** 3
+
+ESTADOS_FINALES = ("terminado", "error", "cancelado")
+
+class ColaLlena(Exception):
+    """No hay lugar en la cola: reintentar mas tarde"""
+
+class TrabajoCancelado(Exception):
+    """Se pidio cancelar el trabajo; lo lanza Trabajo.reportar()"""
+
+class Trabajo:
+    """Un trabajo de la cola: estado, progreso (0 a 1), datos del avance y resultado o error"""
+
+    def __init__(self, id, funcion, args, kwargs, memoria, descripcion):
+        self.id = id
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.memoria = memoria
+        self.descripcion = descripcion
+        self.estado = "en_cola"
+        self.progreso = 0.0
+        self.datos = {}
+        self.resultado = None
+        self.error = None
+        self.creado = time.monotonic()
+        self.terminado = None
+        self._cancelar = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado not in ESTADOS_FINALES
+
+    def reportar(self, progreso=None, **datos):
+        """
+        Desde la funcion del trabajo: actualiza el progreso y los datos del avance
+        (filas, archivos hechos...) y corta si se pidio cancelar.
+        """
+        if progreso is not None:
+            self.progreso = min(max(float(progreso), 0.0), 1.0)
+        self.datos.update(datos)
+        if self._cancelar.is_set():
+            raise TrabajoCancelado()
+
+    def cancelar(self):
+        """Pide cancelar: en cola se descarta; corriendo, se corta en el siguiente reportar()"""
+        self._cancelar.set()
+
+class ColaTrabajos:
+    """Pool fijo de hilos con cola FIFO acotada y admision por memoria estimada"""
+
+    def __init__(self, workers=WORKERS, memoria_max=None, max_en_cola=MAX_EN_COLA):
+        self.workers = workers
+        self.memoria_max = memoria_max or memoria_disponible()
+        self.max_en_cola = max_en_cola
+        self._pendientes = deque()
+        self._trabajos = {}
+        self._memoria_en_uso = 0
+        self._corriendo = 0
+        self._ids = itertools.count(1)
+        self._condicion = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._bucle, name=f"trabajos-{i}", daemon=True).start()
+
+    def enviar(self, funcion, *args, memoria=0, descripcion="", **kwargs):
+        """
+        Encola funcion(trabajo, *args, **kwargs) y retorna el Trabajo.
+        `memoria` es la RAM estimada en bytes. Lanza ColaLlena si no hay lugar.
+        """
+        with self._condicion:
+            self._purgar()
+            if len(self._pendientes) >= self.max_en_cola:
+                raise ColaLlena(f"{len(self._pendientes)} trabajos en espera")
+            trabajo = Trabajo(next(self._ids), funcion, args, kwargs, memoria, descripcion)
+            self._trabajos[trabajo.id] = trabajo
+            self._pendientes.append(trabajo)
+            self._condicion.notify_all()
+            return trabajo
+
+    def obtener(self, id):
+        """El trabajo con ese id, o None si no existe o ya se retiro"""
+        with self._condicion:
+            return self._trabajos.get(id)
+
+    def retirar(self, id):
+        """Olvida un trabajo terminado (la sesion ya tomo su resultado)"""
+        with self._condicion:
+            trabajo = self._trabajos.get(id)
+            if trabajo is not None and not trabajo.activo:
+                del self._trabajos[id]
+
+    def posicion(self, trabajo):
+        """Trabajos delante en la cola (0 si ya corre o es el siguiente)"""
+        with self._condicion:
+            try:
+                return self._pendientes.index(trabajo)
+            except ValueError:
+                return 0
+
+    def estadisticas(self):
+        with self._condicion:
+            return {
+                "corriendo": self._corriendo,
+                "en_cola": len(self._pendientes),
+                "workers": self.workers,
+                "memoria_en_uso": self._memoria_en_uso,
+                "memoria_max": self.memoria_max,
+            }
+
+    def _purgar(self):
+        """Quita cancelados en cola y terminados viejos que ninguna sesion recogio"""
+        for trabajo in [t for t in self._pendientes if t._cancelar.is_set()]:
+            self._pendientes.remove(trabajo)
+            self._finalizar(trabajo, "cancelado")
+        limite = time.monotonic() - TTL_TERMINADOS
+        for id, trabajo in list(self._trabajos.items()):
+            if not trabajo.activo and trabajo.terminado < limite:
+                del self._trabajos[id]
+
+    def _finalizar(self, trabajo, estado):
+        trabajo.estado = estado
+        trabajo.terminado = time.monotonic()
+
+    def _admitir(self):
+        """Siguiente trabajo si cabe en memoria (o si no corre ningun otro); si no, None"""
+        self._purgar()
+        if not self._pendientes:
+            return None
+        trabajo = self._pendientes[0]
+        if self._corriendo and self._memoria_en_uso + trabajo.memoria > self.memoria_max:
+            return None
+        self._pendientes.popleft()
+        self._memoria_en_uso += trabajo.memoria
+        self._corriendo += 1
+        trabajo.estado = "corriendo"
+        return trabajo
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                trabajo = self._admitir()
+                while trabajo is None:
+                    # Con timeout: una cancelacion en cola se purga aunque nadie notifique
+                    self._condicion.wait(timeout=1.0)
+                    trabajo = self._admitir()
+            try:
+                trabajo.resultado = trabajo.funcion(trabajo, *trabajo.args, **trabajo.kwargs)
+                estado = "terminado"
+            except TrabajoCancelado:
+                estado = "cancelado"
+            except Exception as e:
+                trabajo.error = f"{type(e).__name__}: {e}"
+                estado = "error"
+            with self._condicion:
+                # Soltar referencias a los datos de entrada
+                trabajo.args = trabajo.kwargs = None
+                self._memoria_en_uso -= trabajo.memoria
+                self._corriendo -= 1
+                if estado == "terminado":
+                    trabajo.progreso = 1.0
+                self._finalizar(trabajo, estado)
+                self._condicion.notify_all()
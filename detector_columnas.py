@@ -0,0 +1,141 @@
+"""
+Deteccion automatica de las columnas de email, telefono y user id.
+
+Cada columna se califica con una muestra acotada de filas (nunca el archivo
+completo): el nombre del encabezado (en español, ingles o portugues) y que
+fraccion de los valores parece email, telefono o identificador. Cada tipo se
+asigna a la columna con mejor puntaje, sin repetir columnas, junto con un
+nivel de confianza (alta, media o baja).
+"""
+import re
+
+TIPOS = ("email", "telefono", "id")
+
+# Palabras del encabezado y su peso por tipo
+PISTAS_ENCABEZADO = {
+    "email": {"email": 1.0, "mail": 1.0, "correo": 1.0, "emails": 1.0, "electronico": 0.5},
+    "telefono": {"phone": 1.0, "telefono": 1.0, "tel": 1.0, "celular": 1.0, "cel": 1.0, "mobile": 1.0,
+                 "movil": 1.0, "whatsapp": 1.0, "telefone": 1.0, "fono": 1.0, "cell": 1.0, "msisdn": 1.0,
+                 "number": 0.4, "numero": 0.4},
+    "id": {"id": 0.7, "userid": 1.0, "uid": 1.0, "uuid": 1.0, "crm": 1.0, "customerid": 1.0,
+           "clientid": 1.0, "user": 0.5, "customer": 0.5, "cliente": 0.5, "client": 0.5, "usuario": 0.5,
+           "subscriber": 0.5, "identificador": 1.0},
+}
+# Palabras de encabezados que identifican cosas, no personas ('Order_ID', 'Campaign_ID'):
+# con solo la pista generica de id no se sugieren (hashearlas no tiene vuelta atras)
+TOKENS_NO_PERSONALES = {
+    "order", "orden", "pedido", "campaign", "campana", "campanha", "ad", "adset", "anuncio", "product",
+    "producto", "produto", "sku", "item", "articulo", "transaction", "transaccion", "invoice", "factura",
+    "fatura", "ticket", "session", "sesion", "event", "evento", "sale", "venta", "venda", "store", "tienda",
+}
+# Fraccion de valores unicos (y con forma de id) que necesita un encabezado con solo la pista generica
+UNICIDAD_ID_GENERICO = 0.95
+# Peso del encabezado frente al contenido (email y telefono tienen patron propio en los valores)
+PESO_ENCABEZADO = 0.4
+
+# Puntaje minimo para sugerir una columna y cortes de los niveles de confianza
+UMBRAL_SUGERENCIA = 0.3
+UMBRAL_MEDIA = 0.5
+UMBRAL_ALTA = 0.75
+
+PATRON_EMAIL = r"^[^@\s]+\s*@\s*[^@\s]+\.[A-Za-z]{2,}$"
+PATRON_FECHA = r"\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/]\d{1,2}[-/]\d{4}"
+PATRON_DECIMAL = r"^\s*-?\d+[.,]\d{1,4}\s*$"
+
+def tokens_encabezado(nombre):
+    """'Mobile_Number_V2' -> ['mobile', 'number', 'v2']; 'UserID' -> ['user', 'id', 'userid']"""
+    nombre = str(nombre).translate(str.maketrans("áéíóúÁÉÍÓÚ", "aeiouAEIOU"))
+    partes = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", nombre)
+    tokens = [p.lower() for p in partes]
+    # Tambien las uniones de palabras vecinas: 'User_ID' cuenta como 'userid'
+    tokens += [a + b for a, b in zip(tokens, tokens[1:])]
+    return tokens
+
+def puntaje_encabezado(nombre, tipo):
+    """Peso de la mejor pista del tipo que aparece en el encabezado (0 a 1)"""
+    pistas = PISTAS_ENCABEZADO[tipo]
+    return max((pistas.get(token, 0.0) for token in tokens_encabezado(nombre)), default=0.0)
+
+def perfil_valores(serie):
+    """
+    Fraccion de los valores no vacios de la muestra que parecen email,
+    telefono o identificador (unicos, cortos, sin espacios).
+    """
+    valores = serie.dropna().astype(str).str.strip()
+    valores = valores[valores != ""]
+    if valores.empty:
+        return {"email": 0.0, "telefono": 0.0, "id": 0.0}
+
+    es_email = valores.str.match(PATRON_EMAIL)
+    digitos = valores.str.count(r"\d")
+    letras = valores.str.count(r"[A-Za-z]")
+    es_telefono = (
+        digitos.between(7, 15) & (letras <= digitos // 2) & ~es_email
+        & ~valores.str.contains(PATRON_FECHA) & ~valores.str.match(PATRON_DECIMAL)
+    )
+    unicos = valores.nunique() / len(valores)
+    es_id = ~es_email & (valores.str.len() <= 40) & ~valores.str.contains(r"\s")
+    return {
+        "email": float(es_email.mean()),
+        "telefono": float(es_telefono.mean()),
+        "id": float(es_id.mean()) * unicos,
+    }
+
+def nivel_confianza(puntaje):
+    if puntaje >= UMBRAL_ALTA:
+        return "alta"
+    if puntaje >= UMBRAL_MEDIA:
+        return "media"
+    return "baja"
+
+def puntajes_columnas(muestra):
+    """{columna: {tipo: puntaje}} combinando encabezado y contenido"""
+    puntajes = {}
+    for columna in muestra.columns:
+        perfil = perfil_valores(muestra[columna])
+        puntajes[columna] = {
+            tipo: PESO_ENCABEZADO * puntaje_encabezado(columna, tipo) + (1 - PESO_ENCABEZADO) * perfil[tipo]
+            for tipo in ("email", "telefono")
+        }
+        # Un id no tiene patron propio: sin pista en el encabezado no se sugiere. Con solo
+        # la pista generica ('id', 'user', 'cliente') ademas debe identificar filas distintas
+        # y no nombrar una cosa: Order_ID o Legacy_ID con valores repetidos no son un user id
+        pista = puntaje_encabezado(columna, "id")
+        if pista < 1.0 and (perfil["id"] < UNICIDAD_ID_GENERICO
+                            or TOKENS_NO_PERSONALES.intersection(tokens_encabezado(columna))):
+            pista = 0.0
+        puntajes[columna]["id"] = pista * (0.5 + 0.5 * perfil["id"])
+    return puntajes
+
+def detectar_columnas(muestra, umbral=UMBRAL_SUGERENCIA):
+    """
+    Sugiere la columna de cada tipo a partir de una muestra (DataFrame).
+    Retorna {tipo: {"columna", "puntaje", "confianza"} o None}; se asignan
+    primero los pares con mejor puntaje y una columna no se usa dos veces.
+    """
+    candidatos = sorted(
+        ((puntaje, columna, tipo)
+         for columna, por_tipo in puntajes_columnas(muestra).items()
+         for tipo, puntaje in por_tipo.items() if puntaje >= umbral),
+        key=lambda c: c[0], reverse=True,
+    )
+    deteccion = dict.fromkeys(TIPOS)
+    usadas = set()
+    for puntaje, columna, tipo in candidatos:
+        if deteccion[tipo] is None and columna not in usadas:
+            deteccion[tipo] = {"columna": columna, "puntaje": round(puntaje, 2),
+                               "confianza": nivel_confianza(puntaje)}
+            usadas.add(columna)
+    return deteccion
+
+def columnas_detectadas(deteccion, ignorar, umbral=UMBRAL_MEDIA):
+    """(email, telefono, id) de la deteccion; `ignorar` donde no hay columna con puntaje >= `umbral`"""
+    return tuple(
+        d["columna"] if d is not None and d["puntaje"] >= umbral else ignorar
+        for d in (deteccion[tipo] for tipo in TIPOS)
+    )
+
+def describir_deteccion(deteccion):
+    """'email: Buyer_Email (alta), telefono: Contact_Phone (media)' para mensajes y logs"""
+    partes = [f"{tipo}: {d['columna']} ({d['confianza']})" for tipo, d in deteccion.items() if d is not None]
+    return ", ".join(partes) or "ninguna columna reconocida"
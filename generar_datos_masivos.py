@@ -1,111 +1,449 @@
-import pandas as pd
-import random
-import os
-import numpy as np
+"""
+Generador de datos sinteticos para pruebas de carga de AdData Cleaner.
+
+Genera por bloques, con NumPy y Arrow (sin bucles por fila), y escribe cada
+bloque en cuanto esta listo: 10M-100M filas sin tener el archivo en memoria.
+Con la misma semilla el resultado es identico.
 
-# Crear carpeta para los archivos masivos
-output_folder = "test_files_large"
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+- Suciedad configurable: los mismos casos de siempre (email en mayusculas,
+  con espacios, con " @" o limpio; telefono con guiones, parentesis, +52 1,
+  "Tel: ... Ext 123" o limpio) con pesos por caso.
+- Nulos (NaN) y vacios configurables en email y telefono.
+- Tasa de duplicados: esa fraccion de filas repite a una persona de una fila
+  anterior (de cualquier bloque): mismos nombre, numeros e id, con su propia
+  suciedad. Sirve para probar la deduplicacion (con los casos que el limpiador
+  normaliza, p. ej. mayusculas y espacios, queda la misma clave).
 
-print(f"🚀 Iniciando generación masiva en: {output_folder} ...")
+Sin argumentos genera los tres datasets de test_files_large (1k CSV, 2k XLSX
+y 3k CSV), como antes. Ejemplos:
+
+    python generar_datos_masivos.py --dataset legacy --filas 20000000 --salida /tmp/legacy_20m.parquet
+    python generar_datos_masivos.py --dataset ecommerce --filas 5000000 --salida big.csv.gz \\
+        --duplicados 0.1 --nulos 0.02 --sucio-email mayusculas=1,espacios=3,arroba=1,limpio=5
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
 # --- UTILIDADES PARA GENERAR CAOS ---
 dominios = ["gmail.com", "HOTMAIL.COM", "yahoo.com", "outlook.com", "empresa.mx", "agency.io"]
 nombres = ["Juan", "Maria", "Pedro", "Luisa", "Carlos", "Ana", "Beto", "Sofia", "Miguel", "Diana"]
 apellidos = ["Perez", "Gomez", "Lopez", "Diaz", "Ruiz", "Hernandez", "Smith", "Garcia", "Martinez"]
 
-def generar_email_sucio():
-    """Genera un email con probabilidad de estar sucio (espacios, mayúsculas) o vacío"""
-    if random.random() < 0.05: return np.nan  # 5% de probabilidad de ser Nulo real
-    if random.random() < 0.05: return ""      # 5% de probabilidad de ser vacío string
-    
-    nombre = random.choice(nombres)
-    apellido = random.choice(apellidos)
-    dominio = random.choice(dominios)
-    email = f"{nombre}.{apellido}@{dominio}"
-    
-    # Ensuciar
-    caso = random.randint(1, 4)
-    if caso == 1: return email.upper() # TODO MAYUSCULAS
-    if caso == 2: return f"  {email} " # Espacios extra
-    if caso == 3: return email.replace("@", " @") # Error tipico
-    return email.lower()
-
-def generar_telefono_sucio():
-    """Genera teléfonos con formatos variados"""
-    if random.random() < 0.1: return np.nan # 10% nulos
-    
-    nums = f"{random.randint(100,999)}{random.randint(1000000,9999999)}"
-    caso = random.randint(1, 5)
-    
-    if caso == 1: return f"55-{nums[:4]}-{nums[4:]}"      # Con guiones
-    if caso == 2: return f"({nums[:3]}) {nums[3:6]} {nums[6:]}" # Con paréntesis
-    if caso == 3: return f"+52 1 {nums}"                 # Formato intl
-    if caso == 4: return f"Tel: {nums} Ext 123"          # Con texto basura
-    return nums # Limpio
-
-# ==========================================
-# ARCHIVO 1: 1,000 REGISTROS (CSV) - E-commerce
-# ==========================================
-print("⚡ Generando Dataset 1 (1,000 filas)...")
-data1 = []
-for i in range(1000):
-    data1.append({
-        "Order_ID": f"ORD-{1000+i}",
-        "Customer_Name": f"{random.choice(nombres)} {random.choice(apellidos)}",
-        "Buyer_Email": generar_email_sucio(),
-        "Contact_Phone": generar_telefono_sucio(),
-        "Total_Paid": round(random.uniform(50.0, 5000.0), 2),
-        "Status": random.choice(["Paid", "Pending", "Refunded"])
+# Casos de suciedad y su peso por defecto (todos igual de probables, como el generador original)
+CASOS_EMAIL = ("mayusculas", "espacios", "arroba", "limpio")
+# Formato de cada caso de telefono: textos fijos y rangos de los 10 digitos
+FORMATOS_TELEFONO = {
+    "guiones": ("55-", (0, 4), "-", (4, 10)),
+    "parentesis": ("(", (0, 3), ") ", (3, 6), " ", (6, 10)),
+    "internacional": ("+52 1 ", (0, 10)),
+    "texto": ("Tel: ", (0, 10), " Ext 123"),
+    "limpio": ((0, 10),),
+}
+CASOS_TELEFONO = tuple(FORMATOS_TELEFONO)
+# Nulos (NaN) por columna y emails vacios ("") por defecto
+NULOS_EMAIL = 0.05
+VACIOS_EMAIL = 0.05
+NULOS_TELEFONO = 0.10
+
+FILAS_BLOQUE = 1_000_000
+# Filas maximas de una hoja de Excel (sin el encabezado)
+MAX_FILAS_XLSX = 1_048_575
+FORMATOS = ("csv", "xlsx", "parquet")
+
+# --- ATRIBUTOS POR PERSONA ---
+# Cada persona tiene un numero; sus datos salen de un hash de (semilla, persona, campo). Asi un
+# duplicado solo necesita el numero de una persona anterior, aunque este en otro bloque.
+def _mezclar(x):
+    """splitmix64 vectorizado sobre uint64"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def atributo(personas, semilla, campo, n):
+    """Entero en [0, n) fijo para cada persona y campo"""
+    clave = _mezclar(np.array([(semilla * 1_000_003 + campo) & 0xFFFFFFFFFFFFFFFF], dtype=np.uint64))
+    return (_mezclar(personas.astype(np.uint64) ^ clave) % np.uint64(n)).astype(np.int64)
+
+def asignar_personas(rng, filas, creadas, duplicados):
+    """
+    Numero de persona de cada fila del bloque: las filas nuevas toman el
+    siguiente numero y una fraccion `duplicados` repite una persona ya creada.
+    Retorna (personas, total de personas creadas al final del bloque).
+    """
+    repetida = rng.random(filas) < duplicados
+    nuevas_antes = creadas + np.cumsum(~repetida) - (~repetida)
+    # Sin personas previas no hay a quien repetir (solo pasa al inicio del archivo)
+    if (repetida & (nuevas_antes == 0)).any():
+        repetida &= nuevas_antes > 0
+        nuevas_antes = creadas + np.cumsum(~repetida) - (~repetida)
+    personas = nuevas_antes.copy()
+    personas[repetida] = (rng.random(int(repetida.sum())) * nuevas_antes[repetida]).astype(np.int64)
+    return personas, creadas + int((~repetida).sum())
+
+# --- COLUMNAS SUCIAS ---
+def pesos_casos(texto, casos):
+    """'mayusculas=1,limpio=3' -> probabilidades por caso (los no mencionados valen 0)"""
+    if texto is None:
+        return np.full(len(casos), 1 / len(casos))
+    pesos = dict.fromkeys(casos, 0.0)
+    for parte in texto.split(","):
+        caso, _, peso = parte.partition("=")
+        if caso.strip() not in pesos:
+            raise ValueError(f"caso de suciedad desconocido: {caso.strip()} (validos: {', '.join(casos)})")
+        pesos[caso.strip()] = float(peso)
+    total = sum(pesos.values())
+    if total <= 0:
+        raise ValueError("los pesos de suciedad deben sumar mas de 0")
+    return np.array([pesos[c] / total for c in casos])
+
+def _elegir(rng, filas, probabilidades):
+    """Indice de caso por fila segun sus probabilidades"""
+    return np.searchsorted(np.cumsum(probabilidades)[:-1], rng.random(filas), side="right")
+
+# --- TEXTO COMO MATRICES DE BYTES ---
+# Cada columna de texto se arma como una matriz (filas, ancho) de bytes ASCII en la que el byte 0
+# es relleno; al pasar a Arrow se quitan los ceros. Concatenar es pegar matrices y cada caso de
+# suciedad elige otra tabla o plantilla: todo en NumPy, sin un objeto de Python por fila.
+def _tabla(lista):
+    """Matriz (len(lista), ancho maximo) con cada texto alineado a la izquierda y relleno con 0"""
+    ancho = max(len(t) for t in lista)
+    return np.array([list(t.encode().ljust(ancho, b"\0")) for t in lista], dtype=np.uint8)
+
+def _tabla_casos(lista):
+    """_tabla de la lista tal cual, en mayusculas y en minusculas (en ese orden, una tras otra)"""
+    return _tabla(lista + [t.upper() for t in lista] + [t.lower() for t in lista])
+
+def _armar(filas, partes):
+    """Pega por columnas matrices de bytes y textos constantes en una sola matriz (filas, ancho)"""
+    anchos = [len(p) if isinstance(p, str) else p.shape[1] for p in partes]
+    matriz = np.empty((filas, sum(anchos)), dtype=np.uint8)
+    columna = 0
+    for parte, ancho in zip(partes, anchos):
+        matriz[:, columna:columna + ancho] = np.frombuffer(parte.encode(), dtype=np.uint8) if isinstance(parte, str) else parte
+        columna += ancho
+    return matriz
+
+# Digitos ASCII de 0000 a 9999 como uint32: los numeros se convierten de a 4 digitos con una sola busqueda
+DIGITOS_4 = np.frombuffer(b"".join(f"{i:04d}".encode() for i in range(10_000)), dtype=np.uint32)
+
+def _digitos(numeros, ancho):
+    """Numeros no negativos como digitos ASCII en `ancho` columnas (los ceros a la izquierda son relleno)"""
+    grupos = -(-ancho // 4)
+    palabras = np.empty((len(numeros), grupos), dtype=np.uint32)
+    resto = numeros.astype(np.int64)
+    for g in range(grupos - 1, -1, -1):
+        resto, grupo = np.divmod(resto, 10_000)
+        palabras[:, g] = np.take(DIGITOS_4, grupo)
+    digitos = palabras.view(np.uint8)[:, -ancho:]
+    cifras = np.searchsorted(10 ** np.arange(1, ancho, dtype=np.int64), numeros, side="right") + 1
+    digitos *= np.arange(ancho, dtype=np.int8) >= (ancho - cifras)[:, None].astype(np.int8)
+    return digitos
+
+def _a_arrow(matriz, nulos=None):
+    """Arreglo de texto Arrow con el contenido de cada fila sin el relleno; `nulos` marca filas nulas"""
+    filas, ancho = matriz.shape
+    lleno = matriz != 0
+    offsets = np.zeros(filas + 1, dtype=np.int64)
+    if lleno.all():
+        # Sin relleno (textos de ancho fijo): la matriz ya es el buffer de datos
+        offsets[1:] = np.arange(1, filas + 1, dtype=np.int64) * ancho
+        datos = matriz.ravel()
+    else:
+        # Suma sobre la vista uint8 y compress sobre el arreglo plano: mas rapidos que count_nonzero y matriz[lleno]
+        np.cumsum(lleno.view(np.uint8).sum(axis=1, dtype=np.int64), out=offsets[1:])
+        datos = np.compress(lleno.ravel(), matriz.ravel())
+    validos = None
+    if nulos is not None and nulos.any():
+        validos = pa.py_buffer(np.packbits(~nulos, bitorder="little"))
+    return pa.Array.from_buffers(pa.large_string(), filas,
+                                 [validos, pa.py_buffer(offsets), pa.py_buffer(datos)]).cast(pa.string())
+
+def _ancho_numero(numeros):
+    return len(str(int(numeros.max()))) if len(numeros) else 1
+
+def email_sucio(rng, personas, config):
+    """nombre.apellido<persona>@dominio, ensuciado segun config["sucio_email"]"""
+    semilla, filas = config["semilla"], len(personas)
+    caso = _elegir(rng, filas, config["sucio_email"])
+    # Mayusculas / minusculas: nombre, apellido y dominio se toman de la version de la tabla de ese caso
+    version = np.zeros(filas, dtype=np.int64)
+    version[caso == CASOS_EMAIL.index("mayusculas")] = 1
+    version[caso == CASOS_EMAIL.index("limpio")] = 2
+    def parte(lista, campo):
+        return np.take(_tabla_casos(lista), version * len(lista) + atributo(personas, semilla, campo, len(lista)),
+                       axis=0)
+    espacios = ((caso == CASOS_EMAIL.index("espacios")) * ord(" ")).astype(np.uint8)[:, None]
+    antes_arroba = ((caso == CASOS_EMAIL.index("arroba")) * ord(" ")).astype(np.uint8)[:, None]
+    matriz = _armar(filas, [espacios, espacios, parte(nombres, 1), ".", parte(apellidos, 2),
+                            _digitos(personas, _ancho_numero(personas)), antes_arroba, "@", parte(dominios, 3),
+                            espacios])
+    azar = rng.random(filas)
+    # Vacio: la fila queda solo con relleno
+    matriz *= ~((azar >= config["nulos_email"]) & (azar < config["nulos_email"] + config["vacios_email"]))[:, None]
+    return _a_arrow(matriz, azar < config["nulos_email"])
+
+def telefono_sucio(rng, personas, config):
+    """10 digitos por persona con los formatos de config["sucio_telefono"]"""
+    semilla, filas = config["semilla"], len(personas)
+    numeros = (100 + atributo(personas, semilla, 4, 900)) * 10_000_000 + 1_000_000 + atributo(personas, semilla, 5, 9_000_000)
+    digitos = _digitos(numeros, 10)
+    caso = _elegir(rng, filas, config["sucio_telefono"])
+    formatos = [FORMATOS_TELEFONO[c] for c in CASOS_TELEFONO]
+    ancho = max(sum(len(p) if isinstance(p, str) else p[1] - p[0] for p in f) for f in formatos)
+    matriz = np.zeros((filas, ancho), dtype=np.uint8)
+    # Cada caso arma sus filas con su formato; las de formatos mas cortos quedan con relleno al final
+    for i, partes in enumerate(formatos):
+        filas_caso = np.flatnonzero(caso == i)
+        if not len(filas_caso):
+            continue
+        suyos = np.take(digitos, filas_caso, axis=0)
+        bloque = _armar(len(filas_caso), [p if isinstance(p, str) else suyos[:, p[0]:p[1]] for p in partes])
+        matriz[filas_caso, :bloque.shape[1]] = bloque
+    return _a_arrow(matriz, rng.random(filas) < config["nulos_telefono"])
+
+def _prefijo(prefijo, numeros):
+    return _a_arrow(_armar(len(numeros), [prefijo, _digitos(numeros, _ancho_numero(numeros))]))
+
+def _texto(valores, lista):
+    return pa.array(lista, type=pa.string()).take(pa.array(valores))
+
+def _opcion(rng, filas, opciones):
+    return _texto(rng.integers(0, len(opciones), filas), opciones)
+
+# --- DATASETS ---
+# Cada uno arma un bloque (tabla Arrow) a partir de las filas [inicio, inicio + filas)
+def bloque_ecommerce(rng, inicio, personas, config):
+    filas = len(personas)
+    return pa.table({
+        "Order_ID": _prefijo("ORD-", 1000 + personas),
+        "Customer_Name": _a_arrow(_armar(filas, [np.take(_tabla(nombres), rng.integers(0, len(nombres), filas), axis=0),
+                                                 " ", np.take(_tabla(apellidos), rng.integers(0, len(apellidos), filas),
+                                                              axis=0)])),
+        "Buyer_Email": email_sucio(rng, personas, config),
+        "Contact_Phone": telefono_sucio(rng, personas, config),
+        "Total_Paid": np.round(rng.uniform(50.0, 5000.0, filas), 2),
+        "Status": _opcion(rng, filas, ["Paid", "Pending", "Refunded"]),
     })
 
-df1 = pd.DataFrame(data1)
-df1.to_csv(f"{output_folder}/1k_ecommerce_users.csv", index=False)
-print("✅ 1k_ecommerce_users.csv creado.")
-
-# ==========================================
-# ARCHIVO 2: 2,000 REGISTROS (XLSX) - Leads Agencia
-# ==========================================
-print("⚡ Generando Dataset 2 (2,000 filas)...")
-data2 = []
-for i in range(2000):
-    data2.append({
-        "Lead_ID": i + 1,
-        "Date": "2026-01-07",
-        "Campaign_Source": random.choice(["Facebook", "Google", "TikTok", "Organic"]),
-        "Target_Email": generar_email_sucio(),
-        "Target_Phone": generar_telefono_sucio(),
-        "User_ID_CRM": f"USER_{random.randint(10000, 99999)}", # Para probar la columna ID
-        "Notes": "Interesado en demo"
+def bloque_agency(rng, inicio, personas, config):
+    filas = len(personas)
+    return pa.table({
+        "Lead_ID": np.arange(inicio + 1, inicio + filas + 1),
+        "Date": pa.repeat("2026-01-07", filas),
+        "Campaign_Source": _opcion(rng, filas, ["Facebook", "Google", "TikTok", "Organic"]),
+        "Target_Email": email_sucio(rng, personas, config),
+        "Target_Phone": telefono_sucio(rng, personas, config),
+        "User_ID_CRM": _prefijo("USER_", 10000 + atributo(personas, config["semilla"], 6, 90000)),
+        "Notes": pa.repeat("Interesado en demo", filas),
     })
 
-df2 = pd.DataFrame(data2)
-df2.to_excel(f"{output_folder}/2k_agency_leads.xlsx", index=False)
-print("✅ 2k_agency_leads.xlsx creado.")
-
-# ==========================================
-# ARCHIVO 3: 3,000 REGISTROS (CSV) - Base de Datos Pesada
-# ==========================================
-print("⚡ Generando Dataset 3 (3,000 filas)...")
-data3 = []
-for i in range(3000):
-    data3.append({
-        "DB_Index": i,
-        "Raw_Email_String": generar_email_sucio(),
-        "Mobile_Number_V2": generar_telefono_sucio(),
-        "Legacy_ID": f"OLD-{random.randint(100,999)}",
-        "Region": random.choice(["North", "South", "East", "West"]),
-        "Is_Active": random.choice([True, False]),
-        "Last_Login": "2025-12-31"
+def bloque_legacy(rng, inicio, personas, config):
+    filas = len(personas)
+    email = email_sucio(rng, personas, config)
+    # Casos trampa de siempre: texto literal 'nan' en la fila 100 y nulo real en la 101
+    trampas = np.arange(inicio, inicio + filas)
+    if inicio <= 101 < inicio + filas:
+        email = pc.if_else(pa.array(trampas == 100), pa.scalar("nan"), email)
+        email = pc.if_else(pa.array(trampas == 101), pa.scalar(None, pa.string()), email)
+    return pa.table({
+        "DB_Index": np.arange(inicio, inicio + filas),
+        "Raw_Email_String": email,
+        "Mobile_Number_V2": telefono_sucio(rng, personas, config),
+        "Legacy_ID": _prefijo("OLD-", 100 + atributo(personas, config["semilla"], 7, 900)),
+        "Region": _opcion(rng, filas, ["North", "South", "East", "West"]),
+        "Is_Active": rng.random(filas) < 0.5,
+        "Last_Login": pa.repeat("2025-12-31", filas),
     })
 
-df3 = pd.DataFrame(data3)
-# Insertamos un caso trampa específico para probar tu parche de seguridad
-df3.at[100, "Raw_Email_String"] = "nan" # Texto literal 'nan'
-df3.at[101, "Raw_Email_String"] = None  # Nulo real
+DATASETS = {"ecommerce": bloque_ecommerce, "agency": bloque_agency, "legacy": bloque_legacy}
+
+# Los tres archivos de test_files_large: (dataset, filas, archivo)
+ARCHIVOS_ESTANDAR = (
+    ("ecommerce", 1_000, "1k_ecommerce_users.csv"),
+    ("agency", 2_000, "2k_agency_leads.xlsx"),
+    ("legacy", 3_000, "3k_legacy_database.csv"),
+)
+
+# --- ESCRITURA POR BLOQUES ---
+def formato_de(ruta):
+    """Formato segun la extension (.csv, .csv.gz, .xlsx, .parquet)"""
+    nombre = ruta.lower().removesuffix(".gz")
+    for formato in FORMATOS:
+        if nombre.endswith("." + formato):
+            return formato
+    raise ValueError(f"extension no soportada: {ruta} (usa .csv, .csv.gz, .xlsx o .parquet)")
+
+class EscritorBloques:
+    """Escribe tablas Arrow una tras otra en CSV (opcionalmente .gz), XLSX o Parquet"""
+
+    def __init__(self, ruta, formato):
+        self.ruta = ruta
+        self.formato = formato
+        self._escritor = None
+        self._libro = self._hoja = self._salida = None
+
+    def escribir(self, tabla):
+        if self.formato == "xlsx":
+            self._escribir_xlsx(tabla)
+            return
+        if self._escritor is None:
+            if self.formato == "parquet":
+                import pyarrow.parquet as pq
+                self._escritor = pq.ParquetWriter(self.ruta, tabla.schema)
+            else:
+                import pyarrow.csv as pacsv
+                self._salida = pa.output_stream(self.ruta, compression="gzip" if self.ruta.endswith(".gz") else None)
+                self._escritor = pacsv.CSVWriter(self._salida, tabla.schema)
+        self._escritor.write_table(tabla)
+
+    def _escribir_xlsx(self, tabla):
+        if self._libro is None:
+            from openpyxl import Workbook
+            self._libro = Workbook(write_only=True)
+            self._hoja = self._libro.create_sheet("Sheet1")
+            self._hoja.append(tabla.column_names)
+        columnas = [c.to_pylist() for c in tabla.columns]
+        for fila in zip(*columnas):
+            self._hoja.append(fila)
+
+    def cerrar(self):
+        if self._libro is not None:
+            self._libro.save(self.ruta)
+        if self._escritor is not None:
+            self._escritor.close()
+        if self._salida is not None:
+            self._salida.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+class _EnProceso:
+    """Como ProcessPoolExecutor.submit, pero ejecuta en este proceso (un solo worker)"""
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+def _generar_bloque(dataset, numero, inicio, personas, config):
+    """Tabla Arrow del bloque `numero`; su generador sale de (semilla, numero), asi no depende del proceso"""
+    rng = np.random.default_rng([config["semilla"], numero])
+    return DATASETS[dataset](rng, inicio, personas, config)
+
+def generar(dataset, filas, ruta, semilla=0, duplicados=0.0, nulos=None, vacios=None, sucio_email=None,
+            sucio_telefono=None, filas_bloque=FILAS_BLOQUE, workers=1, verbose=True):
+    """
+    Genera `filas` filas del dataset en `ruta` (el formato sale de la
+    extension), bloque por bloque. Con `workers` > 1 los bloques se arman en
+    procesos aparte mientras este escribe, en orden y con a lo mas dos
+    bloques por proceso en memoria. Retorna las personas distintas generadas.
+    """
+    formato = formato_de(ruta)
+    if formato == "xlsx" and filas > MAX_FILAS_XLSX:
+        raise ValueError(f"XLSX admite hasta {MAX_FILAS_XLSX:,} filas por hoja; usa CSV o Parquet")
+    if not 0 <= duplicados < 1:
+        raise ValueError("la tasa de duplicados debe estar entre 0 y 1")
+    config = {
+        "semilla": semilla,
+        "sucio_email": pesos_casos(sucio_email, CASOS_EMAIL),
+        "sucio_telefono": pesos_casos(sucio_telefono, CASOS_TELEFONO),
+        "nulos_email": NULOS_EMAIL if nulos is None else nulos,
+        "vacios_email": VACIOS_EMAIL if vacios is None else vacios,
+        "nulos_telefono": NULOS_TELEFONO if nulos is None else nulos,
+    }
+    # Las personas se asignan aqui, en orden (los duplicados apuntan a bloques anteriores); el resto del
+    # bloque usa su propio generador. Misma semilla y mismo tamaño de bloque: mismo archivo, con cualquier
+    # numero de workers
+    rng = np.random.default_rng(semilla)
+    inicios = range(0, filas, filas_bloque)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(inicios)))
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = _EnProceso()
+    # Bloques pedidos y aun sin escribir: da trabajo a todos los procesos sin acumular la salida
+    en_vuelo = 2 * workers if workers > 1 else 1
+    pendientes = deque()
+    inicio_reloj = time.perf_counter()
+    creadas = 0
+    with EscritorBloques(ruta, formato) as escritor, pool:
+        def escribir_siguiente():
+            futuro, hechas = pendientes.popleft()
+            escritor.escribir(futuro.result())
+            if verbose and filas > filas_bloque:
+                print(f"   {hechas:,}/{filas:,} filas ({hechas / (time.perf_counter() - inicio_reloj):,.0f} filas/s)")
+
+        for numero, inicio in enumerate(inicios):
+            n = min(filas_bloque, filas - inicio)
+            personas, creadas = asignar_personas(rng, n, creadas, duplicados)
+            pendientes.append((pool.submit(_generar_bloque, dataset, numero, inicio, personas, config), inicio + n))
+            if len(pendientes) >= en_vuelo:
+                escribir_siguiente()
+        while pendientes:
+            escribir_siguiente()
+    return creadas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=list(DATASETS), help="Estructura de columnas a generar")
+    parser.add_argument("--filas", type=int, help="Filas a generar")
+    parser.add_argument("--salida", help="Archivo de salida (.csv, .csv.gz, .xlsx o .parquet)")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla (misma semilla, mismo archivo)")
+    parser.add_argument("--duplicados", type=float, default=0.0, help="Fraccion de filas que repiten una persona")
+    parser.add_argument("--nulos", type=float, help="Fraccion de nulos en email y telefono "
+                        f"(por defecto {NULOS_EMAIL:g} email, {NULOS_TELEFONO:g} telefono)")
+    parser.add_argument("--vacios", type=float, help=f"Fraccion de emails vacios (por defecto {VACIOS_EMAIL:g})")
+    parser.add_argument("--sucio-email", help=f"Pesos por caso, p. ej. mayusculas=1,limpio=3 ({', '.join(CASOS_EMAIL)})")
+    parser.add_argument("--sucio-telefono", help=f"Pesos por caso ({', '.join(CASOS_TELEFONO)})")
+    parser.add_argument("--filas-bloque", type=int, default=FILAS_BLOQUE, help="Filas por bloque en memoria")
+    parser.add_argument("--workers", type=int, help="Procesos que arman bloques (por defecto todos los nucleos)")
+    args = parser.parse_args()
+
+    opciones = dict(semilla=args.semilla, duplicados=args.duplicados, nulos=args.nulos, vacios=args.vacios,
+                    sucio_email=args.sucio_email, sucio_telefono=args.sucio_telefono, filas_bloque=args.filas_bloque,
+                    workers=args.workers)
+    if args.dataset is None:
+        if args.filas or args.salida:
+            parser.error("--filas y --salida requieren --dataset")
+        # Sin dataset: los tres archivos de siempre en test_files_large
+        output_folder = "test_files_large"
+        os.makedirs(output_folder, exist_ok=True)
+        print(f"🚀 Iniciando generación masiva en: {output_folder} ...")
+        for dataset, filas, archivo in ARCHIVOS_ESTANDAR:
+            generar(dataset, filas, os.path.join(output_folder, archivo), **opciones)
+            print(f"✅ {archivo} creado.")
+        print(f"\n🎉 ¡Generación Masiva Completa! Revisa la carpeta '{output_folder}'")
+        return
 
-df3.to_csv(f"{output_folder}/3k_legacy_database.csv", index=False)
-print("✅ 3k_legacy_database.csv creado.")
+    if not args.filas or not args.salida:
+        parser.error("con --dataset indica --filas y --salida")
+    try:
+        inicio = time.perf_counter()
+        personas = generar(args.dataset, args.filas, args.salida, **opciones)
+    except ValueError as e:
+        parser.error(str(e))
+    segundos = time.perf_counter() - inicio
+    megas = os.path.getsize(args.salida) / 1024 / 1024
+    print(f"✅ {args.salida}: {args.filas:,} filas ({personas:,} personas distintas), {megas:,.1f} MB "
+          f"en {segundos:.1f} s ({args.filas / segundos:,.0f} filas/s)")
 
-print("\n🎉 ¡Generación Masiva Completa! Revisa la carpeta 'test_files_large'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
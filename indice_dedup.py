@@ -0,0 +1,366 @@
+"""
+Indice persistente de deduplicacion de AdData Cleaner.
+
+Las plataformas de anuncios cobran por fila enviada: este indice recuerda en
+disco las claves ya subidas (digest de 16 bytes de los identificadores de
+cada fila, nunca el valor) para descartar o marcar las que se repiten, dentro
+del archivo o contra cargas anteriores.
+
+- Filtro de Bloom en un archivo mapeado en memoria: descarta rapido las claves
+  nuevas y ocupa lo que el filtro, no lo que el historial.
+- Almacen exacto: segmentos .npy de digests ordenados (dos enteros de 64 bits
+  por digest), mapeados en memoria y consultados con busqueda binaria
+  vectorizada; confirma los positivos del filtro. Los segmentos pequeños se
+  fusionan al crecer hasta MAX_FILAS_SEGMENTO filas: hay unos pocos
+  segmentos chicos mas uno por cada MAX_FILAS_SEGMENTO claves del historial
+  (no se compactan; cada consulta recorre todos).
+
+Las claves de una corrida se escriben al procesar cada bloque; si la corrida
+falla o se cancela, descartar_corrida() las quita (el filtro no se limpia:
+solo deja algun falso positivo mas, que el almacen exacto descarta).
+
+Varios procesos pueden compartir la carpeta: cada bloque se resuelve con un
+lock de archivo, el filtro es un mmap compartido y la lista de segmentos se
+reemplaza de forma atomica en indice.json.
+"""
+import contextlib
+import hashlib
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se protege entre hilos del mismo proceso
+    fcntl = None
+
+CARPETA_POR_DEFECTO = os.environ.get("ADDATA_DEDUP_DIR", os.path.join(os.path.expanduser("~"), ".addata_dedup"))
+# Claves esperadas y tasa de falsos positivos del filtro (10M claves ~ 18 MB en disco)
+CAPACIDAD = 10_000_000
+TASA_FALSOS = 0.001
+# Un segmento no crece mas alla de esto al fusionar (limita la RAM de la fusion)
+MAX_FILAS_SEGMENTO = 4_000_000
+# Archivos de un segmento: 8 bytes altos y bajos de cada digest, y su marca (corrida y bloque)
+SUFIJOS_SEGMENTO = (".altos.npy", ".bajos.npy", ".corridas.npy")
+
+# Cada digest se guarda con su marca: corrida * BLOQUES_POR_CORRIDA + bloque del archivo.
+# El bloque permite retomar una corrida desde un checkpoint sin confundir las claves
+# que agrego un bloque interrumpido con repetidas de bloques anteriores
+BLOQUES_POR_CORRIDA = 2 ** 32
+
+MODOS_DEDUP = ("eliminar", "marcar")
+COLUMNA_DUPLICADO = "es_duplicado"
+
+def digest_claves(claves):
+    """
+    Digest blake2b de 16 bytes de cada clave como arreglo (n, 2) de uint64:
+    (primeros 8 bytes, ultimos 8 bytes) big-endian, que ordena igual que los bytes.
+    """
+    blake2b = hashlib.blake2b
+    datos = b"".join([blake2b(c.encode(), digest_size=16).digest() for c in claves])
+    return np.frombuffer(datos, dtype=">u8").reshape(-1, 2).astype(np.uint64)
+
+class IndiceDedup:
+    """
+    Conjunto persistente de digests en `carpeta`. La capacidad y la tasa de
+    falsos positivos solo se usan al crear el indice; despues se leen de disco.
+    """
+
+    def __init__(self, carpeta=CARPETA_POR_DEFECTO, capacidad=CAPACIDAD, tasa_falsos=TASA_FALSOS):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self._lock = threading.Lock()
+        self._archivo_lock = open(os.path.join(carpeta, "indice.lock"), "a")
+        self._abiertos = {}
+        with self._bloqueo():
+            if self._estado is None:
+                bits = math.ceil(-capacidad * math.log(tasa_falsos) / math.log(2) ** 2)
+                bits = -(-bits // 8) * 8
+                self._estado = {"bits": bits, "funciones": max(1, round(bits / capacidad * math.log(2))),
+                                "corridas": 0, "siguiente": 1, "segmentos": []}
+                self._guardar_estado()
+            self.bits = self._estado["bits"]
+            self.funciones = self._estado["funciones"]
+
+            ruta = os.path.join(carpeta, "bloom.bin")
+            reconstruir = not os.path.exists(ruta) or os.path.getsize(ruta) != self.bits // 8
+            if reconstruir:
+                with open(ruta, "wb") as archivo:
+                    archivo.truncate(self.bits // 8)
+            self._filtro = np.memmap(ruta, dtype=np.uint8, mode="r+")
+            if reconstruir:
+                # Filtro perdido o de otro tamaño: se rehace desde el almacen exacto
+                for altos, bajos, _ in self._segmentos():
+                    for inicio in range(0, len(altos), 1_000_000):
+                        fin = inicio + 1_000_000
+                        self._marcar(self._posiciones(np.column_stack([altos[inicio:fin], bajos[inicio:fin]])))
+                self._filtro.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def __len__(self):
+        with self._bloqueo():
+            return sum(s["filas"] for s in self._estado["segmentos"])
+
+    @contextlib.contextmanager
+    def _bloqueo(self):
+        """
+        Exclusion entre hilos y, con fcntl, entre procesos. Al entrar se relee
+        indice.json: otro proceso pudo agregar segmentos.
+        """
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._archivo_lock, fcntl.LOCK_EX)
+            try:
+                self._estado = self._leer_estado()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._archivo_lock, fcntl.LOCK_UN)
+
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, nombre)
+
+    def _leer_estado(self):
+        try:
+            with open(self._ruta("indice.json")) as archivo:
+                return json.load(archivo)
+        except FileNotFoundError:
+            return None
+
+    def _guardar_estado(self):
+        """Escribe indice.json de forma atomica (archivo temporal + replace)"""
+        temporal = self._ruta("indice.json.tmp")
+        with open(temporal, "w") as archivo:
+            json.dump(self._estado, archivo)
+        os.replace(temporal, self._ruta("indice.json"))
+
+    def _segmentos(self):
+        """(altos, bajos, corridas) de cada segmento vigente, ordenados por (alto, bajo) y mapeados en memoria"""
+        vigentes = [s["nombre"] for s in self._estado["segmentos"]]
+        for nombre in set(self._abiertos) - set(vigentes):
+            del self._abiertos[nombre]
+        for nombre in vigentes:
+            if nombre not in self._abiertos:
+                self._abiertos[nombre] = self._cargar(nombre, mmap_mode="r")
+        return [self._abiertos[nombre] for nombre in vigentes]
+
+    def _posiciones(self, digests):
+        """Bits del filtro de cada digest: h1 + i*h2 (doble hashing), una fila por digest"""
+        i = np.arange(self.funciones, dtype=np.uint64)
+        return (digests[:, :1] + i * digests[:, 1:]) % np.uint64(self.bits)
+
+    def _en_filtro(self, posiciones):
+        desplazamiento = (posiciones & np.uint64(7)).astype(np.uint8)
+        return ((self._filtro[posiciones >> np.uint64(3)] >> desplazamiento) & 1).all(axis=1)
+
+    def _marcar(self, posiciones):
+        posiciones = posiciones.ravel()
+        # Con bytes repetidos en una asignacion solo queda una escritura: se repite con los bits
+        # que faltaron (mucho mas rapido que np.bitwise_or.at; casi siempre basta una vuelta)
+        while len(posiciones):
+            indices = posiciones >> np.uint64(3)
+            mascaras = np.left_shift(np.uint8(1), (posiciones & np.uint64(7)).astype(np.uint8))
+            self._filtro[indices] |= mascaras
+            posiciones = posiciones[(self._filtro[indices] & mascaras) == 0]
+
+    def _buscar(self, digests):
+        """Marca con que se vio cada digest, o -1"""
+        previas = np.full(len(digests), -1, dtype=np.int64)
+        # Consultas en orden: la busqueda binaria recorre el segmento mapeado de forma secuencial
+        orden = np.argsort(digests[:, 0])
+        digests = digests[orden]
+        for altos, bajos, corridas in self._segmentos():
+            # Busqueda binaria por los 8 bytes altos; si dos digests los comparten
+            # (casi imposible) se avanza hasta dar con el bajo o cambiar de alto
+            pendientes = np.arange(len(digests))
+            posicion = np.searchsorted(altos, digests[:, 0])
+            while len(pendientes):
+                posicion = np.minimum(posicion, len(altos) - 1)
+                mismo_alto = altos[posicion] == digests[pendientes, 0]
+                encontrados = mismo_alto & (bajos[posicion] == digests[pendientes, 1])
+                previas[pendientes[encontrados]] = corridas[posicion[encontrados]]
+                seguir = mismo_alto & ~encontrados & (posicion < len(altos) - 1)
+                pendientes, posicion = pendientes[seguir], posicion[seguir] + 1
+        resultado = np.empty_like(previas)
+        resultado[orden] = previas
+        return resultado
+
+    def _agregar(self, digests, marca):
+        """
+        Guarda digests nuevos (distintos entre si y del indice) como un segmento;
+        mientras el ultimo segmento no sea mas del doble, se fusiona con el nuevo.
+        """
+        orden = np.lexsort((digests[:, 1], digests[:, 0]))
+        altos, bajos = digests[orden, 0], digests[orden, 1]
+        corridas = np.full(len(altos), marca, dtype=np.int64)
+        segmentos = self._estado["segmentos"]
+        fusionados = []
+        while (segmentos and segmentos[-1]["filas"] <= 2 * len(altos)
+               and segmentos[-1]["filas"] + len(altos) <= MAX_FILAS_SEGMENTO):
+            nombre = segmentos.pop()["nombre"]
+            self._abiertos.pop(nombre, None)
+            viejos = self._cargar(nombre)
+            altos, bajos, corridas = (np.concatenate([v, n]) for v, n in zip(viejos, (altos, bajos, corridas)))
+            orden = np.lexsort((bajos, altos))
+            altos, bajos, corridas = altos[orden], bajos[orden], corridas[orden]
+            fusionados.append(nombre)
+
+        nombre = f"{self._estado['siguiente']:08d}"
+        self._estado["siguiente"] += 1
+        for sufijo, arreglo in zip(SUFIJOS_SEGMENTO, (altos, bajos, corridas)):
+            np.save(self._ruta(nombre + sufijo), arreglo)
+        segmentos.append({"nombre": nombre, "filas": len(altos)})
+        self._guardar_estado()
+        # Otro proceso puede tener mapeado un segmento fusionado: en POSIX borrarlo no le afecta
+        for viejo in fusionados:
+            for sufijo in SUFIJOS_SEGMENTO:
+                with contextlib.suppress(OSError):
+                    os.remove(self._ruta(viejo + sufijo))
+
+    def _cargar(self, nombre, mmap_mode=None):
+        return tuple(np.load(self._ruta(nombre + sufijo), mmap_mode=mmap_mode) for sufijo in SUFIJOS_SEGMENTO)
+
+    def descartar_corrida(self, corrida):
+        """Quita del almacen exacto las claves que agrego la corrida; retorna cuantas"""
+        quitadas = 0
+        with self._bloqueo():
+            vigentes, borrados = [], []
+            for segmento, (_, _, corridas) in zip(self._estado["segmentos"], self._segmentos()):
+                propias = corridas // BLOQUES_POR_CORRIDA == corrida
+                if not propias.any():
+                    vigentes.append(segmento)
+                    continue
+                quitadas += int(propias.sum())
+                borrados.append(segmento["nombre"])
+                arreglos = [a[~propias] for a in self._cargar(segmento["nombre"])]
+                if len(arreglos[0]):
+                    # Otro nombre: un proceso que tenga mapeado el segmento viejo no ve un archivo a medias
+                    nombre = f"{self._estado['siguiente']:08d}"
+                    self._estado["siguiente"] += 1
+                    for sufijo, arreglo in zip(SUFIJOS_SEGMENTO, arreglos):
+                        np.save(self._ruta(nombre + sufijo), arreglo)
+                    vigentes.append({"nombre": nombre, "filas": len(arreglos[0])})
+            if borrados:
+                self._estado["segmentos"] = vigentes
+                self._guardar_estado()
+                for viejo in borrados:
+                    self._abiertos.pop(viejo, None)
+                    for sufijo in SUFIJOS_SEGMENTO:
+                        with contextlib.suppress(OSError):
+                            os.remove(self._ruta(viejo + sufijo))
+        return quitadas
+
+    def nueva_corrida(self):
+        """Numero de corrida nuevo (uno por archivo procesado)"""
+        with self._bloqueo():
+            self._estado["corridas"] += 1
+            self._guardar_estado()
+            return self._estado["corridas"]
+
+    def consultar_y_agregar(self, digests, marca):
+        """
+        Para cada digest (todos distintos) retorna la marca con que se vio por
+        primera vez, o -1 si es nuevo; los nuevos quedan registrados con `marca`.
+        """
+        previas = np.full(len(digests), -1, dtype=np.int64)
+        if not len(digests):
+            return previas
+        posiciones = self._posiciones(digests)
+        with self._bloqueo():
+            # Solo los positivos del filtro se buscan en el almacen exacto
+            candidatos = np.flatnonzero(self._en_filtro(posiciones))
+            if len(candidatos):
+                previas[candidatos] = self._buscar(digests[candidatos])
+            nuevos = np.flatnonzero(previas < 0)
+            if len(nuevos):
+                self._agregar(digests[nuevos], marca)
+                self._marcar(posiciones[nuevos])
+                self._filtro.flush()
+        return previas
+
+    def cerrar(self):
+        with self._lock:
+            self._filtro.flush()
+            self._abiertos.clear()
+            self._archivo_lock.close()
+
+class CorridaDedup:
+    """
+    Deduplicacion de un archivo contra el indice, con conteos de la corrida.
+    Cada llamada a duplicados() es un bloque del archivo, en orden.
+    """
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.id = indice.nueva_corrida()
+        self.bloque = 0
+        self.filas = 0
+        self.nuevas = 0
+        self.duplicadas_archivo = 0
+        self.duplicadas_historial = 0
+        self.sin_clave = 0
+
+    def duplicados(self, claves):
+        """
+        Mascara de filas ya vistas (antes en este archivo o en cargas
+        anteriores) a partir de la clave de cada fila. La clave "" (fila sin
+        identificadores) nunca cuenta como duplicada.
+        """
+        codigos, unicos = pd.factorize(pd.Series(claves, dtype=object))
+        unicos = np.asarray(unicos, dtype=object)
+        vacia = unicos == ""
+        previas = np.full(len(unicos), -1, dtype=np.int64)
+        validos = np.flatnonzero(~vacia)
+        marca = self.id * BLOQUES_POR_CORRIDA + self.bloque
+        previas[validos] = self.indice.consultar_y_agregar(digest_claves(unicos[validos]), marca)
+        # Los indices de antes de las marcas por bloque guardan solo la corrida: se leen como corrida 0 (historial)
+        corrida_previa = np.where(previas >= 0, previas // BLOQUES_POR_CORRIDA, -1)
+        misma_corrida = corrida_previa == self.id
+        # Claves que agrego este mismo bloque en un intento interrumpido: cuentan como nuevas
+        anterior = misma_corrida & (previas % BLOQUES_POR_CORRIDA < self.bloque)
+
+        sin_clave = vacia[codigos]
+        historial = ((corrida_previa >= 0) & ~misma_corrida)[codigos]
+        # Repetida en este archivo: ya vista en un bloque anterior o no es su primera aparicion en el bloque
+        archivo = (anterior[codigos] | pd.Series(codigos).duplicated().to_numpy()) & ~historial & ~sin_clave
+        self.bloque += 1
+
+        self.filas += len(codigos)
+        self.sin_clave += int(sin_clave.sum())
+        self.duplicadas_historial += int(historial.sum())
+        self.duplicadas_archivo += int(archivo.sum())
+        self.nuevas = self.filas - self.sin_clave - self.duplicadas_historial - self.duplicadas_archivo
+        return historial | archivo
+
+    def descartar(self):
+        """La corrida fallo o se cancelo: sus claves salen del indice (ver IndiceDedup.descartar_corrida)"""
+        self.indice.descartar_corrida(self.id)
+
+    def estado(self):
+        """Lo necesario para retomar la corrida desde un checkpoint (ver reanudar)"""
+        return {"id": self.id, "bloque": self.bloque, **self.estadisticas()}
+
+    def reanudar(self, estado):
+        """Continua una corrida interrumpida: mismo id, siguiente bloque y los conteos ya hechos"""
+        self.id = estado["id"]
+        self.bloque = estado["bloque"]
+        for campo in ("filas", "nuevas", "duplicadas_archivo", "duplicadas_historial", "sin_clave"):
+            setattr(self, campo, estado[campo])
+
+    def estadisticas(self):
+        return {
+            "filas": self.filas,
+            "nuevas": self.nuevas,
+            "duplicadas_archivo": self.duplicadas_archivo,
+            "duplicadas_historial": self.duplicadas_historial,
+            "sin_clave": self.sin_clave,
+        }
@@ -0,0 +1,230 @@
+"""
+Instrumentacion por etapa de AdData Cleaner y del Auditor Fiscal.
+
+Una corrida (un archivo, un lote, una auditoria de XML) se mide con una
+Medicion. Cada etapa (leer, limpiar, hash, dedup, escribir, exportar en el
+limpiador; parsear, validar, exportar en el auditor) acumula:
+
+- segundos propios: el tiempo de una etapa anidada (hash dentro de limpiar)
+  se descuenta de la etapa que la contiene, asi las etapas suman el total;
+- unidades procesadas (filas o archivos) y unidades por segundo;
+- RSS pico: el maximo RSS del proceso visto al cerrar la etapa (se muestrea
+  en cada bloque, no es continuo).
+
+El codigo del motor marca sus etapas con etapa() y medir_iterador(), que no
+hacen nada si no hay una Medicion activa en el hilo (Medicion.activa()).
+
+Salidas: resumen() para el panel de debug de las apps y una linea JSON por
+corrida en ARCHIVO_METRICAS (ADDATA_METRICAS; vacio para no escribir). Los
+perfiladores se enganchan con registrar_perfilador(): envuelven cada
+corrida activa. Con ADDATA_PERFIL_DIR se registra cProfile y cada corrida
+deja <carpeta>/<nombre>_<corrida>.prof.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ARCHIVO_METRICAS = os.environ.get(
+    "ADDATA_METRICAS", os.path.join(os.path.expanduser("~"), ".addata_metricas.jsonl"))
+CARPETA_PERFILES = os.environ.get("ADDATA_PERFIL_DIR")
+
+_medicion_activa = contextvars.ContextVar("medicion_activa", default=None)
+_perfiladores = []
+_escritura = threading.Lock()
+
+def rss_actual():
+    """RSS del proceso en bytes (en Linux el actual; si no, el pico del proceso)"""
+    try:
+        with open("/proc/self/statm") as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return rss_pico_proceso()
+
+def rss_pico_proceso():
+    """Pico de RSS del proceso desde que arranco, en bytes (0 si no se puede medir)"""
+    if resource is None:
+        return 0
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+def registrar_perfilador(fabrica):
+    """
+    Engancha un perfilador a todas las corridas: `fabrica(medicion)` retorna
+    un context manager que envuelve la corrida (en el hilo que la ejecuta).
+    Retorna la fabrica, para usarse como decorador.
+    """
+    _perfiladores.append(fabrica)
+    return fabrica
+
+def quitar_perfilador(fabrica):
+    _perfiladores.remove(fabrica)
+
+def perfilador_cprofile(carpeta):
+    """Fabrica de perfilador: cProfile por corrida, guardado en <carpeta>/<nombre>_<corrida>.prof"""
+    @contextlib.contextmanager
+    def perfilar(medicion):
+        import cProfile
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Otro perfilador ya esta activo en el proceso: esta corrida no se perfila
+            yield
+            return
+        try:
+            yield
+        finally:
+            perfil.disable()
+            os.makedirs(carpeta, exist_ok=True)
+            perfil.dump_stats(os.path.join(carpeta, f"{medicion.nombre}_{medicion.id}.prof"))
+    return perfilar
+
+if CARPETA_PERFILES:
+    registrar_perfilador(perfilador_cprofile(CARPETA_PERFILES))
+
+class Medicion:
+    """Mediciones de una corrida: segundos, unidades y RSS pico por etapa"""
+
+    def __init__(self, nombre, **contexto):
+        self.nombre = nombre
+        self.contexto = contexto
+        self.id = uuid.uuid4().hex[:12]
+        self.etapas = {}
+        self.inicio = time.time()
+        self.segundos = None
+        self._pila = []
+
+    def agregar(self, etapa, segundos, unidades=0, rss=None):
+        """Suma tiempo y unidades a una etapa (para mediciones hechas fuera de etapa())"""
+        datos = self.etapas.setdefault(etapa, {"segundos": 0.0, "unidades": 0, "llamadas": 0, "rss_pico": 0})
+        datos["segundos"] += segundos
+        datos["unidades"] += unidades
+        datos["llamadas"] += 1
+        datos["rss_pico"] = max(datos["rss_pico"], rss if rss is not None else rss_actual())
+
+    @contextlib.contextmanager
+    def etapa(self, nombre, unidades=0):
+        """Mide el bloque como etapa `nombre`; `medida["unidades"]` se puede fijar adentro"""
+        medida = {"unidades": unidades}
+        # Cada nivel de la pila acumula el tiempo de sus etapas hijas, que se descuenta del propio
+        self._pila.append(0.0)
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        finally:
+            total = time.perf_counter() - inicio
+            hijas = self._pila.pop()
+            if self._pila:
+                self._pila[-1] += total
+            self.agregar(nombre, total - hijas, medida["unidades"])
+
+    def combinar(self, etapas):
+        """Suma las etapas medidas en otro proceso (los archivos de un lote)"""
+        for nombre, otra in etapas.items():
+            datos = self.etapas.setdefault(nombre, {"segundos": 0.0, "unidades": 0, "llamadas": 0, "rss_pico": 0})
+            for campo in ("segundos", "unidades", "llamadas"):
+                datos[campo] += otra[campo]
+            datos["rss_pico"] = max(datos["rss_pico"], otra["rss_pico"])
+
+    @contextlib.contextmanager
+    def activa(self):
+        """Hace de esta la medicion del hilo (para etapa()) y aplica los perfiladores registrados"""
+        token = _medicion_activa.set(self)
+        inicio = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as pila:
+                for fabrica in list(_perfiladores):
+                    pila.enter_context(fabrica(self))
+                yield self
+        except BaseException as e:
+            # La corrida cortada (error o cancelacion) tambien queda registrada
+            self.contexto["error"] = type(e).__name__
+            raise
+        finally:
+            self.segundos = (self.segundos or 0.0) + time.perf_counter() - inicio
+            _medicion_activa.reset(token)
+
+    def resumen(self):
+        """Lista de etapas con segundos, unidades, unidades por segundo y RSS pico en MB"""
+        return [
+            {
+                "etapa": nombre,
+                "segundos": round(datos["segundos"], 4),
+                "unidades": datos["unidades"],
+                "por_segundo": round(datos["unidades"] / datos["segundos"], 1) if datos["segundos"] > 0 else None,
+                "llamadas": datos["llamadas"],
+                "rss_pico_mb": round(datos["rss_pico"] / 1024 / 1024, 1),
+            }
+            for nombre, datos in self.etapas.items()
+        ]
+
+    def registro(self):
+        """Diccionario de la corrida completa (una linea del archivo JSON lines)"""
+        return {
+            "corrida": self.id,
+            "nombre": self.nombre,
+            "inicio": datetime.fromtimestamp(self.inicio, timezone.utc).isoformat(),
+            "segundos": round(self.segundos or 0.0, 4),
+            "pid": os.getpid(),
+            "rss_pico_proceso_mb": round(rss_pico_proceso() / 1024 / 1024, 1),
+            **self.contexto,
+            "etapas": self.resumen(),
+        }
+
+    def escribir_jsonl(self, ruta=ARCHIVO_METRICAS):
+        """
+        Agrega el registro de la corrida al archivo JSON lines. Sin ruta no hace
+        nada; si no se puede escribir retorna False (las metricas no cortan el proceso).
+        """
+        if not ruta:
+            return False
+        linea = json.dumps(self.registro(), ensure_ascii=False, default=str)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            with _escritura, open(ruta, "a", encoding="utf-8") as archivo:
+                archivo.write(linea + "\n")
+        except OSError:
+            return False
+        return True
+
+def medicion_activa():
+    """La Medicion activa en este hilo, o None"""
+    return _medicion_activa.get()
+
+def etapa(nombre, unidades=0):
+    """Context manager que mide una etapa en la medicion activa; sin medicion no hace nada"""
+    medicion = _medicion_activa.get()
+    if medicion is None:
+        return contextlib.nullcontext({"unidades": unidades})
+    return medicion.etapa(nombre, unidades)
+
+def medir_iterador(nombre, iterable, unidades=len):
+    """
+    Recorre `iterable` midiendo como etapa `nombre` el tiempo de obtener cada
+    elemento (la lectura de cada bloque); `unidades(elemento)` da sus filas.
+    """
+    medicion = _medicion_activa.get()
+    if medicion is None:
+        yield from iterable
+        return
+    iterador = iter(iterable)
+    while True:
+        with medicion.etapa(nombre) as medida:
+            try:
+                elemento = next(iterador)
+            except StopIteration:
+                return
+            medida["unidades"] = unidades(elemento)
+        yield elemento
@@ -0,0 +1,137 @@
+"""
+Validacion de licencias contra la API de Lemon Squeezy.
+
+- Una sola sesion HTTP con pool de conexiones y timeouts estrictos.
+- Cache con TTL de resultados positivos y negativos por clave, para no
+  re-activar la misma licencia en cada click.
+- Validacion en segundo plano (Future) mientras se procesan los datos.
+
+La URL de la API se puede cambiar con LEMON_SQUEEZY_URL, por ejemplo para
+probar contra stub_lemon_squeezy.py en local.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- CONFIGURACIÓN DE CLAVES ---
+# Tu clave maestra para entrar siempre sin validar en Lemon Squeezy
+MASTER_KEY = "ADMIN-2026"
+
+URL_API = os.environ.get("LEMON_SQUEEZY_URL", "https://api.lemonsqueezy.com") + "/v1/licenses/activate"
+INSTANCIA = "AdDataCleaner_Web_User"
+
+# Segundos: conectar / esperar respuesta
+TIMEOUT = (3, 10)
+# Cuanto se recuerda un resultado: clave valida, clave rechazada por la API
+TTL_VALIDA = 60 * 60
+TTL_INVALIDA = 5 * 60
+# Locks por franja de claves: un numero fijo, no uno por cada clave que se intento alguna vez
+FRANJAS_LOCK = 64
+
+_sesion = None
+_lock_sesion = threading.Lock()
+_cache = {}
+_lock_cache = threading.Lock()
+# Dos validaciones simultaneas de la misma clave usan el mismo lock: se activa una sola vez
+_locks_clave = [threading.Lock() for _ in range(FRANJAS_LOCK)]
+_ejecutor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="licencias")
+
+def _obtener_sesion():
+    """Sesion compartida; solo reintenta errores de conexion (activar no es idempotente)"""
+    global _sesion
+    with _lock_sesion:
+        if _sesion is None:
+            _sesion = requests.Session()
+            reintentos = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+            _sesion.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=reintentos))
+            _sesion.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=reintentos))
+        return _sesion
+
+def _desde_cache(license_key):
+    with _lock_cache:
+        entrada = _cache.get(license_key)
+        if entrada is None:
+            return None
+        expira, resultado = entrada
+        if expira < time.monotonic():
+            del _cache[license_key]
+            return None
+        return resultado
+
+def _lock_de(license_key):
+    return _locks_clave[hash(license_key) % FRANJAS_LOCK]
+
+def _guardar_cache(license_key, resultado, ttl):
+    """Guarda el resultado y olvida los vencidos (claves probadas una vez y nunca mas)"""
+    ahora = time.monotonic()
+    with _lock_cache:
+        for clave in [c for c, (expira, _) in _cache.items() if expira < ahora]:
+            del _cache[clave]
+        _cache[license_key] = (ahora + ttl, resultado)
+
+def limpiar_cache():
+    """Olvida todos los resultados guardados"""
+    with _lock_cache:
+        _cache.clear()
+
+def _consultar_api(license_key):
+    """
+    Una llamada a la API. Retorna (resultado, ttl); ttl=0 si el resultado no
+    debe guardarse (errores de red, limite de peticiones, fallas del servidor).
+    """
+    payload = {
+        "license_key": license_key,
+        "instance_name": INSTANCIA
+    }
+    try:
+        response = _obtener_sesion().post(URL_API, data=payload, timeout=TIMEOUT)
+    except requests.Timeout:
+        return (False, "Error de conexión: la API de licencias no respondió a tiempo"), 0
+    except requests.RequestException as e:
+        return (False, f"Error de conexión: {str(e)}"), 0
+
+    if response.status_code == 429:
+        return (False, "Demasiados intentos, espera un momento y vuelve a validar"), 0
+    if response.status_code >= 500:
+        return (False, f"Error de conexión: la API respondió {response.status_code}"), 0
+
+    try:
+        data = response.json()
+    except ValueError:
+        return (False, f"Error de conexión: respuesta inválida ({response.status_code})"), 0
+
+    # Verificar si la respuesta fue exitosa
+    if data.get("activated") is True:
+        # Clave válida y activa
+        return (True, f"Licencia Activa ({license_key})"), TTL_VALIDA
+    # Clave inválida, expirada o ya usada al máximo
+    return (False, data.get("error") or "Clave no válida"), TTL_INVALIDA
+
+def validar_con_lemon_squeezy(license_key):
+    """
+    Valida la clave contra la API oficial de Lemon Squeezy.
+    Retorna: (Es_Valida, Mensaje_o_Nombre)
+    """
+    # Si usas tu clave maestra, pase directo
+    if license_key == MASTER_KEY:
+        return True, "Administrador (Master Key)"
+
+    resultado = _desde_cache(license_key)
+    if resultado is not None:
+        return resultado
+    with _lock_de(license_key):
+        resultado = _desde_cache(license_key)
+        if resultado is None:
+            resultado, ttl = _consultar_api(license_key)
+            if ttl:
+                _guardar_cache(license_key, resultado, ttl)
+    return resultado
+
+def validar_en_segundo_plano(license_key):
+    """Lanza la validacion en un hilo; retorna un Future con (Es_Valida, Mensaje)"""
+    return _ejecutor.submit(validar_con_lemon_squeezy, license_key)
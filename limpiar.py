@@ -0,0 +1,222 @@
+"""
+AdData Cleaner desde la linea de comandos (sin navegador).
+
+Ejemplos:
+  python limpiar.py datos.csv -o datos_limpio.csv --email Buyer_Email --telefono Contact_Phone
+  python limpiar.py exportaciones/ -o limpios/ --email Target_Email --id User_ID_CRM --workers 8
+  python limpiar.py a.csv b.xlsx -o limpios/ --telefono Celular --sin-hash
+  python limpiar.py enorme.csv -o enorme_limpio.csv --email Raw_Email_String --motor arrow
+  python limpiar.py warehouse.parquet -o audiencia.parquet --email email --telefono phone
+  python limpiar.py enorme.csv -o enorme_limpio.csv.gz --email Raw_Email_String
+  python limpiar.py exportaciones/ -o limpios/ --email Target_Email --compresion zstd
+  python limpiar.py semana_42.zip -o semana_42.csv.gz --combinar --email Target_Email --telefono Target_Phone
+  python limpiar.py audiencia.csv -o audiencia_nueva.csv --email Buyer_Email --dedup
+  python limpiar.py exportaciones/ -o limpios/ --auto
+  python limpiar.py enorme.csv -o enorme_limpio.csv.gz --email Raw_Email_String --reanudar
+  python limpiar.py crm.csv -o audiencias.parquet --email Email --telefono Phone --perfil hash,e164_hash,hash_bin
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+from checkpoints import CARPETA_CHECKPOINTS, CheckpointOcupado, borrar_checkpoint, ruta_checkpoint, usar_checkpoint
+from detector_columnas import describir_deteccion
+from indice_dedup import CARPETA_POR_DEFECTO, CorridaDedup, IndiceDedup
+from motor_limpieza import (COL_AUTO, COL_IGNORAR, COMPRESIONES, EXTENSIONES_COMPRESION, EXTENSIONES_ENTRADA, EXTENSIONES_SALIDA,
+                            FORMATOS_SALIDA, MOTORES_CSV, TAMANO_CHUNK, VARIANTES, combinar_salidas,
+                            descartar_corridas, extension, extraer_zip, procesar_archivo, procesar_lote,
+                            resolver_columnas, tipos_mapeados, validar_perfil)
+
+def expandir_entradas(entradas, carpeta_zip):
+    """
+    Archivos tal cual; carpetas -> sus archivos soportados (sin recursion);
+    ZIP -> sus archivos soportados, extraidos a `carpeta_zip`.
+    """
+    rutas = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            rutas += expandir_entradas(sorted(
+                os.path.join(entrada, nombre) for nombre in os.listdir(entrada)
+                if nombre.lower().endswith(EXTENSIONES_ENTRADA + (".zip",))
+            ), carpeta_zip)
+        elif extension(entrada) == ".zip":
+            rutas += extraer_zip(entrada, carpeta_zip)
+        else:
+            rutas.append(entrada)
+    return rutas
+
+def imprimir_resultado(r):
+    if "error" in r:
+        print(f"❌ {r['archivo']}: {r['error']}")
+        return
+    megas = r["bytes"] / 1024 / 1024
+    if "deteccion" in r:
+        print(f"🔎 {r['archivo']}: {describir_deteccion(r['deteccion'])}")
+    print(f"✅ {r['archivo']} -> {r['salida']}: {r['filas']:,} filas en {r['segundos']:.2f} s "
+          f"({r['filas'] / r['segundos']:,.0f} filas/s, {megas / r['segundos']:.1f} MB/s)")
+    if "dedup" in r:
+        d = r["dedup"]
+        print(f"   🧹 {d['nuevas']:,} nuevas, {d['duplicadas_archivo']:,} repetidas en el archivo, "
+              f"{d['duplicadas_historial']:,} ya subidas antes, {d['sin_clave']:,} sin identificadores")
+
+def borrar_checkpoint_terminado(destino):
+    """Una salida de --reanudar que termino ya no necesita su checkpoint"""
+    ruta = ruta_checkpoint(destino)
+    try:
+        with usar_checkpoint(ruta):
+            borrar_checkpoint(ruta)
+    except CheckpointOcupado:
+        pass  # Otra corrida ya volvio a escribir esa salida: el checkpoint es suyo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entradas", nargs="+", help="Archivos CSV/XLSX/Parquet/Feather, ZIP o carpetas")
+    parser.add_argument("-o", "--salida", required=True,
+                        help="Archivo .csv/.parquet/.feather[.gz|.zst|.zip] (una sola entrada) o carpeta de salida")
+    parser.add_argument("--email", default=COL_IGNORAR, help="Columna de email")
+    parser.add_argument("--telefono", default=COL_IGNORAR, help="Columna de telefono")
+    parser.add_argument("--id", default=COL_IGNORAR, help="Columna de User ID")
+    parser.add_argument("--auto", action="store_true",
+                        help="Detectar en cada archivo las columnas que no se indiquen (con una muestra de filas)")
+    parser.add_argument("--sin-hash", action="store_true", help="Solo limpiar, sin SHA256")
+    parser.add_argument("--perfil", default=None, metavar="VARIANTES",
+                        help=f"Generar en una pasada varias variantes de cada columna mapeada, separadas por comas "
+                             f"({', '.join(VARIANTES)}); cada una sale en <columna>_<variante>. Los telefonos "
+                             f"nacionales usan el codigo de pais de ADDATA_PAIS_TELEFONO (52)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto: todos los nucleos)")
+    parser.add_argument("--chunksize", type=int, default=TAMANO_CHUNK, help="Filas por bloque al leer CSV")
+    parser.add_argument("--motor", choices=MOTORES_CSV, default="pandas",
+                        help="Lector de CSV: pandas o arrow (pyarrow multihilo)")
+    parser.add_argument("--hoja", default=None, help="Hoja de los XLSX (por defecto: la primera)")
+    parser.add_argument("--formato", choices=FORMATOS_SALIDA, default=None,
+                        help="Formato de salida (por defecto: segun la extension de -o, o csv)")
+    parser.add_argument("--compresion", choices=COMPRESIONES, default=None,
+                        help="Comprimir la salida mientras se escribe (por defecto: segun la extension de -o, o sin comprimir)")
+    parser.add_argument("--combinar", action="store_true",
+                        help="Unir todas las entradas (mismas columnas) en el archivo -o en lugar de uno por entrada")
+    parser.add_argument("--dedup", nargs="?", const=CARPETA_POR_DEFECTO, default=None, metavar="CARPETA",
+                        help=f"Quitar filas ya vistas en este u otros archivos, con el indice de CARPETA "
+                             f"(por defecto: {CARPETA_POR_DEFECTO})")
+    parser.add_argument("--marcar-duplicados", action="store_true",
+                        help="Con --dedup: marcar las filas repetidas en la columna es_duplicado en lugar de quitarlas")
+    parser.add_argument("--reanudar", action="store_true",
+                        help=f"Guardar un checkpoint por bloque (en {CARPETA_CHECKPOINTS}) y, si una corrida igual se "
+                             f"corto, seguir desde el ultimo bloque completo. Solo salida CSV (sin comprimir, gzip o zstd)")
+    args = parser.parse_args(argv)
+
+    if args.auto:
+        args.email, args.telefono, args.id = (COL_AUTO if c == COL_IGNORAR else c
+                                              for c in (args.email, args.telefono, args.id))
+    elif args.email == args.telefono == args.id == COL_IGNORAR:
+        parser.error("indica al menos una columna: --email, --telefono o --id (o --auto para detectarlas)")
+
+    # Los ZIP de entrada se extraen a una carpeta temporal que vive lo que dura el proceso
+    with tempfile.TemporaryDirectory() as temporal:
+        return ejecutar(parser, args, expandir_entradas(args.entradas, temporal), temporal)
+
+def ejecutar(parser, args, rutas, temporal):
+    """Procesa las rutas ya expandidas; `temporal` guarda salidas intermedias de --combinar"""
+    if not rutas:
+        parser.error("no se encontraron archivos soportados")
+    hashing = not args.sin_hash
+    modo_dedup = "marcar" if args.marcar_duplicados else "eliminar"
+
+    # -o archivo.<ext>[.gz|.zst|.zip] con una sola entrada (o con --combinar) -> salida a ese archivo
+    formatos_por_ext = {ext: formato for formato, ext in EXTENSIONES_SALIDA.items()}
+    compresiones_por_ext = {ext: compresion for compresion, ext in EXTENSIONES_COMPRESION.items()}
+    sin_compresion = args.salida
+    compresion_salida = compresiones_por_ext.get(extension(args.salida))
+    if compresion_salida:
+        sin_compresion = os.path.splitext(args.salida)[0]
+    es_archivo = extension(sin_compresion) in formatos_por_ext
+    if args.combinar and not es_archivo:
+        parser.error("--combinar necesita -o archivo.csv/.parquet/.feather")
+    if args.combinar and args.reanudar:
+        parser.error("--reanudar no se puede usar con --combinar (las salidas intermedias son temporales)")
+    salida_es_archivo = es_archivo and (len(rutas) == 1 or args.combinar)
+    formato = args.formato or (formatos_por_ext[extension(sin_compresion)] if salida_es_archivo else "csv")
+    compresion = args.compresion or (compresion_salida if salida_es_archivo else None)
+    if args.reanudar and (formato != "csv" or compresion == "zip"):
+        parser.error("--reanudar solo funciona con salida CSV (sin comprimir, gzip o zstd)")
+    perfil = None
+    if args.perfil:
+        try:
+            perfil = validar_perfil(args.perfil, formato,
+                                    tipos_mapeados(args.email, args.telefono, args.id, (COL_IGNORAR, COL_AUTO)))
+        except ValueError as e:
+            parser.error(str(e))
+
+    inicio = time.perf_counter()
+    total_filas = total_bytes = errores = 0
+
+    if salida_es_archivo and len(rutas) == 1:
+        # Un solo archivo: el paralelismo se usa dentro del hashing
+        try:
+            columnas, deteccion = resolver_columnas(rutas[0], args.email, args.telefono, args.id, args.hoja)
+            if perfil is not None:
+                validar_perfil(perfil, formato, tipos_mapeados(*columnas))
+        except ValueError as e:
+            parser.error(f"{rutas[0]}: {e}")
+        with contextlib.ExitStack() as pila:
+            dedup = CorridaDedup(pila.enter_context(IndiceDedup(args.dedup))) if args.dedup else None
+            try:
+                filas = procesar_archivo(rutas[0], args.salida, *columnas,
+                                         hashing, args.workers, chunksize=args.chunksize, motor=args.motor,
+                                         formato=formato, hoja=args.hoja, compresion=compresion, dedup=dedup,
+                                         modo_dedup=modo_dedup, perfil=perfil, checkpoint=args.reanudar)
+            except CheckpointOcupado as e:
+                parser.error(f"{rutas[0]}: {e} (hay otra corrida de --reanudar con la misma salida)")
+        resultados = [{"archivo": rutas[0], "salida": args.salida, "filas": filas,
+                       "bytes": os.path.getsize(rutas[0]), "segundos": time.perf_counter() - inicio}]
+        if dedup is not None:
+            resultados[0]["dedup"] = dedup.estadisticas()
+        if deteccion is not None:
+            resultados[0]["deteccion"] = deteccion
+    elif salida_es_archivo:
+        # --combinar: cada archivo se limpia en paralelo a una carpeta temporal y luego se unen
+        resultados = procesar_lote(rutas, os.path.join(temporal, "salidas"), args.email, args.telefono, args.id,
+                                   hashing, args.workers, args.motor, formato, args.hoja,
+                                   carpeta_dedup=args.dedup, modo_dedup=modo_dedup, perfil=perfil,
+                                   chunksize=args.chunksize)
+    else:
+        resultados = procesar_lote(rutas, args.salida, args.email, args.telefono, args.id, hashing, args.workers,
+                                   args.motor, formato, args.hoja, compresion, args.dedup, modo_dedup, perfil,
+                                   args.reanudar, args.chunksize)
+
+    completados = []
+    for r in resultados:
+        imprimir_resultado(r)
+        errores += "error" in r
+        total_filas += r["filas"]
+        total_bytes += r["bytes"]
+        if "error" not in r:
+            completados.append(r)
+            if args.reanudar:
+                borrar_checkpoint_terminado(r["salida"])
+
+    if salida_es_archivo and len(rutas) > 1 and completados:
+        # Mismo orden que las entradas, no el orden en que terminaron
+        orden = {ruta: i for i, ruta in enumerate(rutas)}
+        salidas = [r["salida"] for r in sorted(completados, key=lambda r: orden[r["archivo"]])]
+        try:
+            combinar_salidas(salidas, args.salida, formato, compresion)
+        except ValueError as e:
+            # El archivo combinado a medias no sirve, ni cuentan como subidas las claves de sus partes
+            if os.path.exists(args.salida):
+                os.remove(args.salida)
+            descartar_corridas(args.dedup, completados)
+            parser.error(f"no se pudieron combinar las salidas: {e}")
+        print(f"🧩 {len(salidas)} archivo(s) combinados en {args.salida}")
+
+    segundos = time.perf_counter() - inicio
+    print(f"🚀 Total: {len(rutas)} archivo(s), {total_filas:,} filas en {segundos:.2f} s "
+          f"({total_filas / segundos:,.0f} filas/s, {total_bytes / 1024 / 1024 / segundos:.1f} MB/s)")
+    if errores:
+        print(f"⚠️ {errores} archivo(s) con error")
+    return 1 if errores else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Etapa de hashing SHA256 de AdData Cleaner.
+
+Los valores se reparten en fragmentos (shards) que se hashean en un pool de
+procesos; para entradas pequeñas se hashea en el mismo proceso, donde el
+costo de enviar datos a otro proceso no compensa.
+
+CacheHash memoiza valor -> hash con desalojo LRU para no recalcular los
+identificadores repetidos entre bloques y entre archivos de una sesion.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Por debajo de este numero de valores no vale la pena usar el pool
+UMBRAL_PARALELO = 200_000
+# Fragmentos por worker: varios por worker para repartir mejor la carga
+SHARDS_POR_WORKER = 4
+# Entradas maximas de CacheHash (~200 bytes por entrada)
+MAX_ENTRADAS_CACHE = 1_000_000
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+def workers_por_defecto():
+    """Workers configurados en ADDATA_HASH_WORKERS o, si no, todos los nucleos"""
+    return int(os.environ.get("ADDATA_HASH_WORKERS", 0)) or os.cpu_count() or 1
+
+def _obtener_pool(workers):
+    """Un pool por tamaño, reutilizado entre llamadas (crear procesos es caro)"""
+    # Varios trabajos de la cola hashean a la vez: sin el lock dos crearian su pool
+    with _lock_pools:
+        if workers not in _pools:
+            # spawn: hacer fork de un servidor con hilos (Streamlit) no es seguro
+            contexto = multiprocessing.get_context("spawn")
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=contexto)
+        return _pools[workers]
+
+def hash_lote(valores):
+    """apply_hash sobre una lista de textos, en el proceso actual"""
+    sha256 = hashlib.sha256
+    return [sha256(v.lower().encode()).hexdigest() if v else "" for v in valores]
+
+def hash_valores(valores, workers=None):
+    """
+    Hashea una lista de textos limpios. Mismo resultado que apply_hash celda
+    por celda; con mas de UMBRAL_PARALELO valores usa `workers` procesos.
+    """
+    workers = workers or workers_por_defecto()
+    if workers <= 1 or len(valores) < UMBRAL_PARALELO:
+        return hash_lote(valores)
+
+    n_shards = workers * SHARDS_POR_WORKER
+    tamano = -(-len(valores) // n_shards)
+    shards = [valores[i:i + tamano] for i in range(0, len(valores), tamano)]
+    resultado = []
+    for parcial in _obtener_pool(workers).map(hash_lote, shards):
+        resultado.extend(parcial)
+    return resultado
+
+class CacheHash:
+    """
+    Cache LRU acotada de valor limpio -> hash SHA256.
+    Lleva estadisticas de cuantas filas se resolvieron sin calcular SHA256.
+    """
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_CACHE):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self.filas = 0        # filas que pasaron por la cache
+        self.consultas = 0    # valores unicos consultados
+        self.aciertos = 0     # valores unicos que ya estaban en cache
+        self.calculados = 0   # hashes SHA256 realmente calculados
+
+    def __len__(self):
+        return len(self._datos)
+
+    def resolver(self, unicos, filas, workers=None):
+        """Hashes de `unicos` (valores distintos de `filas` filas), calculando solo los que faltan"""
+        datos = self._datos
+        hashes = [None] * len(unicos)
+        faltantes = []
+        for i, valor in enumerate(unicos):
+            h = datos.get(valor)
+            if h is None:
+                faltantes.append(i)
+            else:
+                datos.move_to_end(valor)
+                hashes[i] = h
+
+        nuevos = hash_valores([unicos[i] for i in faltantes], workers)
+        for i, h in zip(faltantes, nuevos):
+            hashes[i] = h
+            datos[unicos[i]] = h
+        while len(datos) > self.max_entradas:
+            datos.popitem(last=False)
+
+        self.filas += filas
+        self.consultas += len(unicos)
+        self.aciertos += len(unicos) - len(faltantes)
+        self.calculados += len(faltantes)
+        return hashes
+
+    def estadisticas(self):
+        """Tasas de acierto: de la cache LRU y total (duplicados + cache) por fila"""
+        return {
+            "entradas": len(self._datos),
+            "filas": self.filas,
+            "hashes_calculados": self.calculados,
+            "tasa_aciertos_cache": self.aciertos / self.consultas if self.consultas else 0.0,
+            "tasa_ahorro_filas": 1 - self.calculados / self.filas if self.filas else 0.0,
+        }
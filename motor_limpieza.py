@@ -0,0 +1,1093 @@
+"""
+Motor de limpieza de AdData Cleaner.
+
+Contiene las funciones escalares originales (referencia de comportamiento)
+y sus equivalentes vectorizados, que operan columna por columna con los
+kernels de texto de pandas en lugar de llamar a Python celda por celda.
+
+Se puede usar como libreria (procesar_archivo / procesar_lote) o desde la
+linea de comandos con limpiar.py; app.py es solo la interfaz web.
+"""
+import contextlib
+import csv
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from checkpoints import firma_trabajo, guardar_checkpoint, leer_checkpoint, ruta_checkpoint, usar_checkpoint
+from detector_columnas import columnas_detectadas, describir_deteccion, detectar_columnas
+from indice_dedup import COLUMNA_DUPLICADO, CorridaDedup, IndiceDedup
+from instrumentacion import Medicion, etapa, medir_iterador
+from motor_hash import hash_valores
+
+COL_IGNORAR = "-- Ignorar --"
+# Columna a detectar en cada archivo a partir de una muestra (ver resolver_columnas)
+COL_AUTO = "-- Auto --"
+TOKENS_NULOS = ['nan', 'none', '', 'null']
+
+# Textos que pd.read_csv convierte en NaN por defecto (motor Arrow los replica
+# en las columnas mapeadas para dar el mismo resultado que el motor pandas)
+TOKENS_NA_CSV = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+MOTORES_CSV = ("pandas", "arrow")
+FORMATOS_SALIDA = ("csv", "parquet", "feather")
+EXTENSIONES_SALIDA = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+# Compresion de la descarga, aplicada mientras se escribe (zstd requiere el paquete zstandard)
+COMPRESIONES = ("gzip", "zstd", "zip")
+EXTENSIONES_COMPRESION = {"gzip": ".gz", "zstd": ".zst", "zip": ".zip"}
+NIVEL_GZIP = 6
+NIVEL_ZSTD = 3
+EXTENSIONES_PARQUET = (".parquet", ".pq")
+EXTENSIONES_IPC = (".feather", ".arrow", ".ipc")
+EXTENSIONES_ENTRADA = (".csv", ".xlsx") + EXTENSIONES_PARQUET + EXTENSIONES_IPC
+# Filas por bloque al leer XLSX: cada celda es un objeto de Python, mas pesado que el texto de un CSV
+TAMANO_CHUNK_EXCEL = 20_000
+# Bytes por bloque del lector Arrow
+TAMANO_BLOQUE_ARROW = 16 * 1024 * 1024
+# Bloque maximo al reintentar un CSV con una fila mas grande que TAMANO_BLOQUE_ARROW
+MAX_BLOQUE_ARROW = 1024 * 1024 * 1024
+
+# Filas por bloque en modo streaming y tamaño maximo en RAM del archivo de salida
+TAMANO_CHUNK = 100_000
+MAX_SALIDA_EN_MEMORIA = 32 * 1024 * 1024
+# Codigo de pais de los telefonos nacionales (10 digitos) en la variante E.164
+PAIS_TELEFONO = os.environ.get("ADDATA_PAIS_TELEFONO", "52")
+# Filas de la muestra para detectar columnas (inicio del archivo + posiciones al azar)
+FILAS_MUESTRA = 1_000
+
+# --- FUNCIONES ESCALARES (REFERENCIA) ---
+def clean_generic(val):
+    """Limpia espacios y nulos basicos"""
+    s = str(val).strip()
+    return "" if s.lower() in TOKENS_NULOS else s
+
+def clean_phone_logic(val):
+    """Solo digitos"""
+    s = clean_generic(val)
+    if not s: return ""
+    return "".join(filter(str.isdigit, s))
+
+def apply_hash(val):
+    """Aplica SHA256 si hay valor"""
+    if not val: return ""
+    return hashlib.sha256(val.lower().encode()).hexdigest()
+
+# --- FUNCIONES VECTORIZADAS ---
+def _como_texto(serie):
+    """Equivalente a str(val) en cada celda, sin llamar a Python por celda"""
+    if isinstance(serie.dtype, pd.StringDtype) and serie.dtype.na_value is not pd.NA:
+        # Columna de texto de pandas: el unico nulo posible es NaN
+        return serie.fillna("nan")
+    valores = serie.astype(object)
+    texto = valores.astype(str)
+    # astype(str) deja NaN/None/NaT como nulos; str() los convierte en texto
+    faltantes = texto.isna()
+    if faltantes.any():
+        texto[faltantes] = [str(v) for v in valores[faltantes]]
+    return texto
+
+def _minusculas(s):
+    """
+    str.lower de Python en cada celda. El lower de Arrow (texto de pandas 3)
+    no coincide con Python en letras no ASCII ('İ', 'Σ' final, U+1C89), asi
+    que las celdas no ASCII usan el de Python
+    """
+    ascii_ = s.str.isascii()
+    if ascii_.all():
+        return s.str.lower()
+    minusculas = s.where(ascii_, "").str.lower()
+    minusculas[~ascii_] = [v.lower() for v in s[~ascii_]]
+    return minusculas
+
+def limpiar_generico(serie):
+    """Version vectorizada de clean_generic"""
+    s = _como_texto(serie).str.strip()
+    # Los tokens nulos miden 4 caracteres o menos: solo esos se comparan
+    cortos = s.str.len() <= 4
+    nulos = cortos & s.where(cortos, "").str.lower().isin(TOKENS_NULOS)
+    return s.mask(nulos, "")
+
+def limpiar_email(serie):
+    """clean_generic + minusculas, vectorizado"""
+    return _minusculas(limpiar_generico(serie))
+
+def limpiar_telefono(serie):
+    """Version vectorizada de clean_phone_logic"""
+    s = limpiar_generico(serie)
+    # \d no cubre los digitos unicode que acepta str.isdigit (ej. '²'),
+    # asi que las celdas no ASCII usan la funcion escalar
+    ascii_ = s.str.isascii()
+    digitos = s.where(ascii_, "").str.replace(r"[^0-9]", "", regex=True)
+    if not ascii_.all():
+        digitos[~ascii_] = [clean_phone_logic(v) for v in s[~ascii_]]
+    return digitos
+
+def _hashes_unicos(unicos, filas, workers, cache):
+    """Hashes hex de los valores distintos `unicos` (de `filas` filas), con o sin CacheHash"""
+    with etapa("hash", filas):
+        if cache is not None:
+            return cache.resolver(unicos, filas, workers)
+        return hash_valores(unicos, workers)
+
+def hash_serie(serie, workers=None, cache=None):
+    """
+    Aplica SHA256 a una columna ya limpia (mismo resultado que apply_hash).
+    Cada valor distinto se hashea una sola vez; con `cache` (CacheHash) los
+    hashes tambien se reutilizan entre llamadas.
+    """
+    codigos, unicos = pd.factorize(serie)
+    hashes = _hashes_unicos(unicos.tolist(), len(serie), workers, cache)
+    return pd.Series(np.asarray(hashes, dtype=object)[codigos], index=serie.index)
+
+def _limpiar_columna(serie, limpiador, hashing, workers, cache):
+    """Limpia una columna y, si se pide, la hashea; la columna limpia intermedia se libera enseguida"""
+    serie = limpiador(serie)
+    return hash_serie(serie, workers, cache) if hashing else serie
+
+def limpiar_dataframe(df, email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR, hashing=True,
+                      workers=None, cache=None, perfil=None):
+    """
+    Limpia (y opcionalmente hashea) las columnas mapeadas de un DataFrame.
+    `workers` es el numero de procesos para el hashing (None = todos los nucleos)
+    y `cache` una CacheHash opcional compartida entre llamadas.
+    Con `perfil` (lista de VARIANTES) cada columna mapeada se reemplaza por
+    sus variantes, en el mismo lugar; `hashing` no se usa.
+    """
+    # Copia superficial: las columnas no mapeadas comparten sus buffers con `df`
+    # (copy-on-write) y solo se reemplazan las columnas mapeadas; `df` no cambia
+    clean_df = df.copy(deep=False)
+
+    if perfil is not None:
+        perfil = validar_perfil(perfil, None, tipos_mapeados(email_col, phone_col, id_col))
+        for col, tipo in ((email_col, "email"), (phone_col, "telefono"), (id_col, "id")):
+            if col == COL_IGNORAR:
+                continue
+            posicion = clean_df.columns.get_loc(col)
+            variantes = _variantes_columna(clean_df[col], tipo, perfil, workers, cache)
+            del clean_df[col]
+            for i, (nombre, _, serie) in enumerate(variantes):
+                clean_df.insert(posicion + i, nombre, serie)
+        return clean_df
+
+    # 1. EMAIL
+    if email_col != COL_IGNORAR:
+        clean_df[email_col] = _limpiar_columna(clean_df[email_col], limpiar_email, hashing, workers, cache)
+
+    # 2. TELÉFONO
+    if phone_col != COL_IGNORAR:
+        clean_df[phone_col] = _limpiar_columna(clean_df[phone_col], limpiar_telefono, hashing, workers, cache)
+
+    # 3. USER ID
+    if id_col != COL_IGNORAR:
+        # Solo quitamos espacios, no borramos simbolos raros de IDs
+        clean_df[id_col] = _limpiar_columna(clean_df[id_col], limpiar_generico, hashing, workers, cache)
+
+    return clean_df
+
+# --- PERFILES DE SALIDA (VARIANTES POR COLUMNA) ---
+def telefono_e164(serie, pais=PAIS_TELEFONO):
+    """
+    Telefonos en formato E.164 (+<pais><numero>), vectorizado. Los numeros con
+    + o 00 ya traen su codigo de pais; sin prefijo, los de 10 digitos se toman
+    como nacionales de `pais` y los que empiezan con `pais` seguido de 10
+    digitos (o 52 1 + 10) ya lo traen. Cualquier otro largo sin prefijo queda
+    vacio: no se inventa un codigo de pais. Se quita la extension ('Ext 123')
+    y el 1 de los moviles mexicanos antiguos (+52 1 ...). Lo que no mide 8 a
+    15 digitos queda vacio.
+    """
+    s = limpiar_generico(serie).str.replace(r"(?i)\s*(ext\.?|x)\s*\d+$", "", regex=True)
+    con_prefijo_00 = s.str.startswith("00")
+    internacional = s.str.startswith("+") | con_prefijo_00
+    digitos = limpiar_telefono(s)
+    digitos = digitos.mask(con_prefijo_00, digitos.str[2:])
+    largo = digitos.str.len()
+    nacional = ~internacional & (largo == 10)
+    con_pais = ~internacional & digitos.str.startswith(pais) & (
+        (largo == len(pais) + 10) | (digitos.str.startswith("521") & (largo == 13)))
+    numero = digitos.mask(nacional, pais + digitos).where(internacional | nacional | con_pais, "")
+    movil_mx = numero.str.startswith("521") & (numero.str.len() == 13)
+    numero = numero.mask(movil_mx, "52" + numero.str[3:])
+    return ("+" + numero).where(numero.str.len().between(8, 15), "")
+
+# Variante -> (normalizacion, codificacion). Un perfil de salida es una lista de
+# variantes; cada columna mapeada sale como <columna>_<variante>, una por variante
+VARIANTES = {
+    "limpio": ("limpio", "texto"),
+    "hash": ("limpio", "sha256"),
+    "hash_bin": ("limpio", "sha256_bin"),
+    "e164": ("e164", "texto"),
+    "e164_hash": ("e164", "sha256"),
+    "e164_hash_bin": ("e164", "sha256_bin"),
+}
+# Normalizaciones que solo existen para un tipo de columna
+TIPO_NORMALIZACION = {"e164": "telefono"}
+LIMPIADORES = {"email": limpiar_email, "telefono": limpiar_telefono, "id": limpiar_generico}
+
+def validar_perfil(perfil, formato="csv", tipos=()):
+    """
+    Lista de variantes del perfil (texto 'hash,e164' o lista); ValueError si
+    no es valido. `tipos` son los tipos de las columnas mapeadas: cada uno
+    debe tener al menos una variante, o su columna desapareceria de la salida.
+    """
+    if isinstance(perfil, str):
+        perfil = [v.strip() for v in perfil.split(",") if v.strip()]
+    desconocidas = [v for v in perfil if v not in VARIANTES]
+    if desconocidas or not perfil:
+        raise ValueError(f"Perfil de salida no valido: {', '.join(desconocidas) or 'vacio'} "
+                         f"(variantes: {', '.join(VARIANTES)})")
+    if formato == "csv" and any(VARIANTES[v][1] == "sha256_bin" for v in perfil):
+        raise ValueError("Las variantes *_bin (digest binario) requieren salida parquet o feather")
+    for tipo in tipos:
+        if not columnas_variantes("", tipo, perfil):
+            raise ValueError(f"El perfil ({', '.join(perfil)}) no genera ninguna variante para la columna de {tipo}: "
+                             f"agrega limpio, hash o hash_bin")
+    return list(dict.fromkeys(perfil))
+
+def tipos_mapeados(email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR, ignorar=(COL_IGNORAR,)):
+    """Tipos ("email", "telefono", "id") de las columnas mapeadas (las que no estan en `ignorar`)"""
+    return [tipo for col, tipo in ((email_col, "email"), (phone_col, "telefono"), (id_col, "id")) if col not in ignorar]
+
+def columnas_variantes(col, tipo, perfil):
+    """[(columna de salida, variante)] de una columna mapeada de tipo `tipo`"""
+    return [(f"{col}_{v}", v) for v in perfil if TIPO_NORMALIZACION.get(VARIANTES[v][0], tipo) == tipo]
+
+def _variantes_columna(serie, tipo, perfil, workers, cache):
+    """
+    Todas las variantes de una columna en una pasada: cada normalizacion se
+    calcula una vez, se factoriza una vez y sus valores distintos se hashean
+    una vez; hex y binario salen del mismo hash. Retorna [(columna, variante, serie)].
+    """
+    resultado = []
+    normalizadas = {}
+    for nombre, variante in columnas_variantes(serie.name, tipo, perfil):
+        normalizacion, codificacion = VARIANTES[variante]
+        if normalizacion not in normalizadas:
+            limpia = LIMPIADORES[tipo](serie) if normalizacion == "limpio" else telefono_e164(serie)
+            codigos, unicos = pd.factorize(limpia)
+            normalizadas[normalizacion] = {"limpia": limpia, "codigos": codigos, "unicos": unicos.tolist()}
+        datos = normalizadas[normalizacion]
+        if codificacion == "texto":
+            resultado.append((nombre, variante, datos["limpia"]))
+            continue
+        if "hex" not in datos:
+            datos["hex"] = np.asarray(_hashes_unicos(datos["unicos"], len(serie), workers, cache), dtype=object)
+        if codificacion == "sha256":
+            valores = datos["hex"][datos["codigos"]]
+        else:
+            binarios = np.asarray([bytes.fromhex(h) for h in datos["hex"]], dtype=object)
+            valores = binarios[datos["codigos"]]
+        resultado.append((nombre, variante, pd.Series(valores, index=serie.index)))
+    return resultado
+
+def columnas_clave(email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR, perfil=None):
+    """Columnas de salida que identifican la fila (para dedup): la primera variante de cada mapeada"""
+    claves = []
+    for col, tipo in ((email_col, "email"), (phone_col, "telefono"), (id_col, "id")):
+        if col == COL_IGNORAR:
+            continue
+        if perfil is None:
+            claves.append(col)
+        else:
+            claves += [nombre for nombre, _ in columnas_variantes(col, tipo, perfil)[:1]]
+    return claves
+
+# --- LECTURA POR BLOQUES ---
+def nuevo_archivo_salida():
+    """Archivo temporal binario: vive en RAM hasta MAX_SALIDA_EN_MEMORIA y luego pasa a disco"""
+    return tempfile.SpooledTemporaryFile(max_size=MAX_SALIDA_EN_MEMORIA, mode="w+b")
+
+def extension(origen):
+    """Extension en minusculas de una ruta o del .name de un archivo subido"""
+    return os.path.splitext(str(getattr(origen, "name", origen)))[1].lower()
+
+def _tipo_pandas(tipo):
+    """types_mapper de to_pandas: los enteros de Arrow con nulos no pasan a float64 (3 -> '3.0')"""
+    import pyarrow as pa
+
+    if pa.types.is_integer(tipo):
+        return pd.api.types.pandas_dtype(str(tipo).replace("uint", "UInt").replace("int", "Int"))
+    return None
+
+def tabla_a_pandas(tabla):
+    """Tabla o lote Arrow como DataFrame, con los enteros como enteros de pandas con nulos"""
+    return tabla.to_pandas(types_mapper=_tipo_pandas)
+
+def _columnas_csv(origen):
+    """Nombres de columnas del encabezado (deja el archivo al inicio)"""
+    columnas = pd.read_csv(origen, nrows=0).columns.tolist()
+    if hasattr(origen, "seek"):
+        origen.seek(0)
+    return columnas
+
+def _marcar_nulos(chunk, columnas_mapeadas):
+    """Tokens nulos de pd.read_csv -> NaN, solo en las columnas mapeadas"""
+    for col in columnas_mapeadas:
+        chunk[col] = chunk[col].mask(chunk[col].isin(TOKENS_NA_CSV))
+    return chunk
+
+def _chunks_arrow(origen, columnas_mapeadas):
+    """
+    Lector CSV multihilo de pyarrow: todas las columnas como texto crudo, sin
+    inferencia de tipos. En las columnas mapeadas los tokens nulos de pandas
+    se vuelven NaN, igual que con el motor pandas. Los campos entre comillas
+    pueden tener saltos de linea; una fila mas grande que el bloque se
+    reintenta con bloques mas grandes, sin repetir las filas ya generadas.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    columnas = _columnas_csv(origen)
+    tamano, generadas = TAMANO_BLOQUE_ARROW, 0
+    while True:
+        lector = pacsv.open_csv(
+            origen,
+            read_options=pacsv.ReadOptions(block_size=tamano, use_threads=True),
+            # Campos entre comillas con saltos de linea (notas, direcciones), como los lee pandas
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in columnas},
+                                                 strings_can_be_null=False),
+        )
+        leidas = 0
+        try:
+            for lote in lector:
+                nuevas = lote.slice(max(generadas - leidas, 0))
+                leidas += lote.num_rows
+                if nuevas.num_rows:
+                    generadas += nuevas.num_rows
+                    yield _marcar_nulos(nuevas.to_pandas(), columnas_mapeadas)
+            break
+        except pa.ArrowInvalid as e:
+            # Una fila (un campo multilinea enorme) no cabe en un bloque
+            if "straddl" not in str(e) or tamano >= MAX_BLOQUE_ARROW:
+                raise
+            tamano *= 4
+            if hasattr(origen, "seek"):
+                origen.seek(0)
+    if generadas == 0:
+        yield pd.DataFrame(columns=columnas)
+
+def _tablas_parquet(origen, chunksize):
+    """Parquet por lotes de `chunksize` filas como tablas Arrow (sin pasar por pandas)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    archivo = pq.ParquetFile(origen)
+    vacio = True
+    for lote in archivo.iter_batches(batch_size=chunksize):
+        vacio = False
+        yield pa.Table.from_batches([lote])
+    if vacio:
+        yield archivo.schema_arrow.empty_table()
+
+def _tablas_ipc(origen):
+    """Arrow IPC / Feather v2 por record batch; las rutas se abren con memory map"""
+    import pyarrow as pa
+
+    fuente = pa.memory_map(os.fspath(origen)) if isinstance(origen, (str, os.PathLike)) else origen
+    lector = pa.ipc.open_file(fuente)
+    if lector.num_record_batches == 0:
+        yield lector.schema.empty_table()
+    for i in range(lector.num_record_batches):
+        yield pa.Table.from_batches([lector.get_batch(i)])
+
+def hojas_excel(origen):
+    """Nombres de las hojas de un XLSX (sin cargar las celdas)"""
+    import openpyxl
+
+    libro = openpyxl.load_workbook(origen, read_only=True)
+    try:
+        return libro.sheetnames
+    finally:
+        libro.close()
+        if hasattr(origen, "seek"):
+            origen.seek(0)
+
+def _valor_excel(valor, errores):
+    """Celda de openpyxl como la entrega pd.read_excel: vacia -> '', numero entero -> int, error -> NaN"""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str) and valor in errores:
+        return np.nan
+    return valor
+
+def _bloque_excel(encabezado, filas, columnas_mapeadas):
+    """
+    Filas de un XLSX como DataFrame, convertidas igual que en pd.read_excel
+    (TextParser): fechas como fechas, numeros como int64/float64 y los tokens
+    nulos de pandas como NaN. Las columnas mapeadas quedan como objetos, sin
+    inferir tipo: un telefono con celdas vacias no pasa a float64.
+    """
+    from openpyxl.cell.cell import ERROR_CODES
+    from pandas.io.parsers import TextParser
+
+    datos = [[_valor_excel(v, ERROR_CODES) for v in fila] for fila in [encabezado, *filas]]
+    return TextParser(datos, header=0, skip_blank_lines=False, dtype=dict.fromkeys(columnas_mapeadas, object)).read()
+
+def _chunks_excel(origen, columnas_mapeadas, chunksize, hoja=None):
+    """
+    XLSX en streaming con el iterador read-only de openpyxl: nunca arma el
+    libro completo en memoria. Cada bloque se convierte como lo hace
+    pd.read_excel (ver _bloque_excel), pero los tipos se infieren por bloque
+    de `chunksize` filas: una columna que mezcla enteros y decimales en
+    bloques distintos puede salir como 1 en uno y 1.0 en otro. Las filas
+    vacias al final se descartan.
+    """
+    import openpyxl
+
+    libro = openpyxl.load_workbook(origen, read_only=True, data_only=True)
+    try:
+        hoja = libro[hoja] if hoja else libro.worksheets[0]
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = next(filas, ())
+        n = len(encabezado)
+
+        bloque, vacias, emitido = [], [], False
+        for fila in filas:
+            fila = fila[:n] + (None,) * (n - len(fila))
+            if all(v is None for v in fila):
+                # Solo se conservan si despues viene una fila con datos
+                vacias.append(fila)
+                continue
+            bloque.extend(vacias)
+            vacias = []
+            bloque.append(fila)
+            if len(bloque) >= chunksize:
+                yield _bloque_excel(encabezado, bloque, columnas_mapeadas)
+                bloque, emitido = [], True
+        if bloque or not emitido:
+            yield _bloque_excel(encabezado, bloque, columnas_mapeadas)
+    finally:
+        libro.close()
+
+def leer_bloques(origen, columnas_mapeadas=(), chunksize=TAMANO_CHUNK, motor="pandas", hoja=None):
+    """
+    Genera el archivo por bloques: DataFrames (CSV, XLSX o un DataFrame ya
+    leido) o tablas Arrow (Parquet, Feather/IPC). Siempre genera al menos un
+    bloque, aunque este vacio, para que la salida lleve encabezado/esquema.
+    `hoja` elige la hoja de un XLSX (por defecto, la primera).
+
+    Los CSV se leen como texto: asi la salida no depende de como pandas
+    infiera tipos en cada bloque y las columnas no mapeadas salen tal cual.
+    Con motor="arrow" se usa el lector multihilo de pyarrow (bloques de
+    TAMANO_BLOQUE_ARROW bytes) y las columnas no mapeadas conservan incluso
+    textos como 'N/A' o 'NULL', que el motor pandas deja vacios.
+    """
+    if isinstance(origen, pd.DataFrame):
+        yield origen
+        return
+
+    ext = extension(origen)
+    if ext == ".csv":
+        if motor == "arrow":
+            yield from _chunks_arrow(origen, columnas_mapeadas)
+        else:
+            yield from pd.read_csv(origen, chunksize=chunksize, dtype=str)
+    elif ext in EXTENSIONES_PARQUET:
+        yield from _tablas_parquet(origen, chunksize)
+    elif ext in EXTENSIONES_IPC:
+        yield from _tablas_ipc(origen)
+    else:
+        yield from _chunks_excel(origen, columnas_mapeadas, min(chunksize, TAMANO_CHUNK_EXCEL), hoja)
+
+def leer_vista_previa(origen, filas, hoja=None):
+    """Primeras `filas` filas como DataFrame, sin leer el archivo completo"""
+    bloques = leer_bloques(origen, chunksize=filas, hoja=hoja)
+    bloque = next(bloques)
+    bloques.close()
+    if not isinstance(bloque, pd.DataFrame):
+        bloque = tabla_a_pandas(bloque)
+    if hasattr(origen, "seek"):
+        origen.seek(0)
+    return bloque.head(filas)
+
+def _filas_al_azar_csv(origen, columnas, filas, rng):
+    """
+    Filas de posiciones al azar de un CSV: salta a un byte al azar, descarta
+    la linea a medias y toma la siguiente. Las lineas que no cuadran con el
+    encabezado (campos con saltos de linea) se descartan.
+    """
+    archivo = open(origen, "rb") if isinstance(origen, (str, os.PathLike)) else origen
+    try:
+        tamano = archivo.seek(0, os.SEEK_END)
+        muestra, vistas = [], set()
+        for posicion in sorted(rng.integers(0, max(tamano, 1), filas)):
+            archivo.seek(posicion)
+            archivo.readline()
+            # Dos saltos dentro de la misma linea darian la misma fila dos veces
+            if archivo.tell() in vistas:
+                continue
+            vistas.add(archivo.tell())
+            linea = archivo.readline().decode("utf-8", errors="replace")
+            campos = next(csv.reader([linea]), [])
+            if len(campos) == len(columnas):
+                muestra.append(campos)
+    finally:
+        if archivo is origen:
+            origen.seek(0)
+        else:
+            archivo.close()
+    return pd.DataFrame(muestra, columns=columnas, dtype=str)
+
+def _bloques_al_azar_arrow(origen, filas, rng):
+    """Hasta `filas` filas de row groups (Parquet) o record batches (IPC) al azar"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if extension(origen) in EXTENSIONES_PARQUET:
+        archivo = pq.ParquetFile(origen)
+        total, leer = archivo.num_row_groups, archivo.read_row_group
+    else:
+        fuente = pa.memory_map(os.fspath(origen)) if isinstance(origen, (str, os.PathLike)) else origen
+        lector = pa.ipc.open_file(fuente)
+        total, leer = lector.num_record_batches, lector.get_batch
+    if total == 0:
+        return pd.DataFrame()
+    grupos = rng.choice(total, size=min(total, 4), replace=False)
+    por_grupo = -(-filas // len(grupos))
+    partes = []
+    for grupo in sorted(grupos):
+        lote = leer(int(grupo))
+        inicio = int(rng.integers(0, max(lote.num_rows - por_grupo, 0) + 1))
+        partes.append(tabla_a_pandas(lote.slice(inicio, por_grupo)))
+    if hasattr(origen, "seek"):
+        origen.seek(0)
+    return pd.concat(partes, ignore_index=True)
+
+def leer_muestra(origen, filas=FILAS_MUESTRA, hoja=None, semilla=0):
+    """
+    Muestra acotada de filas para detectar columnas, sin recorrer el archivo:
+    el inicio del archivo mas filas de posiciones al azar (CSV: saltos de
+    byte; Parquet/Feather: row groups o record batches al azar). En XLSX no
+    hay acceso aleatorio y la muestra son las primeras filas.
+    """
+    rng = np.random.default_rng(semilla)
+    inicio = leer_vista_previa(origen, filas // 2, hoja)
+    ext = extension(origen)
+    if len(inicio) < filas // 2:
+        # El archivo completo cabe en el inicio
+        return inicio
+    if ext == ".csv":
+        resto = _filas_al_azar_csv(origen, inicio.columns.tolist(), filas - len(inicio), rng)
+    elif ext in EXTENSIONES_PARQUET + EXTENSIONES_IPC:
+        resto = _bloques_al_azar_arrow(origen, filas - len(inicio), rng)
+    else:
+        return leer_vista_previa(origen, filas, hoja)
+    return pd.concat([inicio, resto], ignore_index=True) if len(resto) else inicio
+
+def detectar_columnas_archivo(origen, hoja=None):
+    """Deteccion de email / telefono / id (ver detector_columnas) sobre una muestra del archivo"""
+    return detectar_columnas(leer_muestra(origen, hoja=hoja))
+
+def resolver_columnas(origen, email_col, phone_col, id_col, hoja=None):
+    """
+    Cambia las columnas COL_AUTO por las detectadas en una muestra del
+    archivo (solo con confianza media o alta; si no, se ignoran). Retorna
+    ((email, telefono, id), deteccion); deteccion es None si no habia COL_AUTO.
+    """
+    columnas = (email_col, phone_col, id_col)
+    if COL_AUTO not in columnas:
+        return columnas, None
+    # Las columnas indicadas a mano no se ofrecen para otro tipo; solo se reportan los tipos detectados
+    muestra = leer_muestra(origen, hoja=hoja)
+    deteccion = detectar_columnas(muestra.drop(columns=[c for c in columnas if c in muestra.columns]))
+    deteccion = {tipo: d if c == COL_AUTO else None for (tipo, d), c in zip(deteccion.items(), columnas)}
+    detectadas = columnas_detectadas(deteccion, COL_IGNORAR)
+    columnas = tuple(d if c == COL_AUTO else c for c, d in zip(columnas, detectadas))
+    if all(c == COL_IGNORAR for c in columnas):
+        raise ValueError(f"no se detectaron columnas de email, telefono o id ({describir_deteccion(deteccion)})")
+    return columnas, deteccion
+
+# --- LIMPIEZA DE TABLAS ARROW ---
+def limpiar_tabla_arrow(tabla, email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR, hashing=True,
+                        workers=None, cache=None, perfil=None):
+    """
+    Igual que limpiar_dataframe pero sobre una tabla Arrow: solo las columnas
+    mapeadas pasan por pandas; las demas se copian tal cual (mismos buffers).
+    Las columnas mapeadas pasan a texto en Arrow: un entero con nulos
+    convertido por pandas seria float64 y se limpiaria como '5512345678.0'.
+    """
+    import pyarrow as pa
+
+    if perfil is not None:
+        perfil = validar_perfil(perfil, None, tipos_mapeados(email_col, phone_col, id_col))
+    for col, tipo in ((email_col, "email"), (phone_col, "telefono"), (id_col, "id")):
+        if col == COL_IGNORAR:
+            continue
+        columna = tabla.column(col)
+        if pa.types.is_integer(columna.type):
+            columna = columna.cast(pa.string())
+        if perfil is not None:
+            posicion = tabla.schema.get_field_index(col)
+            variantes = _variantes_columna(columna.to_pandas().rename(col), tipo, perfil, workers, cache)
+            tabla = tabla.remove_column(posicion)
+            for i, (nombre, variante, serie) in enumerate(variantes):
+                tipo_arrow = pa.binary() if VARIANTES[variante][1] == "sha256_bin" else pa.string()
+                tabla = tabla.add_column(posicion + i, nombre, pa.array(serie, type=tipo_arrow))
+            continue
+        serie = _limpiar_columna(columna.to_pandas(), LIMPIADORES[tipo], hashing, workers, cache)
+        tabla = tabla.set_column(tabla.schema.get_field_index(col), col, pa.array(serie, type=pa.string()))
+    return tabla
+
+def limpiar_bloque(bloque, *args, **kwargs):
+    """limpiar_dataframe o limpiar_tabla_arrow segun el tipo de bloque"""
+    if isinstance(bloque, pd.DataFrame):
+        return limpiar_dataframe(bloque, *args, **kwargs)
+    return limpiar_tabla_arrow(bloque, *args, **kwargs)
+
+# --- DEDUPLICACION ---
+def claves_dedup(bloque, columnas):
+    """
+    Clave de cada fila para deduplicar: sus columnas mapeadas (ya limpias y
+    hasheadas) unidas; "" si todas estan vacias.
+    """
+    if not isinstance(bloque, pd.DataFrame):
+        bloque = tabla_a_pandas(bloque.select(columnas))
+    partes = [_como_texto(bloque[c]) for c in columnas]
+    claves = partes[0].str.cat(partes[1:], sep="\x1f") if len(partes) > 1 else partes[0]
+    vacias = np.logical_and.reduce([(p == "").to_numpy() for p in partes])
+    return claves.mask(vacias, "").tolist()
+
+def deduplicar_bloque(bloque, corrida, columnas, modo="eliminar"):
+    """
+    Quita (modo="eliminar") o marca en la columna es_duplicado (modo="marcar")
+    las filas cuya clave ya vio `corrida` (CorridaDedup).
+    """
+    duplicados = corrida.duplicados(claves_dedup(bloque, columnas))
+    if isinstance(bloque, pd.DataFrame):
+        if modo == "marcar":
+            bloque[COLUMNA_DUPLICADO] = duplicados
+            return bloque
+        return bloque[~duplicados]
+
+    import pyarrow as pa
+    if modo == "marcar":
+        return bloque.append_column(COLUMNA_DUPLICADO, pa.array(duplicados))
+    return bloque.filter(pa.array(~duplicados))
+
+# --- ESCRITURA ---
+def _tabla_para_escribir(bloque):
+    """
+    Bloque como tabla Arrow con tipos que no cambian entre bloques. Las
+    columnas object de pandas (un XLSX mezcla enteros y textos en la misma
+    columna) pasan a texto, salvo los digest binarios (*_bin); las columnas
+    todas nulas pasan a texto en lugar del tipo null.
+    """
+    import pyarrow as pa
+
+    if not isinstance(bloque, pa.Table):
+        bloque = bloque.copy(deep=False)
+        for i, serie in enumerate(bloque[c] for c in bloque.columns):
+            if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) not in ("string", "bytes"):
+                bloque.isetitem(i, serie.astype(str).where(serie.notna(), None))
+        bloque = pa.Table.from_pandas(bloque, preserve_index=False)
+    for i, campo in enumerate(bloque.schema):
+        if pa.types.is_null(campo.type):
+            bloque = bloque.set_column(i, campo.name, bloque.column(i).cast(pa.string()))
+    return bloque
+
+class EscritorSalida:
+    """
+    Escribe bloques limpios (DataFrame o tabla Arrow) en CSV, Parquet o
+    Feather. Parquet y Feather se escriben columnares y comprimidos con zstd.
+    Con encabezado=False el CSV continua uno ya empezado (sin repetir encabezado).
+    """
+
+    def __init__(self, destino, formato="csv", encabezado=True):
+        if formato not in FORMATOS_SALIDA:
+            raise ValueError(f"Formato de salida no soportado: {formato}")
+        self.destino = destino
+        self.formato = formato
+        self.filas = 0
+        self._iniciado = not encabezado
+        self._escritor = None
+        self._esquema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def escribir(self, bloque):
+        if self.formato == "csv":
+            if not isinstance(bloque, pd.DataFrame):
+                bloque = tabla_a_pandas(bloque)
+            bloque.to_csv(self.destino, index=False, header=not self._iniciado, encoding="utf-8")
+        else:
+            self._escribir_arrow(bloque)
+        self._iniciado = True
+        self.filas += len(bloque)
+
+    def _escribir_arrow(self, bloque):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabla = _tabla_para_escribir(bloque)
+        if self._escritor is None:
+            self._esquema = tabla.schema
+            if self.formato == "parquet":
+                self._escritor = pq.ParquetWriter(self.destino, tabla.schema, compression="zstd")
+            else:
+                opciones = pa.ipc.IpcWriteOptions(compression="zstd")
+                self._escritor = pa.ipc.new_file(self.destino, tabla.schema, options=opciones)
+        # Texto de pandas (large_string) o de Arrow (string) segun el bloque: se ajusta al primero
+        self._escritor.write_table(tabla.cast(self._esquema))
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+# --- COMPRESION ---
+def nombre_salida(base, formato="csv", compresion=None):
+    """<base>.<csv|parquet|feather>[.gz|.zst|.zip]"""
+    return base + EXTENSIONES_SALIDA[formato] + (EXTENSIONES_COMPRESION[compresion] if compresion else "")
+
+def _nombre_interno(destino, compresion):
+    """Nombre del archivo dentro del ZIP: el de `destino` sin la extension de compresion"""
+    nombre = os.path.basename(os.fspath(destino))
+    sufijo = EXTENSIONES_COMPRESION[compresion]
+    return nombre[:-len(sufijo)] if nombre.endswith(sufijo) else nombre
+
+@contextlib.contextmanager
+def abrir_compresion(destino, compresion=None, nombre_interno="datos.csv"):
+    """
+    Envuelve `destino` (archivo binario abierto) en un compresor en streaming:
+    cada bloque se comprime en cuanto se escribe, sin armar el archivo completo
+    en memoria. Al salir termina el archivo comprimido pero no cierra `destino`.
+    `nombre_interno` es el nombre del archivo dentro del ZIP.
+    """
+    if compresion is None:
+        yield destino
+    elif compresion == "gzip":
+        # mtime=0: el mismo contenido produce siempre los mismos bytes
+        with gzip.GzipFile(fileobj=destino, mode="wb", compresslevel=NIVEL_GZIP, mtime=0) as comprimido:
+            yield comprimido
+    elif compresion == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("La compresion zstd requiere el paquete zstandard (pip install zstandard)") from None
+        # BufferedWriter: agrupa escrituras pequeñas y pandas lo reconoce como archivo binario
+        comprimido = io.BufferedWriter(zstandard.ZstdCompressor(level=NIVEL_ZSTD).stream_writer(destino, closefd=False))
+        try:
+            yield comprimido
+        finally:
+            comprimido.close()
+    elif compresion == "zip":
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=NIVEL_GZIP) as archivo_zip:
+            # force_zip64: el tamaño final no se conoce de antemano y puede pasar de 4 GB
+            info = zipfile.ZipInfo(nombre_interno, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archivo_zip.open(info, "w", force_zip64=True) as comprimido:
+                yield comprimido
+    else:
+        raise ValueError(f"Compresion no soportada: {compresion}")
+
+# --- ARCHIVOS COMPLETOS Y LOTES ---
+def procesar_archivo(origen, destino, email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR,
+                     hashing=True, workers=None, cache=None, chunksize=TAMANO_CHUNK, motor="pandas",
+                     formato="csv", hoja=None, compresion=None, nombre_interno=None, dedup=None,
+                     modo_dedup="eliminar", perfil=None, checkpoint=False, progreso=None):
+    """
+    Limpia un archivo completo (CSV, XLSX, Parquet, Feather o un DataFrame ya
+    leido) bloque por bloque y escribe el resultado en `destino` (ruta o
+    archivo binario abierto) en el `formato` pedido. Retorna el numero de filas.
+    `motor` ("pandas" o "arrow") elige el lector de CSV y `hoja` la hoja de un XLSX.
+    `compresion` ("gzip", "zstd" o "zip") comprime la salida mientras se escribe.
+    `dedup` (CorridaDedup) quita o marca, segun `modo_dedup`, las filas ya vistas;
+    sus conteos quedan en dedup.estadisticas(). Si el proceso falla o se corta,
+    las claves de la corrida se descartan del indice (salvo con `checkpoint`:
+    la corrida se puede retomar).
+    `perfil` (lista de VARIANTES o texto 'hash,e164_hash') genera varias
+    variantes de cada columna mapeada en la misma pasada, en lugar de `hashing`.
+    Con `checkpoint` (True o la ruta del checkpoint) se puede retomar si se
+    corta: ver _procesar_con_checkpoint.
+    `progreso(filas)` se llama al terminar cada bloque con las filas de entrada
+    leidas hasta ahi; si lanza una excepcion, el proceso se corta ahi.
+    """
+    if perfil is not None:
+        perfil = validar_perfil(perfil, formato, tipos_mapeados(email_col, phone_col, id_col))
+    if checkpoint:
+        return _procesar_con_checkpoint(origen, destino, email_col, phone_col, id_col, hashing, workers, cache,
+                                        chunksize, motor, formato, hoja, compresion, dedup, modo_dedup, perfil,
+                                        checkpoint, progreso)
+    if isinstance(destino, (str, os.PathLike)):
+        if compresion and nombre_interno is None:
+            nombre_interno = _nombre_interno(destino, compresion)
+        with open(destino, "wb") as archivo:
+            return procesar_archivo(origen, archivo, email_col, phone_col, id_col, hashing, workers, cache,
+                                    chunksize, motor, formato, hoja, compresion, nombre_interno, dedup,
+                                    modo_dedup, perfil, progreso=progreso)
+
+    mapeadas = [c for c in (email_col, phone_col, id_col) if c != COL_IGNORAR]
+    claves = columnas_clave(email_col, phone_col, id_col, perfil)
+    nombre_interno = nombre_interno or nombre_salida("datos", formato)
+    try:
+        with abrir_compresion(destino, compresion, nombre_interno) as salida:
+            with EscritorSalida(salida, formato) as escritor:
+                filas_entrada = 0
+                for bloque in medir_iterador("leer", leer_bloques(origen, mapeadas, chunksize, motor, hoja)):
+                    filas_entrada += len(bloque)
+                    with etapa("limpiar", len(bloque)):
+                        bloque = limpiar_bloque(bloque, email_col, phone_col, id_col, hashing, workers, cache, perfil)
+                    if dedup is not None and claves:
+                        with etapa("dedup", len(bloque)):
+                            bloque = deduplicar_bloque(bloque, dedup, claves, modo_dedup)
+                    with etapa("escribir", len(bloque)):
+                        escritor.escribir(bloque)
+                    if progreso is not None:
+                        progreso(filas_entrada)
+    except BaseException:
+        # Sin salida completa sus claves no se subieron: repetir el archivo no debe darlas por vistas
+        if dedup is not None:
+            dedup.descartar()
+        raise
+    return escritor.filas
+
+def _procesar_con_checkpoint(origen, destino, email_col, phone_col, id_col, hashing, workers, cache, chunksize,
+                             motor, formato, hoja, compresion, dedup, modo_dedup, perfil, checkpoint, progreso=None):
+    """
+    procesar_archivo con checkpoints: al cerrar cada bloque se sincroniza la
+    salida a disco y se guarda bloques, filas, bytes de salida y estado de la
+    deduplicacion. Con un checkpoint de la misma firma la salida se recorta
+    al ultimo bloque completo y se sigue desde ahi; el resultado es identico
+    al de una corrida sin cortes. Un trabajo ya terminado no se rehace.
+
+    Solo CSV, sin comprimir o con gzip/zstd: cada bloque se comprime como un
+    miembro gzip / frame zstd propio, para poder continuar el archivo (el
+    contenido descomprimido es el mismo que sin checkpoints). Los bloques ya
+    hechos se vuelven a leer pero no se limpian, hashean ni escriben.
+    """
+    if not isinstance(destino, (str, os.PathLike)):
+        raise ValueError("Los checkpoints necesitan una ruta de salida")
+    if formato != "csv" or compresion not in (None, "gzip", "zstd"):
+        raise ValueError("Los checkpoints solo se pueden usar con salida CSV (sin comprimir, gzip o zstd)")
+    ruta = ruta_checkpoint(destino) if checkpoint is True else checkpoint
+    firma = firma_trabajo(origen, destino, columnas=(email_col, phone_col, id_col), hashing=hashing,
+                          chunksize=chunksize, motor=motor, hoja=hoja, compresion=compresion, perfil=perfil,
+                          dedup=dedup is not None and os.path.abspath(dedup.indice.carpeta), modo_dedup=modo_dedup)
+
+    # Dos trabajos con la misma salida la corromperian: el segundo falla con CheckpointOcupado
+    with usar_checkpoint(ruta):
+        estado = leer_checkpoint(ruta, firma)
+        if estado is not None and not (os.path.exists(destino) and os.path.getsize(destino) >= estado["bytes"]):
+            estado = None
+        if estado is not None and estado["completo"]:
+            if dedup is not None:
+                dedup.reanudar(estado["dedup"])
+            return estado["filas"]
+        if estado is None:
+            estado = {"bloques": 0, "filas_entrada": 0, "filas": 0, "bytes": 0, "completo": False, "dedup": None}
+        elif dedup is not None:
+            dedup.reanudar(estado["dedup"])
+
+        mapeadas = [c for c in (email_col, phone_col, id_col) if c != COL_IGNORAR]
+        claves = columnas_clave(email_col, phone_col, id_col, perfil)
+        if hasattr(origen, "seek"):
+            origen.seek(0)
+        with open(destino, "r+b" if estado["bytes"] else "wb") as archivo:
+            # Lo escrito despues del ultimo checkpoint es de un bloque a medias
+            archivo.truncate(estado["bytes"])
+            archivo.seek(estado["bytes"])
+            bloques = medir_iterador("leer", leer_bloques(origen, mapeadas, chunksize, motor, hoja))
+            for numero, bloque in enumerate(bloques):
+                if numero < estado["bloques"]:
+                    continue
+                estado["filas_entrada"] += len(bloque)
+                with etapa("limpiar", len(bloque)):
+                    bloque = limpiar_bloque(bloque, email_col, phone_col, id_col, hashing, workers, cache, perfil)
+                if dedup is not None and claves:
+                    with etapa("dedup", len(bloque)):
+                        bloque = deduplicar_bloque(bloque, dedup, claves, modo_dedup)
+                with etapa("escribir", len(bloque)):
+                    with abrir_compresion(archivo, compresion) as salida:
+                        EscritorSalida(salida, formato, encabezado=numero == 0).escribir(bloque)
+                    archivo.flush()
+                    os.fsync(archivo.fileno())
+                estado.update(bloques=numero + 1, filas=estado["filas"] + len(bloque), bytes=archivo.tell(),
+                              dedup=dedup.estado() if dedup is not None else None)
+                guardar_checkpoint(ruta, firma, estado)
+                if progreso is not None:
+                    progreso(estado["filas_entrada"])
+        estado["completo"] = True
+        guardar_checkpoint(ruta, firma, estado)
+        return estado["filas"]
+
+def _procesar_para_lote(origen, destino, email_col, phone_col, id_col, hashing, motor, formato, hoja,
+                        compresion=None, carpeta_dedup=None, modo_dedup="eliminar", perfil=None, checkpoint=False,
+                        chunksize=TAMANO_CHUNK):
+    """
+    Trabajo de un proceso del lote: un archivo, hashing en el mismo proceso.
+    Un archivo con error no detiene el lote: se reporta en "error".
+    Con `carpeta_dedup` cada proceso abre el indice compartido y reporta sus conteos en "dedup".
+    Las columnas COL_AUTO se detectan por archivo; lo detectado va en "deteccion".
+    Con `checkpoint` la salida a medias se conserva al fallar, para retomarla.
+    Las etapas medidas (ver instrumentacion) van en "etapas".
+    """
+    inicio = time.perf_counter()
+    resultado = {"archivo": str(origen), "salida": str(destino), "filas": 0, "bytes": 0}
+    medicion = Medicion("archivo_lote")
+    try:
+        resultado["bytes"] = os.path.getsize(origen)
+        (email_col, phone_col, id_col), deteccion = resolver_columnas(origen, email_col, phone_col, id_col, hoja)
+        if deteccion is not None:
+            resultado["deteccion"] = deteccion
+        with contextlib.ExitStack() as pila:
+            pila.enter_context(medicion.activa())
+            dedup = None
+            if carpeta_dedup:
+                dedup = CorridaDedup(pila.enter_context(IndiceDedup(carpeta_dedup)))
+            resultado["filas"] = procesar_archivo(origen, destino, email_col, phone_col, id_col, hashing, workers=1,
+                                                  chunksize=chunksize, motor=motor, formato=formato, hoja=hoja, compresion=compresion,
+                                                  dedup=dedup, modo_dedup=modo_dedup, perfil=perfil,
+                                                  checkpoint=checkpoint)
+            if dedup is not None:
+                resultado["dedup"] = dedup.estadisticas()
+                resultado["corrida_dedup"] = dedup.id
+    except Exception as e:
+        resultado["error"] = f"{type(e).__name__}: {e}"
+        if os.path.exists(destino) and not checkpoint:
+            os.remove(destino)
+    resultado["segundos"] = time.perf_counter() - inicio
+    resultado["etapas"] = medicion.etapas
+    return resultado
+
+def descartar_corridas(carpeta_dedup, resultados):
+    """Quita del indice las claves de los archivos del lote que si terminaron (el lote no se entrega)"""
+    corridas = [r["corrida_dedup"] for r in resultados if "corrida_dedup" in r]
+    if carpeta_dedup and corridas:
+        with IndiceDedup(carpeta_dedup) as indice:
+            for corrida in corridas:
+                indice.descartar_corrida(corrida)
+
+def rutas_salida(rutas, carpeta_salida, formato="csv", compresion=None):
+    """
+    <carpeta_salida>/<nombre>_limpio.<csv|parquet|feather>[.gz|.zst|.zip] por
+    entrada; si dos entradas comparten nombre (a.csv, a.xlsx) se agrega la
+    extension original.
+    """
+    nombres = [os.path.splitext(os.path.basename(r)) for r in rutas]
+    repetidos = {n for n, _ in nombres if sum(1 for m, _ in nombres if m == n) > 1}
+    return [
+        os.path.join(carpeta_salida,
+                     nombre_salida(f"{n}{'_' + e.lstrip('.') if n in repetidos else ''}_limpio", formato, compresion))
+        for n, e in nombres
+    ]
+
+def procesar_lote(rutas, carpeta_salida, email_col=COL_IGNORAR, phone_col=COL_IGNORAR, id_col=COL_IGNORAR,
+                  hashing=True, workers=None, motor="pandas", formato="csv", hoja=None, compresion=None,
+                  carpeta_dedup=None, modo_dedup="eliminar", perfil=None, checkpoint=False, chunksize=TAMANO_CHUNK):
+    """
+    Procesa varios archivos en paralelo, un archivo por proceso, y genera
+    un dict de resultados (archivo, salida, filas, bytes, segundos y, si
+    fallo, error; con `carpeta_dedup`, los conteos en dedup) por archivo
+    conforme van terminando. Con `checkpoint` cada archivo guarda sus
+    checkpoints: al repetir el lote, los terminados no se rehacen y los
+    cortados siguen desde su ultimo bloque. `chunksize` son las filas por
+    bloque de cada archivo, como en procesar_archivo.
+    """
+    if perfil is not None:
+        # Las columnas COL_AUTO se validan en cada archivo, ya detectadas
+        perfil = validar_perfil(perfil, formato, tipos_mapeados(email_col, phone_col, id_col, (COL_IGNORAR, COL_AUTO)))
+    os.makedirs(carpeta_salida, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(rutas)) or 1
+    destinos = rutas_salida(rutas, carpeta_salida, formato, compresion)
+    if workers == 1:
+        for ruta, destino in zip(rutas, destinos):
+            yield _procesar_para_lote(ruta, destino, email_col, phone_col, id_col, hashing, motor, formato, hoja,
+                                      compresion, carpeta_dedup, modo_dedup, perfil, checkpoint, chunksize)
+        return
+
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto) as pool:
+        futuros = [
+            pool.submit(_procesar_para_lote, ruta, destino, email_col, phone_col, id_col, hashing, motor, formato,
+                        hoja, compresion, carpeta_dedup, modo_dedup, perfil, checkpoint, chunksize)
+            for ruta, destino in zip(rutas, destinos)
+        ]
+        try:
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        finally:
+            # Si se deja de consumir el generador (cancelacion), los archivos que no empezaron no se procesan
+            for futuro in futuros:
+                futuro.cancel()
+
+# --- LOTES: ZIP DE ENTRADA Y SALIDA COMBINADA ---
+def ruta_libre(carpeta, nombre):
+    """<carpeta>/<nombre>, o <nombre>_1, _2... si ya existe"""
+    base, ext = os.path.splitext(nombre)
+    destino, n = os.path.join(carpeta, nombre), 0
+    while os.path.exists(destino):
+        n += 1
+        destino = os.path.join(carpeta, f"{base}_{n}{ext}")
+    return destino
+
+def extraer_zip(origen, carpeta):
+    """
+    Extrae de un ZIP (ruta o archivo abierto) los archivos soportados a
+    `carpeta`, sin subcarpetas; nombres repetidos reciben un sufijo _1, _2...
+    Retorna sus rutas en el orden del ZIP.
+    """
+    rutas = []
+    with zipfile.ZipFile(origen) as archivo_zip:
+        for info in archivo_zip.infolist():
+            nombre = os.path.basename(info.filename)
+            # Carpetas y metadatos de macOS (__MACOSX/._archivo.csv) no son datos
+            if info.is_dir() or nombre.startswith("._") or not nombre.lower().endswith(EXTENSIONES_ENTRADA):
+                continue
+            destino = ruta_libre(carpeta, nombre)
+            with archivo_zip.open(info) as entrada, open(destino, "wb") as salida:
+                shutil.copyfileobj(entrada, salida)
+            rutas.append(destino)
+    return rutas
+
+def combinar_salidas(rutas, destino, formato="csv", compresion=None, nombre_interno=None):
+    """
+    Une en `destino` (ruta o archivo binario abierto) las salidas de un lote,
+    todas en `formato` y con las mismas columnas. Los CSV se concatenan por
+    bytes sin repetir el encabezado; Parquet y Feather se reescriben por bloques.
+    """
+    if isinstance(destino, (str, os.PathLike)):
+        if compresion and nombre_interno is None:
+            nombre_interno = _nombre_interno(destino, compresion)
+        with open(destino, "wb") as archivo:
+            return combinar_salidas(rutas, archivo, formato, compresion, nombre_interno)
+
+    with abrir_compresion(destino, compresion, nombre_interno or nombre_salida("datos", formato)) as salida:
+        if formato == "csv":
+            encabezado = None
+            for ruta in rutas:
+                with open(ruta, "rb") as entrada:
+                    primera = entrada.readline()
+                    if encabezado is None:
+                        encabezado = primera
+                        salida.write(primera)
+                    elif primera != encabezado:
+                        raise ValueError(f"{os.path.basename(ruta)} no tiene las mismas columnas que el primer archivo")
+                    shutil.copyfileobj(entrada, salida, TAMANO_BLOQUE_ARROW)
+            return
+        with EscritorSalida(salida, formato) as escritor:
+            for ruta in rutas:
+                for tabla in leer_bloques(ruta):
+                    escritor.escribir(tabla)
+
+def empaquetar_salidas(rutas, destino):
+    """Junta las salidas de un lote, una por archivo, en un ZIP (ruta o archivo binario abierto)"""
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=NIVEL_GZIP) as archivo_zip:
+        for ruta in rutas:
+            archivo_zip.write(ruta, os.path.basename(ruta))
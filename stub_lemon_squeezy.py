@@ -0,0 +1,82 @@
+"""
+Servidor falso de la API de licencias de Lemon Squeezy, para pruebas locales.
+
+Simula latencia, fallas del servidor y limite de peticiones. Para usarlo con la app:
+  python stub_lemon_squeezy.py --latencia 2 --tasa-fallos 0.2 --limite-por-minuto 10
+  LEMON_SQUEEZY_URL=http://127.0.0.1:8765 streamlit run app.py
+
+Claves validas por defecto: TEST-OK-1, TEST-OK-2 (cambiar con --claves).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+def crear_handler(claves, latencia, tasa_fallos, limite_por_minuto):
+    peticiones = deque()
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo, headers=None):
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            for nombre, valor in (headers or {}).items():
+                self.send_header(nombre, valor)
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_POST(self):
+            if self.path != "/v1/licenses/activate":
+                return self._responder(404, {"error": "Not found"})
+
+            ahora = time.monotonic()
+            with lock:
+                while peticiones and peticiones[0] < ahora - 60:
+                    peticiones.popleft()
+                limitado = limite_por_minuto and len(peticiones) >= limite_por_minuto
+                peticiones.append(ahora)
+            if limitado:
+                return self._responder(429, {"error": "Too Many Attempts."}, {"Retry-After": "60"})
+
+            time.sleep(latencia)
+            if random.random() < tasa_fallos:
+                return self._responder(500, {"error": "Internal Server Error"})
+
+            largo = int(self.headers.get("Content-Length", 0))
+            clave = parse_qs(self.rfile.read(largo).decode()).get("license_key", [""])[0]
+            if clave in claves:
+                return self._responder(200, {
+                    "activated": True, "error": None,
+                    "license_key": {"key": clave, "status": "active"},
+                    "instance": {"id": str(random.randint(1, 10**9))},
+                    "meta": {"store_id": 1, "product_name": "AdData Cleaner PRO"},
+                })
+            return self._responder(400, {"activated": False, "error": "license_key not found."})
+
+        def log_message(self, formato, *args):
+            print(f"[stub] {self.address_string()} {formato % args}")
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--claves", nargs="+", default=["TEST-OK-1", "TEST-OK-2"], help="Claves que se activan")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera por peticion")
+    parser.add_argument("--tasa-fallos", type=float, default=0.0, help="Fraccion de peticiones que responden 500")
+    parser.add_argument("--limite-por-minuto", type=int, default=0, help="Peticiones por minuto antes de 429 (0 = sin limite)")
+    args = parser.parse_args()
+
+    handler = crear_handler(set(args.claves), args.latencia, args.tasa_fallos, args.limite_por_minuto)
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), handler)
+    print(f"🧪 Stub de Lemon Squeezy en http://127.0.0.1:{args.puerto}")
+    servidor.serve_forever()
+
+if __name__ == "__main__":
+    main()
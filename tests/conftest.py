@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos de AdData Cleaner viven en la carpeta superior (sin paquete instalable)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
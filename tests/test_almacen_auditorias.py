@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls"))
+from almacen_auditorias import AlmacenAuditorias
+from motor_cfdi import REGLAS, auditar_xmls
+
+FACTURA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls", "test_xmls_cfdi",
+                       "factura_1.xml")
+UUID = "6f1c2b9e-1a2b-4c3d-8e9f-0a1b2c3d4e5f"
+
+def timbrada(uuid, total="55774.74"):
+    """factura_1.xml con TimbreFiscalDigital (y otro Total, para simular un XML alterado)"""
+    with open(FACTURA, "rb") as archivo:
+        xml = archivo.read().decode()
+    timbre = (f'<cfdi:Complemento><tfd:TimbreFiscalDigital xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital" '
+              f'Version="1.1" UUID="{uuid}"/></cfdi:Complemento>')
+    xml = xml.replace('Total="55774.74"', f'Total="{total}"').replace("</cfdi:Comprobante>", timbre + "</cfdi:Comprobante>")
+    return xml.encode()
+
+def test_por_uuid_encuentra_auditorias_anteriores(tmp_path):
+    with AlmacenAuditorias(str(tmp_path / "auditorias.sqlite")) as almacen:
+        list(auditar_xmls([("a.xml", timbrada(UUID)), ("sin_timbre.xml", open(FACTURA, "rb").read())],
+                          REGLAS, set(), workers=1, almacen=almacen))
+        assert len(almacen.por_uuid(UUID.upper())) == 1
+        # El mismo contenido no agrega huellas; otro XML con el mismo UUID si
+        list(auditar_xmls([("b.xml", timbrada(UUID)), ("c.xml", timbrada(UUID.upper(), "1.00"))],
+                          REGLAS, set(), workers=1, almacen=almacen))
+        assert len(almacen.por_uuid(UUID)) == 2
+        assert almacen.por_uuid("SIN TIMBRE") == []
@@ -0,0 +1,76 @@
+import fcntl
+import functools
+import threading
+
+import pandas as pd
+import pytest
+
+from checkpoints import CheckpointOcupado, ruta_checkpoint, usar_checkpoint
+import limpiar
+import motor_limpieza
+from motor_limpieza import procesar_archivo
+
+@pytest.fixture
+def entrada(tmp_path):
+    ruta = tmp_path / "entrada.csv"
+    pd.DataFrame({"email": ["a@x.com", "b@y.mx"]}).to_csv(ruta, index=False)
+    return ruta
+
+def en_otro_hilo(funcion):
+    """Corre `funcion` en otro hilo y retorna la excepcion que lanzo (o None)"""
+    error = []
+    def correr():
+        try:
+            funcion()
+        except Exception as e:
+            error.append(e)
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    hilo.join()
+    return error[0] if error else None
+
+def test_misma_salida_en_dos_trabajos(entrada, tmp_path):
+    destino = tmp_path / "salida.csv"
+    checkpoint = tmp_path / "checkpoint.json"
+    with usar_checkpoint(checkpoint):
+        error = en_otro_hilo(lambda: procesar_archivo(entrada, destino, email_col="email", checkpoint=str(checkpoint)))
+    assert isinstance(error, CheckpointOcupado)
+    assert not destino.exists()
+    # Al soltarlo, el siguiente trabajo lo puede usar
+    assert procesar_archivo(entrada, destino, email_col="email", checkpoint=str(checkpoint)) == 2
+
+def test_bloqueo_entre_procesos(tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    with open(str(checkpoint) + ".lock", "a") as otro_proceso:
+        fcntl.flock(otro_proceso, fcntl.LOCK_EX)
+        with pytest.raises(CheckpointOcupado):
+            with usar_checkpoint(checkpoint):
+                pass
+
+def test_mismo_hilo_puede_anidar(entrada, tmp_path):
+    destino = tmp_path / "salida.csv"
+    checkpoint = ruta_checkpoint(destino, tmp_path)
+    with usar_checkpoint(checkpoint):
+        assert procesar_archivo(entrada, destino, email_col="email", checkpoint=checkpoint) == 2
+    # Soltado del todo al salir del bloque externo
+    def usar():
+        with usar_checkpoint(checkpoint):
+            pass
+    assert en_otro_hilo(usar) is None
+
+@pytest.mark.parametrize("lote", [False, True])
+def test_cli_borra_checkpoint_al_terminar(entrada, tmp_path, monkeypatch, lote):
+    # Un solo archivo: el lote corre en este proceso y ve el monkeypatch
+    carpeta = tmp_path / "checkpoints"
+    en_carpeta = functools.partial(ruta_checkpoint, carpeta=str(carpeta))
+    monkeypatch.setattr(motor_limpieza, "ruta_checkpoint", en_carpeta)
+    monkeypatch.setattr(limpiar, "ruta_checkpoint", en_carpeta)
+    if lote:
+        salida = tmp_path / "salidas"
+        destino = salida / "entrada_limpio.csv"
+    else:
+        salida = destino = tmp_path / "salida.csv"
+    assert limpiar.main([str(entrada), "-o", str(salida), "--email", "email", "--reanudar"]) == 0
+    assert destino.exists()
+    # Solo queda el .lock (no se borra nunca)
+    assert not list(carpeta.glob("*.json"))
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from detector_columnas import columnas_detectadas, detectar_columnas, puntajes_columnas
+
+FILAS = 200
+
+def muestra(**columnas):
+    return pd.DataFrame({nombre: valores[:FILAS] for nombre, valores in columnas.items()})
+
+def test_order_id_no_es_user_id():
+    # Unico por fila, pero identifica pedidos, no personas
+    datos = muestra(Order_ID=[str(1000 + i) for i in range(FILAS)],
+                    Customer_Email=[f"cliente{i}@correo.com" for i in range(FILAS)])
+    assert puntajes_columnas(datos)["Order_ID"]["id"] == 0.0
+    assert detectar_columnas(datos)["id"] is None
+
+def test_campaign_id_no_es_user_id():
+    datos = muestra(Campaign_ID=["Q1_PROMO", "EVERGREEN", "BLACK_FRIDAY"] * FILAS)
+    assert puntajes_columnas(datos)["Campaign_ID"]["id"] == 0.0
+    assert columnas_detectadas(detectar_columnas(datos), None) == (None, None, None)
+
+def test_id_generico_con_valores_repetidos():
+    datos = muestra(Legacy_ID=[f"OLD-{i % 120}" for i in range(FILAS)])
+    assert puntajes_columnas(datos)["Legacy_ID"]["id"] == 0.0
+
+def test_id_de_persona_se_detecta():
+    datos = muestra(ID_Cliente=[f"C-{i:04d}" for i in range(FILAS)],
+                    User_ID_CRM=[f"USER_{i % 150}" for i in range(FILAS)])
+    # ID_Cliente: pista generica y valores unicos; User_ID_CRM: pista fuerte aunque se repita
+    assert puntajes_columnas(datos)["ID_Cliente"]["id"] >= 0.5
+    assert detectar_columnas(datos)["id"]["columna"] == "User_ID_CRM"
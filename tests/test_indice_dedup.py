@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from indice_dedup import CorridaDedup, IndiceDedup
+from motor_limpieza import procesar_archivo
+
+@pytest.fixture
+def entrada(tmp_path):
+    ruta = tmp_path / "audiencia.csv"
+    pd.DataFrame({"email": [f"cliente{i}@x.com" for i in range(30)]}).to_csv(ruta, index=False)
+    return ruta
+
+def cortar_al_segundo_bloque(filas):
+    if filas > 10:
+        raise KeyboardInterrupt
+
+def test_corrida_cancelada_no_deja_claves(entrada, tmp_path):
+    with IndiceDedup(tmp_path / "indice") as indice:
+        # Una carga anterior que si termino
+        previa = pd.DataFrame({"email": ["cliente0@x.com"]})
+        procesar_archivo(previa, tmp_path / "previa.csv", email_col="email", dedup=CorridaDedup(indice))
+
+        with pytest.raises(KeyboardInterrupt):
+            procesar_archivo(entrada, tmp_path / "cortada.csv", email_col="email", chunksize=10,
+                             dedup=CorridaDedup(indice), progreso=cortar_al_segundo_bloque)
+        assert len(indice) == 1
+
+        dedup = CorridaDedup(indice)
+        assert procesar_archivo(entrada, tmp_path / "salida.csv", email_col="email", chunksize=10, dedup=dedup) == 29
+        assert dedup.estadisticas()["duplicadas_historial"] == 1
+        assert len(indice) == 30
+
+def test_descartar_corrida_entre_segmentos(tmp_path):
+    with IndiceDedup(tmp_path / "indice") as indice:
+        conservar, descartar = CorridaDedup(indice), CorridaDedup(indice)
+        for inicio in range(0, 40, 10):
+            # Bloques intercalados: las claves de las dos corridas se fusionan en los mismos segmentos
+            conservar.duplicados([f"a{i}" for i in range(inicio, inicio + 10)])
+            descartar.duplicados([f"b{i}" for i in range(inicio, inicio + 10)])
+        assert indice.descartar_corrida(descartar.id) == 40
+        assert len(indice) == 40
+        nueva = CorridaDedup(indice)
+        assert nueva.duplicados([f"a{i}" for i in range(40)]).all()
+        assert not nueva.duplicados([f"b{i}" for i in range(40)]).any()
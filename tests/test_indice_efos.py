@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls"))
+from indice_efos import IndiceEFOS
+
+def escribir_listado(ruta, definitivos, otros=()):
+    """Listado como lo publica el SAT: titulo antes del encabezado, latin-1"""
+    filas = ["LISTADO GLOBAL DEFINITIVO", "No,RFC,Nombre del Contribuyente,Situación del contribuyente"]
+    filas += [f"{i},{rfc},EMPRESA {i},Definitivo" for i, rfc in enumerate(definitivos)]
+    filas += [f"{i},{rfc},EMPRESA {i},Presunto" for i, rfc in enumerate(otros)]
+    ruta.write_bytes(("\n".join(filas) + "\n").encode("latin-1"))
+
+def test_listado_nuevo_se_recompila(tmp_path):
+    csv = tmp_path / "lista_negra_sat.csv"
+    escribir_listado(csv, ["AAA010101AAA", "BBB010101BBB"], otros=["CCC010101CCC"])
+    indice = IndiceEFOS(tmp_path / "indice")
+    anterior = indice.cargar(csv)
+    assert "AAA010101AAA" in anterior and "CCC010101CCC" not in anterior
+
+    # Publicacion nueva del SAT: un alta, una baja
+    escribir_listado(csv, ["AAA010101AAA", "DDD010101DDD", "EEE010101EEE"])
+    nueva = indice.cargar(csv)
+    assert sorted(nueva.rfcs()) == ["AAA010101AAA", "DDD010101DDD", "EEE010101EEE"]
+    assert {k: indice.estado()[k] for k in ("altas", "bajas", "rfcs")} == {"altas": 2, "bajas": 1, "rfcs": 3}
+    # Un proceso con la version anterior abierta la sigue leyendo
+    assert "BBB010101BBB" in anterior
+    # Sin cambios en el CSV no se recompila
+    assert indice.cargar(csv) is nueva
+    indice.cerrar()
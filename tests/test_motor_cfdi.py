@@ -0,0 +1,50 @@
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls"))
+import motor_cfdi
+from motor_cfdi import REGLAS, UMBRAL_PARALELO, auditar_xmls
+
+CARPETA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "valida_xmls", "test_xmls_cfdi")
+LISTA_NEGRA = {"AAA010101AAA", "SAT970701NN3"}
+
+@pytest.fixture(scope="module")
+def xmls():
+    base = []
+    for ruta in sorted(glob.glob(os.path.join(CARPETA, "*.xml"))):
+        with open(ruta, "rb") as archivo:
+            base.append((os.path.basename(ruta), archivo.read()))
+    veces = -(-UMBRAL_PARALELO // len(base))
+    return [(f"{i}/{nombre}", contenido) for i in range(veces) for nombre, contenido in base]
+
+@pytest.fixture(autouse=True)
+def sin_pools():
+    yield
+    for pool in motor_cfdi._pools.values():
+        pool.shutdown()
+    motor_cfdi._pools.clear()
+
+def test_el_pool_se_reutiliza(xmls):
+    serie = list(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=1))
+    assert list(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=2)) == serie
+    pool = next(iter(motor_cfdi._pools.values()))
+    assert list(auditar_xmls(xmls, list(reversed(REGLAS)), set(LISTA_NEGRA), workers=2)) == serie
+    assert list(motor_cfdi._pools.values()) == [pool]
+
+def test_otra_lista_negra_otro_pool(xmls, monkeypatch):
+    monkeypatch.setattr(motor_cfdi, "MAX_POOLS", 1)
+    alertas = lambda resultados: sum(datos.get("Val. EFOS") == "⛔ ALERTA EFO" for _, datos, _ in resultados)
+    assert alertas(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=2)) > 0
+    # Los workers del pool nuevo tienen la lista negra nueva
+    assert alertas(auditar_xmls(xmls, REGLAS, {"XAXX010101000"}, workers=2)) == 0
+    assert len(motor_cfdi._pools) == 1
+
+def test_cancelar_no_cierra_el_pool(xmls):
+    def cancelar(hechos):
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        list(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=2, progreso=cancelar))
+    assert len(list(auditar_xmls(xmls, REGLAS, LISTA_NEGRA, workers=2))) == len(xmls)
@@ -0,0 +1,20 @@
+import threading
+import time
+
+import motor_hash
+
+class PoolLento:
+    """Crear procesos tarda: deja la ventana en la que dos hilos creaban dos pools"""
+    def __init__(self, **opciones):
+        time.sleep(0.05)
+
+def test_un_solo_pool_con_hilos_concurrentes(monkeypatch):
+    monkeypatch.setattr(motor_hash, "_pools", {})
+    monkeypatch.setattr(motor_hash, "ProcessPoolExecutor", PoolLento)
+    pools = []
+    hilos = [threading.Thread(target=lambda: pools.append(motor_hash._obtener_pool(3))) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert len({id(pool) for pool in pools}) == 1
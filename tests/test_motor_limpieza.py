@@ -0,0 +1,174 @@
+import io
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+import motor_limpieza
+from motor_limpieza import (EscritorSalida, apply_hash, clean_generic, clean_phone_logic, limpiar_dataframe,
+                            limpiar_email, limpiar_generico, limpiar_tabla_arrow, limpiar_telefono, procesar_archivo,
+                            telefono_e164, validar_perfil)
+
+# --- VECTORIZADO VS ESCALAR ---
+# Letras cuyo lower de Arrow no es el de Python ('İ' -> 'i' vs 'i̇', sigma final), digitos unicode y nulos
+RAROS = [" İstanbul@X.com ", "ΟΔΟΣ@x.gr", "ᲉA@x.com", "Ꟛ@x.com", "KELVIN@x.com", "ǅ@x.com", "ß@X.DE",
+         "NULL", " nan ", "None", "", None, float("nan"), 5512345678, "55²1234", "\u00a0x@y.com\u2003",
+         "\x1cA@b.co", "ﬀ@x.com", "ÅNGSTRÖM@x.se"]
+
+def test_vectorizado_igual_que_escalar():
+    serie = pd.Series(RAROS, dtype=object)
+    texto = pd.Series([str(v) for v in RAROS], dtype="str")
+    for datos in (serie, texto):
+        assert limpiar_generico(datos).tolist() == [clean_generic(v) for v in datos]
+        assert limpiar_email(datos).tolist() == [clean_generic(v).lower() for v in datos]
+        assert limpiar_telefono(datos).tolist() == [clean_phone_logic(v) for v in datos]
+
+def test_hash_igual_que_escalar():
+    salida = limpiar_dataframe(pd.DataFrame({"email": RAROS}), email_col="email")
+    assert salida["email"].tolist() == [apply_hash(clean_generic(v).lower()) for v in RAROS]
+
+# --- ENTRADA ARROW: ENTEROS CON NULOS ---
+@pytest.fixture(params=["parquet", "feather"])
+def enteros_con_nulos(request, tmp_path):
+    """Telefono e ID como int64 con nulos, como los exporta un warehouse"""
+    tabla = pa.table({
+        "telefono": pa.array([5512345678, None], pa.int64()),
+        "id": pa.array([3, None], pa.int64()),
+        "grande": pa.array([9007199254740993, None], pa.int64()),
+    })
+    ruta = tmp_path / f"entrada.{request.param}"
+    if request.param == "parquet":
+        pq.write_table(tabla, ruta)
+    else:
+        feather.write_feather(tabla, ruta)
+    return ruta
+
+def test_enteros_con_nulos_a_csv(enteros_con_nulos, tmp_path):
+    destino = tmp_path / "salida.csv"
+    procesar_archivo(enteros_con_nulos, destino, phone_col="telefono", id_col="grande", hashing=False)
+    salida = pd.read_csv(destino, dtype=str, keep_default_na=False)
+    assert salida.to_dict("list") == {"telefono": ["5512345678", ""], "id": ["3", ""],
+                                      "grande": ["9007199254740993", ""]}
+
+def test_enteros_con_nulos_a_parquet(enteros_con_nulos, tmp_path):
+    destino = tmp_path / "salida.parquet"
+    procesar_archivo(enteros_con_nulos, destino, phone_col="telefono", id_col="id", hashing=False, formato="parquet")
+    salida = pq.read_table(destino)
+    assert salida.column("telefono").to_pylist() == ["5512345678", ""]
+    assert salida.column("id").to_pylist() == ["3", ""]
+    # La columna no mapeada conserva su tipo
+    assert salida.column("grande").to_pylist() == [9007199254740993, None]
+
+def test_enteros_con_nulos_hash(enteros_con_nulos, tmp_path):
+    destino = tmp_path / "salida.csv"
+    procesar_archivo(enteros_con_nulos, destino, phone_col="telefono")
+    texto = pd.DataFrame({"telefono": ["5512345678"]}).astype(str)
+    esperado = tmp_path / "esperado.csv"
+    procesar_archivo(texto, esperado, phone_col="telefono")
+    assert pd.read_csv(destino, dtype=str)["telefono"][0] == pd.read_csv(esperado, dtype=str)["telefono"][0]
+
+# --- ENTRADA CSV CON EL MOTOR ARROW ---
+def test_arrow_campo_multilinea_entre_bloques(tmp_path, monkeypatch):
+    monkeypatch.setattr(motor_limpieza, "TAMANO_BLOQUE_ARROW", 1024)
+    ruta = tmp_path / "notas.csv"
+    nota = "\n".join(f"linea {i}, con coma" for i in range(200))
+    filas = [f'c{i}@x.com,"{nota if i == 3 else "corta"}"' for i in range(10)]
+    ruta.write_text("email,notas\n" + "\n".join(filas) + "\n")
+
+    arrow, pandas_ = tmp_path / "arrow.csv", tmp_path / "pandas.csv"
+    procesar_archivo(ruta, arrow, email_col="email", motor="arrow")
+    procesar_archivo(ruta, pandas_, email_col="email", motor="pandas")
+    assert arrow.read_bytes() == pandas_.read_bytes()
+    assert pd.read_csv(arrow)["notas"][3] == nota
+    # Un archivo subido (en memoria) se vuelve a leer desde el inicio al reintentar
+    subido = io.BytesIO(ruta.read_bytes())
+    subido.name = "notas.csv"
+    procesar_archivo(subido, arrow, email_col="email", motor="arrow")
+    assert arrow.read_bytes() == pandas_.read_bytes()
+
+# --- ESCRITURA PARQUET / FEATHER ---
+@pytest.mark.parametrize("formato", ["parquet", "feather"])
+def test_columna_object_con_tipos_mezclados(formato, tmp_path):
+    destino = tmp_path / f"salida.{formato}"
+    with EscritorSalida(destino, formato) as escritor:
+        escritor.escribir(pd.DataFrame({"codigo": [1, "A-2", None]}, dtype=object))
+    tabla = pq.read_table(destino) if formato == "parquet" else feather.read_table(destino)
+    assert tabla.column("codigo").to_pylist() == ["1", "A-2", None]
+
+@pytest.mark.parametrize("formato", ["parquet", "feather"])
+def test_columna_nula_en_el_primer_bloque(formato, tmp_path):
+    destino = tmp_path / f"salida.{formato}"
+    with EscritorSalida(destino, formato) as escritor:
+        escritor.escribir(pd.DataFrame({"notas": [None, None]}, dtype=object))
+        escritor.escribir(pd.DataFrame({"notas": ["llamar", None]}, dtype=object))
+    tabla = pq.read_table(destino) if formato == "parquet" else feather.read_table(destino)
+    assert tabla.column("notas").to_pylist() == [None, None, "llamar", None]
+
+# --- XLSX EN STREAMING ---
+def test_xlsx_igual_que_read_excel(tmp_path):
+    ruta = tmp_path / "mixto.xlsx"
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(["email", "telefono", "fecha", "monto", "codigo", "notas", "activo"])
+    hoja.append([" Ana@X.com", 5512345678, datetime(2026, 1, 7), 1.0, 7, "N/A", True])
+    hoja.append([None, None, datetime(2026, 1, 8, 9, 30), 2.5, "B-2", None, False])
+    hoja.append(["luis@y.mx", "55 1234 0000", None, 3, "0042", "llamar", None])
+    libro.save(ruta)
+
+    streaming, anterior = tmp_path / "streaming.csv", tmp_path / "anterior.csv"
+    procesar_archivo(ruta, streaming, email_col="email", phone_col="telefono", hashing=False)
+    procesar_archivo(pd.read_excel(ruta), anterior, email_col="email", hashing=False)
+    nuevo = pd.read_csv(streaming, dtype=str, keep_default_na=False)
+    viejo = pd.read_csv(anterior, dtype=str, keep_default_na=False)
+    # Las columnas no mapeadas salen con el mismo texto que con read_excel (fechas, 1.0, N/A)
+    assert nuevo.drop(columns="telefono").equals(viejo.drop(columns="telefono"))
+    # El telefono mapeado no pasa por float64 aunque tenga celdas vacias
+    assert nuevo["telefono"].tolist() == ["5512345678", "", "5512340000"]
+
+# --- PERFILES DE SALIDA ---
+CONTACTOS = pd.DataFrame({"email": ["a@x.com"], "telefono": ["55 1234 5678"], "id": ["U-1"]})
+
+def test_perfil_sin_variante_para_una_columna_mapeada(tmp_path):
+    # Solo e164: la columna de email desapareceria de la salida
+    with pytest.raises(ValueError, match="email"):
+        validar_perfil(["e164", "e164_hash"], tipos=["email", "telefono"])
+    with pytest.raises(ValueError, match="email"):
+        limpiar_dataframe(CONTACTOS, email_col="email", phone_col="telefono", perfil=["e164"])
+    with pytest.raises(ValueError, match="id"):
+        limpiar_tabla_arrow(pa.Table.from_pandas(CONTACTOS), id_col="id", perfil=["e164"])
+    with pytest.raises(ValueError, match="email"):
+        procesar_archivo(CONTACTOS, tmp_path / "salida.csv", email_col="email", perfil="e164")
+
+def test_perfil_e164_solo_para_telefono():
+    salida = limpiar_dataframe(CONTACTOS, phone_col="telefono", perfil=["e164"])
+    assert salida.columns.tolist() == ["email", "telefono_e164", "id"]
+    assert salida["telefono_e164"].tolist() == ["+525512345678"]
+
+@pytest.mark.parametrize("telefono, esperado", [
+    ("1234 5678", ""), ("123 456 789", ""), ("1 555 123 4567", ""),          # 8, 9 y 11 digitos sin prefijo
+    ("+1 555 123 4567", "+15551234567"), ("0044 20 7946 0958", "+442079460958"),
+    ("55 1234 5678", "+525512345678"), ("52 55 1234 5678", "+525512345678"), ("52 1 55 1234 5678", "+525512345678"),
+])
+def test_e164_sin_prefijo_no_inventa_pais(telefono, esperado):
+    assert telefono_e164(pd.Series([telefono])).tolist() == [esperado]
+
+# --- LOTES ---
+def test_lote_usa_chunksize(tmp_path, monkeypatch):
+    rutas = []
+    for nombre in ("a.csv", "b.csv"):
+        rutas.append(tmp_path / nombre)
+        pd.DataFrame({"email": [f"c{i}@x.com" for i in range(25)]}).to_csv(rutas[-1], index=False)
+    bloques = []
+    leer_bloques = motor_limpieza.leer_bloques
+    def contar_bloques(origen, columnas_mapeadas=(), chunksize=motor_limpieza.TAMANO_CHUNK, *args):
+        bloques.append(chunksize)
+        return leer_bloques(origen, columnas_mapeadas, chunksize, *args)
+    monkeypatch.setattr(motor_limpieza, "leer_bloques", contar_bloques)
+    # Un worker: los archivos se procesan en este proceso
+    resultados = list(motor_limpieza.procesar_lote(rutas, tmp_path / "salidas", "email", workers=1, chunksize=10))
+    assert [r["filas"] for r in resultados] == [25, 25]
+    assert bloques == [10, 10]
@@ -0,0 +1,138 @@
+"""
+Almacen persistente de auditorias de CFDI (SQLite) para el Auditor Fiscal.
+
+Volver a subir una carpeta ya auditada re-parseaba y re-validaba todo. Aqui
+se guarda el resultado de cada XML por SHA256 de su contenido y por el
+contexto de la auditoria: las reglas activas y la version de la lista
+negra. Un XML sin cambios, auditado con las mismas reglas y la misma lista,
+sale del almacen; si cambian las reglas o se publica otra lista EFOS, el
+contexto es otro y se vuelve a auditar.
+
+Cada resultado guarda tambien el UUID del timbre (con indice), para buscar
+un UUID entre auditorias anteriores. Solo se conservan los MAX_CONTEXTOS
+contextos usados mas recientemente.
+
+El almacen es una ayuda: si SQLite falla, la auditoria sigue sin el.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ARCHIVO_ALMACEN = os.environ.get(
+    "AUDITOR_ALMACEN", os.path.join(os.path.expanduser("~"), ".auditor_auditorias.sqlite3"))
+# Cambia si cambia la lectura o alguna validacion: los resultados guardados dejan de servir
+VERSION = 1
+# Contextos (reglas + lista negra) que se conservan; los demas se borran al abrir uno nuevo
+MAX_CONTEXTOS = 8
+# Segundos que SQLite espera si otro proceso tiene la base bloqueada
+ESPERA_BLOQUEO = 30
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS auditorias (
+    huella TEXT NOT NULL,
+    contexto TEXT NOT NULL,
+    uuid TEXT,
+    exito INTEGER NOT NULL,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (huella, contexto)
+);
+CREATE INDEX IF NOT EXISTS auditorias_uuid ON auditorias (uuid);
+CREATE TABLE IF NOT EXISTS contextos (
+    contexto TEXT PRIMARY KEY,
+    descripcion TEXT NOT NULL,
+    usado REAL NOT NULL
+);
+"""
+
+def firma_lista(blacklist):
+    """Version de la lista negra: la firma del indice compilado o un hash de sus RFC"""
+    firma = getattr(blacklist, "firma", None)
+    if firma is not None:
+        return firma
+    return hashlib.sha256("\n".join(sorted(blacklist)).encode()).hexdigest()[:16] if blacklist else "sin_lista"
+
+def contexto_auditoria(reglas_activas, blacklist):
+    """(contexto, descripcion): lo que cambia el resultado de auditar un mismo XML"""
+    descripcion = {"version": VERSION, "reglas": sorted(reglas_activas)}
+    # La lista negra solo cuenta si se valida contra ella
+    if "Lista Negra SAT (EFOS)" in reglas_activas:
+        descripcion["efos"] = firma_lista(blacklist)
+    texto = json.dumps(descripcion, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode()).hexdigest()[:32], texto
+
+def _sin_errores():
+    """Un error de SQLite (base bloqueada, disco lleno) no corta la auditoria: solo no se usa el almacen"""
+    return contextlib.suppress(sqlite3.Error)
+
+def _uuid(datos):
+    """UUID del timbre para el indice (None si el XML no tiene timbre o no se pudo leer)"""
+    uuid = datos.get("UUID")
+    return uuid.upper() if uuid and uuid != "SIN TIMBRE" else None
+
+class AlmacenAuditorias:
+    """Resultados por (huella del XML, contexto), en una base SQLite compartible entre procesos"""
+
+    def __init__(self, ruta=ARCHIVO_ALMACEN):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._conexion = sqlite3.connect(ruta, timeout=ESPERA_BLOQUEO, check_same_thread=False)
+        # WAL: los lectores de otros procesos no bloquean a quien escribe
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.executescript(ESQUEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def usar_contexto(self, contexto, descripcion):
+        """Marca el contexto como usado y borra los resultados de los contextos mas viejos"""
+        with self._lock, _sin_errores(), self._conexion:
+            self._conexion.execute(
+                "INSERT INTO contextos VALUES (?, ?, ?) ON CONFLICT (contexto) DO UPDATE SET usado = excluded.usado",
+                (contexto, descripcion, time.time()))
+            viejos = [fila[0] for fila in self._conexion.execute(
+                "SELECT contexto FROM contextos ORDER BY usado DESC LIMIT -1 OFFSET ?", (MAX_CONTEXTOS,))]
+            for viejo in viejos:
+                self._conexion.execute("DELETE FROM auditorias WHERE contexto = ?", (viejo,))
+                self._conexion.execute("DELETE FROM contextos WHERE contexto = ?", (viejo,))
+
+    def buscar(self, huellas, contexto):
+        """{huella: (datos, exito)} de las huellas ya auditadas en este contexto ({} si la base falla)"""
+        encontrados = {}
+        huellas = list(set(huellas))
+        with self._lock, _sin_errores():
+            # De a 500: SQLite limita los parametros de una consulta
+            for i in range(0, len(huellas), 500):
+                parte = huellas[i:i + 500]
+                filas = self._conexion.execute(
+                    f"SELECT huella, datos, exito FROM auditorias WHERE contexto = ? "
+                    f"AND huella IN ({','.join('?' * len(parte))})", [contexto, *parte])
+                for huella, datos, exito in filas:
+                    encontrados[huella] = (json.loads(datos), bool(exito))
+        return encontrados
+
+    def guardar(self, resultados, contexto):
+        """Guarda [(huella, datos, exito)] auditados en este contexto"""
+        filas = [(huella, contexto, _uuid(datos), int(exito), json.dumps(datos, ensure_ascii=False))
+                 for huella, datos, exito in resultados]
+        with self._lock, _sin_errores(), self._conexion:
+            self._conexion.executemany("INSERT OR REPLACE INTO auditorias VALUES (?, ?, ?, ?, ?)", filas)
+
+    def por_uuid(self, uuid):
+        """Huellas de los XML auditados con este UUID (en cualquier contexto; [] si la base falla)"""
+        huellas = set()
+        with self._lock, _sin_errores():
+            huellas.update(fila[0] for fila in self._conexion.execute(
+                "SELECT huella FROM auditorias WHERE uuid = ?", (uuid.upper(),)))
+        return sorted(huellas)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
-import xml.etree.ElementTree as ET
 from io import BytesIO
-from datetime import datetime
-import re
 import os
+import sys
+import sqlite3
 import time
+import zipfile
+
+# La cola de trabajos es la misma que usa AdData Cleaner (carpeta superior)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache_resultados import huella_contenido
+from cola_trabajos import ColaLlena, ColaTrabajos
+from instrumentacion import Medicion, etapa
+from almacen_auditorias import AlmacenAuditorias
+from indice_efos import cargar_lista_negra
+from motor_cfdi import REGLAS, auditar_xmls, contenidos, entradas_xml
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(
@@ -48,6 +57,17 @@ USERS_DB = {
     }
 }
 
+# --- COLA DE TRABAJOS ---
+# RAM estimada por byte de XML (copia del contenido enviada a los workers + filas del resultado; la
+# lectura ya no arma el arbol del XML)
+FACTOR_MEMORIA_XML = 4
+INTERVALO_PROGRESO = 0.5
+
+@st.cache_resource
+def cola_trabajos():
+    """Cola del servidor compartida por todas las sesiones: las auditorias grandes esperan turno"""
+    return ColaTrabajos()
+
 # --- ESTILOS CSS (MODO LIGHT / CLEAN) ---
 st.markdown("""
 <style>
@@ -129,122 +149,73 @@ else:
     # --- 1. CARGA BD SAT ---
     ARCHIVO_SAT_LOCAL = "lista_negra_sat.csv"
 
-    @st.cache_data
     def cargar_lista_negra_local():
-        if not os.path.exists(ARCHIVO_SAT_LOCAL):
-            return set(), False, "Base de datos SAT no encontrada"
-        try:
-            try: df = pd.read_csv(ARCHIVO_SAT_LOCAL, encoding='latin-1', skiprows=2)
-            except: df = pd.read_csv(ARCHIVO_SAT_LOCAL, encoding='latin-1')
-
-            df.columns = [str(c).strip().upper() for c in df.columns]
-            col_rfc = next((c for c in df.columns if 'RFC' in c), None)
-            col_sit = next((c for c in df.columns if 'SITUACI' in c), None)
-
-            if col_rfc and col_sit:
-                efos = df[df[col_sit].astype(str).str.contains("Definitivo", case=False, na=False)]
-                lista_rfcs = set(efos[col_rfc].astype(str).str.strip().str.upper())
-                return lista_rfcs, True, f"Base SAT Activa: {len(lista_rfcs):,} empresas"
-            return set(), False, "Formato CSV inválido"
-        except Exception as e:
-            return set(), False, f"Error: {str(e)}"
+        # Indice compilado en disco (indice_efos): solo se recompila si cambia el CSV, asi que
+        # revisarlo en cada ejecucion del script cuesta un stat y un json
+        return cargar_lista_negra(ARCHIVO_SAT_LOCAL)
 
     EFOS_SET, SAT_DB_ACTIVA, MENSAJE_SAT = cargar_lista_negra_local()
 
-    # --- 2. VALIDACIONES ---
-    def validar_efos(rfc, blacklist):
-        if not blacklist: return "❓ No verificado"
-        if rfc in blacklist: return "⛔ ALERTA EFO"
-        return "✅ Limpio"
-
-    def validar_timbrado(nodo_tfd):
-        if nodo_tfd is None: return "⛔ NO TIMBRADO"
-        if not nodo_tfd.get("UUID"): return "⛔ Sin UUID"
-        return "✅ Timbrado OK"
-
-    def validar_aritmetica(subtotal, impuestos, total):
-        calculado = subtotal + impuestos
-        diff = abs(calculado - total)
-        return "✅ OK" if diff < 1.0 else f"⚠️ Descuadre (${diff:.2f})"
-
-    def validar_rfc_estructura(rfc):
-        if not rfc: return "⚠️ RFC Vacío"
-        rfc = rfc.upper().strip()
-        patron = r"^[A-Z&Ñ]{3,4}\d{6}[A-V1-9][A-Z1-9]\d$"
-        if not re.match(patron, rfc): return f"⚠️ Inválido ({len(rfc)})"
-        return "✅ OK"
-
-    def validar_moneda_cambio(moneda, tipo_cambio):
-        moneda = moneda.upper()
-        try: tc = float(tipo_cambio) if tipo_cambio else 1.0
-        except: return "⚠️ TC Error"
-        if moneda == "MXN" and tc != 1.0: return f"⚠️ MXN con TC {tc}"
-        if moneda != "MXN" and (not tipo_cambio or tc == 1.0): return f"⚠️ {moneda} TC dudoso"
-        return "✅ OK"
-
-    def validar_metodo_pago(metodo, forma_pago):
-        if metodo == "PPD" and forma_pago != "99": return "⚠️ PPD error"
-        if metodo == "PUE" and forma_pago == "99": return "⚠️ PUE error"
-        return "✅ OK"
-
-    def validar_fecha_reciente(fecha_str):
-        try:
-            fecha_dt = datetime.strptime(fecha_str[:10], "%Y-%m-%d")
-            dias = (datetime.now() - fecha_dt).days
-            return "⚠️ >1 año" if dias > 365 else "✅ OK"
-        except: return "⚠️ Fecha Error"
+    def auditar(trabajo, entradas, reglas_activas, blacklist_set, bytes_entrada):
+        """
+        Trabajo de la cola: valida los XML de entradas_xml() en el pool de
+        motor_cfdi (reporta avance por lote) y arma el Excel. Los XML ya
+        auditados salen del almacen de auditorias. Retorna (df, excel,
+        metricas por etapa, {UUID: XML distintos con ese UUID en auditorias anteriores}).
+        """
+        medicion = Medicion("auditor_xml", archivos=len(entradas), bytes_entrada=bytes_entrada,
+                            reglas=len(reglas_activas))
+        df = excel = None
+        anteriores = {}
+        huellas = set()
+
+        def con_huella(entradas):
+            for nombre, contenido in contenidos(entradas):
+                if almacen is not None:
+                    huellas.add(huella_contenido(contenido))
+                yield nombre, contenido
 
-    def parse_cfdi(file_content, reglas_activas, blacklist_set):
         try:
-            tree = ET.parse(file_content)
-            root = tree.getroot()
-            ns = {'cfdi': 'http://www.sat.gob.mx/cfd/4', 'tfd': 'http://www.sat.gob.mx/TimbreFiscalDigital'}
-            
-            subtotal = float(root.get("SubTotal", 0))
-            total = float(root.get("Total", 0))
-            metodo = root.get("MetodoPago", "")
-            forma = root.get("FormaPago", "")
-            fecha = root.get("Fecha", "")
-            moneda = root.get("Moneda", "MXN")
-            tipo_cambio = root.get("TipoCambio", "")
-            
-            emisor = root.find("cfdi:Emisor", ns)
-            rfc_emisor = emisor.get("Rfc", "").upper().strip() if emisor is not None else ""
-            nombre_emisor = emisor.get("Nombre", "") if emisor is not None else ""
-            
-            total_impuestos = 0.0
-            impuestos = root.find("cfdi:Impuestos", ns)
-            if impuestos is not None:
-                traslados = impuestos.get("TotalImpuestosTrasladados")
-                if traslados: total_impuestos = float(traslados)
-                else:
-                    for tras in impuestos.findall(".//cfdi:Traslado", ns):
-                        total_impuestos += float(tras.get("Importe", 0))
-
-            tfd_node = None
-            complemento = root.find("cfdi:Complemento", ns)
-            if complemento is not None: tfd_node = complemento.find("tfd:TimbreFiscalDigital", ns)
-
-            data = {
-                "Archivo": "...",
-                "UUID": tfd_node.get("UUID") if tfd_node is not None else "SIN TIMBRE",
-                "Fecha": fecha[:10],
-                "RFC Emisor": rfc_emisor,
-                "Nombre Emisor": nombre_emisor,
-                "Total": total,
-            }
-
-            if "Lista Negra SAT (EFOS)" in reglas_activas: data["Val. EFOS"] = validar_efos(rfc_emisor, blacklist_set)
-            if "Timbrado Real (SAT)" in reglas_activas: data["Val. Timbrado"] = validar_timbrado(tfd_node)
-            if "Aritmética" in reglas_activas: data["Val. Aritmética"] = validar_aritmetica(subtotal, total_impuestos, total)
-            if "Sintaxis RFC" in reglas_activas: data["Val. RFC"] = validar_rfc_estructura(rfc_emisor)
-            if "Moneda y Cambio" in reglas_activas: data["Val. Divisa"] = validar_moneda_cambio(moneda, tipo_cambio)
-            if "Lógica PUE/PPD" in reglas_activas: data["Val. Pago"] = validar_metodo_pago(metodo, forma)
-            if "Vigencia" in reglas_activas: data["Val. Fecha"] = validar_fecha_reciente(fecha)
-
-            return data, True
-        except Exception as e:
-            return {"Error": str(e)}, False
+            # Sin almacen (base bloqueada o sin permisos) se audita todo
+            almacen = AlmacenAuditorias()
+        except (sqlite3.Error, OSError):
+            almacen = None
+        try:
+            with medicion.activa():
+                def progreso(hechos):
+                    trabajo.reportar(hechos / len(entradas), hechos=hechos, total=len(entradas))
+
+                all_data = [parsed_data for _, parsed_data, success
+                            in auditar_xmls(con_huella(entradas), reglas_activas, blacklist_set, progreso=progreso,
+                                            total=len(entradas), almacen=almacen)
+                            if success]
+
+                if all_data and almacen is not None:
+                    # El mismo UUID con otro contenido en auditorias anteriores: factura repetida o alterada
+                    with etapa("almacen"):
+                        for uuid in {d["UUID"] for d in all_data if d.get("UUID") not in (None, "SIN TIMBRE")}:
+                            otras = [h for h in almacen.por_uuid(uuid) if h not in huellas]
+                            if otras:
+                                anteriores[uuid] = len(otras)
+
+                if all_data:
+                    with etapa("exportar", len(all_data)):
+                        df = pd.DataFrame(all_data)
+                        output = BytesIO()
+                        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+                            df.to_excel(writer, index=False)
+                            workbook = writer.book
+                            worksheet = writer.sheets['Sheet1']
+                            red_fmt = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})
+                            if len(df) > 0:
+                                 worksheet.conditional_format(1, 0, len(df), len(df.columns)-1,
+                                    {'type': 'text', 'criteria': 'containing', 'value': 'ALERTA', 'format': red_fmt})
+                        excel = output.getvalue()
+        finally:
+            if almacen is not None:
+                almacen.cerrar()
+            medicion.escribir_jsonl()
+        return df, excel, medicion.registro(), anteriores
 
     # --- SIDEBAR: PERFIL DE USUARIO ---
     with st.sidebar:
@@ -268,6 +239,7 @@ else:
         st.divider()
         if st.button("Cerrar Sesión"):
             logout()
+        debug = st.toggle("🔧 Panel de debug")
 
     # --- MAIN CONTENT ---
     st.title("🛡️ Auditor Fiscal PRO")
@@ -284,16 +256,14 @@ else:
     
     with col1:
         st.subheader("1. Cargar Archivos")
-        uploaded_files = st.file_uploader("Selecciona tus XMLs", type=["xml"], accept_multiple_files=True)
+        uploaded_files = st.file_uploader("Selecciona tus XMLs o ZIP del SAT", type=["xml", "zip"],
+                                          accept_multiple_files=True)
         st.write("")
         ejecutar = st.button("EJECUTAR AUDITORÍA", type="primary")
     
     with col2:
         st.subheader("2. Reglas de Validación")
-        opciones = [
-            "Lista Negra SAT (EFOS)", "Timbrado Real (SAT)", "Aritmética", 
-            "Sintaxis RFC", "Moneda y Cambio", "Lógica PUE/PPD", "Vigencia"
-        ]
+        opciones = REGLAS
         reglas_seleccionadas = []
         cols_checks = st.columns(2)
         for i, opcion in enumerate(opciones):
@@ -303,8 +273,15 @@ else:
 
     # --- EJECUCIÓN (CON LÍMITES) ---
     if ejecutar:
-        if not uploaded_files:
-            st.warning("⚠️ Carga al menos un archivo XML.")
+        # Los ZIP solo se abren (su indice); cada XML se descomprime cuando se audita
+        entradas = []
+        for archivo in uploaded_files or []:
+            try:
+                entradas += entradas_xml([archivo])
+            except zipfile.BadZipFile:
+                st.warning(f"⚠️ {archivo.name} no es un ZIP válido; se omitió.")
+        if not entradas:
+            st.warning("⚠️ Carga al menos un archivo XML (o un ZIP con XMLs).")
         else:
             # --- DEFINICIÓN DE LÍMITES ---
             limite = float('inf') # Por defecto infinito
@@ -314,60 +291,115 @@ else:
                 limite = 20
             
             # --- APLICACIÓN DEL LÍMITE ---
-            archivos_a_procesar = uploaded_files
-            if len(uploaded_files) > limite:
-                archivos_a_procesar = uploaded_files[:limite]
-                st.warning(f"⚠️ **LÍMITE DE PLAN {PLAN}:** Subiste {len(uploaded_files)} archivos, pero solo se procesarán los primeros {limite}.")
-
-            with st.spinner("Procesando..."):
-                all_data = []
-                for file in archivos_a_procesar:
-                    parsed_data, success = parse_cfdi(file, reglas_seleccionadas, EFOS_SET)
-                    if success:
-                        parsed_data["Archivo"] = file.name
-                        all_data.append(parsed_data)
-            
-            if all_data:
-                df = pd.DataFrame(all_data)
-                
-                st.divider()
-                st.subheader("📊 Resultados")
-                
-                m1, m2, m3, m4 = st.columns(4)
-                m1.metric("Procesados", len(df))
-                m2.metric("Monto Total", f"${df['Total'].sum():,.2f}")
-                
-                if "Val. EFOS" in df.columns:
-                    num_efos = df[df["Val. EFOS"].str.contains("ALERTA", na=False)].shape[0]
-                    m3.metric("EFOS Detectados", num_efos)
+            archivos_a_procesar = entradas
+            if len(entradas) > limite:
+                archivos_a_procesar = entradas[:limite]
+                st.warning(f"⚠️ **LÍMITE DE PLAN {PLAN}:** Subiste {len(entradas)} archivos, pero solo se procesarán los primeros {limite}.")
+
+            # La auditoria corre en la cola del servidor; si esta llena, se avisa en vez de saturar
+            anterior = st.session_state.pop('trabajo_xml', None)
+            if anterior is not None and (trabajo := cola_trabajos().obtener(anterior)) is not None:
+                trabajo.cancelar()
+            st.session_state.pop('auditoria', None)
+            # Los XML de un ZIP se leen de a un lote: cuenta el ZIP (ya en memoria), no lo descomprimido
+            bytes_entrada = sum(f.size for f in uploaded_files)
+            memoria = bytes_entrada * FACTOR_MEMORIA_XML
+            try:
+                trabajo = cola_trabajos().enviar(auditar, archivos_a_procesar, list(reglas_seleccionadas),
+                                                 EFOS_SET, bytes_entrada, memoria=memoria)
+                st.session_state['trabajo_xml'] = trabajo.id
+            except ColaLlena:
+                st.warning("⏳ El servidor está ocupado y la cola está llena. Intenta de nuevo en unos minutos.")
+
+    # --- SEGUIMIENTO DEL TRABAJO ---
+    if 'trabajo_xml' in st.session_state:
+        trabajo = cola_trabajos().obtener(st.session_state['trabajo_xml'])
+        if trabajo is not None and trabajo.activo:
+            if st.button("✖️ Cancelar auditoría"):
+                trabajo.cancelar()
+            barra = st.progress(0.0, text="Procesando...")
+            while trabajo.activo:
+                if trabajo.estado == "en_cola":
+                    texto = f"⏳ En cola: {cola_trabajos().posicion(trabajo)} trabajo(s) antes que el tuyo"
                 else:
-                    m3.metric("EFOS", "N/A")
-
-                if "Val. Aritmética" in df.columns:
-                    num_math = df[df["Val. Aritmética"].str.contains("⚠️", na=False)].shape[0]
-                    m4.metric("Errores Aritméticos", num_math)
-
-                def highlight_issues(val):
-                    s_val = str(val)
-                    if "ALERTA" in s_val: return 'background-color: #fee2e2; color: #991b1b; font-weight: bold;'
-                    if "⛔" in s_val: return 'background-color: #fecaca; color: #7f1d1d;' 
-                    if "⚠️" in s_val: return 'background-color: #fef9c3; color: #854d0e;'
-                    return ''
-
-                cols_val = [c for c in df.columns if "Val." in c]
-                st.dataframe(df.style.applymap(highlight_issues, subset=cols_val), use_container_width=True, height=500)
-                
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    df.to_excel(writer, index=False)
-                    workbook = writer.book
-                    worksheet = writer.sheets['Sheet1']
-                    red_fmt = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})
-                    if len(df) > 0:
-                         worksheet.conditional_format(1, 0, len(df), len(df.columns)-1,
-                            {'type': 'text', 'criteria': 'containing', 'value': 'ALERTA', 'format': red_fmt})
-
-                st.download_button("📥 Descargar Excel", output.getvalue(), "Auditoria_Fiscal.xlsx", type="primary")
+                    texto = "Procesando... {hechos}/{total} XML".format(**trabajo.datos) if trabajo.datos else "Procesando..."
+                barra.progress(trabajo.progreso, text=texto)
+                time.sleep(INTERVALO_PROGRESO)
+            barra.empty()
+        del st.session_state['trabajo_xml']
+        if trabajo is None:
+            st.warning("⚠️ La auditoría se perdió (el servidor se reinició). Vuelve a ejecutarla.")
+        else:
+            cola_trabajos().retirar(trabajo.id)
+            if trabajo.estado == "cancelado":
+                st.warning("Auditoría cancelada.")
+            elif trabajo.estado == "error":
+                st.error(f"Error: {trabajo.error}")
+            else:
+                st.session_state['auditoria'] = trabajo.resultado
+
+    # --- PANEL DE DEBUG ---
+    if debug:
+        with st.sidebar.expander("🔧 Panel de debug", expanded=True):
+            if not st.session_state.get('auditoria'):
+                st.caption("Ejecuta una auditoría para ver el tiempo, XML/s y memoria de cada etapa.")
+            else:
+                metricas = st.session_state['auditoria'][2]
+                st.caption(f"Corrida {metricas['corrida']}: {metricas['segundos']:.2f} s, "
+                           f"RSS pico del proceso {metricas['rss_pico_proceso_mb']:,.0f} MB")
+                if "del_almacen" in metricas:
+                    st.caption(f"Del almacen de auditorías: {metricas['del_almacen']:,} de {metricas['archivos']:,} XML")
+                st.dataframe(metricas["etapas"], hide_index=True)
+            cola = cola_trabajos().estadisticas()
+            st.caption(f"Cola: {cola['corriendo']} corriendo, {cola['en_cola']} en espera, {cola['workers']} workers")
+
+    # --- RESULTADOS ---
+    if st.session_state.get('auditoria'):
+        df, excel, metricas, anteriores = st.session_state['auditoria']
+        if df is not None:
+            st.divider()
+            st.subheader("📊 Resultados")
+
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Procesados", len(df))
+            m2.metric("Monto Total", f"${df['Total'].sum():,.2f}")
+
+            if "Val. EFOS" in df.columns:
+                num_efos = df[df["Val. EFOS"].str.contains("ALERTA", na=False)].shape[0]
+                m3.metric("EFOS Detectados", num_efos)
+            else:
+                m3.metric("EFOS", "N/A")
+
+            if "Val. Aritmética" in df.columns:
+                num_math = df[df["Val. Aritmética"].str.contains("⚠️", na=False)].shape[0]
+                m4.metric("Errores Aritméticos", num_math)
+
+            # Mismo UUID en varios archivos: la misma factura subida dos veces (o un XML alterado)
+            timbrados = df[df["UUID"] != "SIN TIMBRE"]
+            repetidos = timbrados[timbrados["UUID"].duplicated(keep=False)]
+            if not repetidos.empty:
+                st.warning(f"⚠️ {repetidos['UUID'].nunique()} UUID aparecen en más de un archivo "
+                           f"({len(repetidos)} archivos).")
+                st.dataframe(repetidos.sort_values("UUID")[["UUID", "Archivo", "RFC Emisor", "Total"]],
+                             hide_index=True)
+            if anteriores:
+                st.warning(f"⚠️ {len(anteriores)} UUID ya se auditaron antes con otro XML "
+                           f"(la factura se está volviendo a subir o el XML cambió).")
+                vistos = df[df["UUID"].isin(anteriores)][["UUID", "Archivo", "RFC Emisor", "Total"]]
+                st.dataframe(vistos.assign(**{"XML anteriores": vistos["UUID"].map(anteriores)}).sort_values("UUID"),
+                             hide_index=True)
+
+            def highlight_issues(val):
+                s_val = str(val)
+                if "ALERTA" in s_val: return 'background-color: #fee2e2; color: #991b1b; font-weight: bold;'
+                if "⛔" in s_val: return 'background-color: #fecaca; color: #7f1d1d;' 
+                if "⚠️" in s_val: return 'background-color: #fef9c3; color: #854d0e;'
+                return ''
+
+            cols_val = [c for c in df.columns if "Val." in c]
+            st.dataframe(df.style.applymap(highlight_issues, subset=cols_val), use_container_width=True, height=500)
+
+            st.download_button("📥 Descargar Excel", excel, "Auditoria_Fiscal.xlsx", type="primary")
 
     # --- FOOTER ---
     st.write("")
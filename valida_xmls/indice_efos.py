@@ -0,0 +1,233 @@
+"""
+Indice compilado de la lista negra del SAT (EFOS) para el Auditor Fiscal.
+
+Leer lista_negra_sat.csv con pandas en cada proceso nuevo del servidor era
+lo mas lento del arranque. Aqui el CSV se compila una vez a un arreglo
+ordenado de RFC (bytes de ancho fijo) guardado como .npy:
+
+- Arranque en milisegundos: el arreglo se abre con np.load(mmap_mode="r");
+  la pertenencia es una busqueda binaria. Varios procesos (los workers del
+  pool de motor_cfdi) comparten las mismas paginas de solo lectura; al
+  enviarse a un proceso solo viaja la ruta del archivo.
+- Se recompila solo si cambia el CSV: primero se compara tamaño y fecha de
+  modificacion; si cambiaron, el SHA256 del contenido (un CSV copiado o
+  tocado pero igual no se recompila).
+- Actualizacion: cuando el SAT publica un listado nuevo basta reemplazar el
+  CSV; la siguiente carga lo compila y efos.json registra cuantas altas y
+  bajas trajo respecto a la version anterior.
+
+Cada version se escribe en un archivo nuevo (efos_<firma>.npy) y efos.json
+apunta a la vigente, reemplazado de forma atomica: un proceso que tenga
+mapeada la version anterior la sigue leyendo sin problema.
+"""
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se protege entre hilos del mismo proceso
+    fcntl = None
+
+CARPETA_POR_DEFECTO = os.environ.get("AUDITOR_EFOS_DIR", os.path.join(os.path.expanduser("~"), ".auditor_efos"))
+# Filas del inicio del CSV donde se busca el encabezado (el listado del SAT trae titulos antes)
+FILAS_ENCABEZADO = 10
+# Versiones anteriores que se conservan en disco (las puede tener abiertas otro proceso)
+VERSIONES_GUARDADAS = 2
+
+class ListaEFOS:
+    """
+    RFC de la lista negra, ordenados y mapeados en memoria. Se usa como un
+    set de solo lectura: `rfc in lista`, len(lista), bool(lista).
+    """
+
+    def __init__(self, ruta, firma=None):
+        self.ruta = ruta
+        self.firma = firma or os.path.basename(ruta)
+        self._rfcs = np.load(ruta, mmap_mode="r")
+        # Una lista vacia no se puede mapear en memoria; cargarla no cuesta nada
+        if not self._rfcs.size:
+            self._rfcs = np.load(ruta)
+
+    def __len__(self):
+        return len(self._rfcs)
+
+    def __contains__(self, rfc):
+        if not isinstance(rfc, str) or not len(self._rfcs):
+            return False
+        clave = rfc.encode()
+        posicion = np.searchsorted(self._rfcs, clave)
+        return bool(posicion < len(self._rfcs) and self._rfcs[posicion] == clave)
+
+    def rfcs(self):
+        """Todos los RFC como lista de textos (para revisiones, no para consultas)"""
+        return [r.decode() for r in self._rfcs]
+
+    def __getstate__(self):
+        # A otro proceso solo viaja la ruta: alla se vuelve a mapear el mismo archivo
+        return {"ruta": self.ruta, "firma": self.firma}
+
+    def __setstate__(self, estado):
+        self.__init__(estado["ruta"], estado["firma"])
+
+def leer_rfcs_csv(ruta):
+    """
+    RFC con situacion "Definitivo" del listado del SAT (latin-1), en una sola
+    pasada: el encabezado es la primera fila con una columna RFC y una de
+    SITUACION. Lanza ValueError si no la encuentra.
+    """
+    with open(ruta, encoding="latin-1", newline="") as archivo:
+        filas = csv.reader(archivo)
+        for _, encabezado in zip(range(FILAS_ENCABEZADO), filas):
+            columnas = [c.strip().upper() for c in encabezado]
+            col_rfc = next((i for i, c in enumerate(columnas) if "RFC" in c), None)
+            col_sit = next((i for i, c in enumerate(columnas) if "SITUACI" in c), None)
+            if col_rfc is not None and col_sit is not None:
+                break
+        else:
+            raise ValueError("Formato CSV inválido")
+        rfcs = set()
+        for fila in filas:
+            if len(fila) > max(col_rfc, col_sit) and "definitivo" in fila[col_sit].lower():
+                rfc = fila[col_rfc].strip().upper()
+                if rfc:
+                    rfcs.add(rfc)
+    return rfcs
+
+def _arreglo(rfcs):
+    """RFC como arreglo ordenado de bytes de ancho fijo"""
+    claves = sorted({r.encode() for r in rfcs})
+    return np.array(claves, dtype=f"S{max(map(len, claves), default=1)}")
+
+def _sha256(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+class IndiceEFOS:
+    """Version compilada vigente de la lista negra en `carpeta`, con su metadata en efos.json"""
+
+    def __init__(self, carpeta=CARPETA_POR_DEFECTO):
+        os.makedirs(carpeta, exist_ok=True)
+        self.carpeta = carpeta
+        self._lock = threading.Lock()
+        self._archivo_lock = open(os.path.join(carpeta, "efos.lock"), "a")
+        self._abiertas = {}
+
+    @contextlib.contextmanager
+    def _bloqueo(self):
+        """Exclusion entre hilos y, con fcntl, entre procesos (dos servidores compilando a la vez)"""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._archivo_lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._archivo_lock, fcntl.LOCK_UN)
+
+    def _ruta(self, nombre):
+        return os.path.join(self.carpeta, nombre)
+
+    def estado(self):
+        """Contenido de efos.json (fuente, firma, RFC, ultimos cambios), o None si no hay indice"""
+        try:
+            with open(self._ruta("efos.json")) as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_estado(self, estado):
+        temporal = self._ruta("efos.json.tmp")
+        with open(temporal, "w") as archivo:
+            json.dump(estado, archivo)
+        os.replace(temporal, self._ruta("efos.json"))
+
+    def _abrir(self, estado):
+        """ListaEFOS de la version del estado; abierta una sola vez por proceso"""
+        firma = estado["firma"]
+        if firma not in self._abiertas:
+            self._abiertas = {firma: ListaEFOS(self._ruta(f"efos_{firma}.npy"), firma)}
+        return self._abiertas[firma]
+
+    def _publicar(self, rfcs, estado):
+        """Escribe una version nueva (si cambio el contenido) y la marca como vigente"""
+        arreglo = _arreglo(rfcs)
+        firma = hashlib.sha256(arreglo.dtype.str.encode() + arreglo.tobytes()).hexdigest()[:16]
+        ruta = self._ruta(f"efos_{firma}.npy")
+        if not os.path.exists(ruta):
+            temporal = self._ruta(f"efos_{firma}.tmp.npy")
+            np.save(temporal, arreglo)
+            os.replace(temporal, ruta)
+        anteriores = (self.estado() or {}).get("versiones", [])
+        versiones = [firma] + [f for f in anteriores if f != firma]
+        estado.update(firma=firma, rfcs=len(arreglo), versiones=versiones[:VERSIONES_GUARDADAS + 1])
+        self._guardar_estado(estado)
+        for vieja in versiones[VERSIONES_GUARDADAS + 1:]:
+            with contextlib.suppress(OSError):
+                os.remove(self._ruta(f"efos_{vieja}.npy"))
+        return self._abrir(estado)
+
+    def cargar(self, ruta_csv):
+        """
+        ListaEFOS compilada del CSV. Si el indice ya corresponde al CSV (mismo
+        tamaño y fecha, o mismo SHA256) se abre tal cual; si no, se recompila
+        y el estado registra cuantas altas y bajas trajo respecto a la anterior.
+        Lanza OSError si el CSV no existe y ValueError si no tiene el formato.
+        """
+        info = os.stat(ruta_csv)
+        fuente = {"ruta": os.path.abspath(ruta_csv), "bytes": info.st_size, "modificado": info.st_mtime_ns}
+        estado = self.estado()
+        if estado and estado.get("fuente") == fuente:
+            return self._abrir(estado)
+        with self._bloqueo():
+            estado = self.estado()
+            # Otro proceso pudo compilarlo mientras se esperaba el lock
+            if estado and estado.get("fuente") == fuente:
+                return self._abrir(estado)
+            sha256 = _sha256(ruta_csv)
+            if estado and estado.get("sha256") == sha256:
+                estado["fuente"] = fuente
+                self._guardar_estado(estado)
+                return self._abrir(estado)
+            rfcs = leer_rfcs_csv(ruta_csv)
+            nuevo = {"fuente": fuente, "sha256": sha256}
+            if estado:
+                anteriores = set(self._abrir(estado).rfcs())
+                nuevo.update(altas=len(rfcs - anteriores), bajas=len(anteriores - rfcs))
+            return self._publicar(rfcs, nuevo)
+
+    def cerrar(self):
+        with self._lock:
+            self._abiertas.clear()
+            self._archivo_lock.close()
+
+_indices = {}
+
+def indice_por_defecto(carpeta=CARPETA_POR_DEFECTO):
+    """Un IndiceEFOS por carpeta, reutilizado en todo el proceso"""
+    if carpeta not in _indices:
+        _indices[carpeta] = IndiceEFOS(carpeta)
+    return _indices[carpeta]
+
+def cargar_lista_negra(ruta_csv, indice=None):
+    """
+    (lista, activa, mensaje) como los mostraba el auditor: la ListaEFOS
+    compilada de `ruta_csv`, o un set vacio con el motivo si no se pudo.
+    """
+    if not os.path.exists(ruta_csv):
+        return set(), False, "Base de datos SAT no encontrada"
+    try:
+        lista = (indice or indice_por_defecto()).cargar(ruta_csv)
+    except ValueError as e:
+        return set(), False, str(e)
+    except Exception as e:
+        return set(), False, f"Error: {str(e)}"
+    return lista, True, f"Base SAT Activa: {len(lista):,} empresas"
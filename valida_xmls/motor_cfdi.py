@@ -0,0 +1,456 @@
+"""
+Motor de auditoria de CFDI del Auditor Fiscal: lectura de cada XML y sus
+validaciones, sin Streamlit (lo usan la app y los benchmarks).
+
+auditar_xmls() reparte los XML en lotes sobre un pool de procesos. Las
+reglas activas y la lista negra viajan una sola vez a cada proceso (en el
+inicializador del pool), no con cada archivo. El pool se reutiliza entre
+llamadas con las mismas reglas y la misma lista negra: levantar procesos
+spawn cuesta segundos en cada auditoria. Los resultados salen en el
+orden de entrada y el avance se informa con un callback. Con pocos archivos
+o un solo worker se procesa en el mismo proceso: levantar el pool no
+compensa.
+
+Cada XML se lee con extraer_cfdi(): recorre los eventos del parser (expat,
+el mismo que usa ElementTree) y guarda solo los atributos que se validan,
+sin construir el arbol: los Conceptos, que pueden ser miles, solo se
+recorren.
+
+Los ZIP (las descargas masivas del portal del SAT) no se extraen a disco:
+entradas_xml() lista sus miembros XML y cada uno se descomprime en memoria
+justo cuando su lote se va a auditar.
+
+Con un AlmacenAuditorias (almacen_auditorias.py), los XML que ya se
+auditaron con las mismas reglas y la misma lista negra no se vuelven a leer:
+su resultado sale del almacen por el SHA256 del contenido.
+"""
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from xml.parsers import expat
+
+# La instrumentacion es la misma de AdData Cleaner (carpeta superior)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache_resultados import huella_contenido
+from instrumentacion import Medicion, etapa, medicion_activa
+
+from almacen_auditorias import contexto_auditoria, firma_lista
+
+REGLAS = [
+    "Lista Negra SAT (EFOS)", "Timbrado Real (SAT)", "Aritmética",
+    "Sintaxis RFC", "Moneda y Cambio", "Lógica PUE/PPD", "Vigencia"
+]
+
+# Por debajo de este numero de XML no vale la pena levantar el pool
+UMBRAL_PARALELO = 500
+# XML por tarea enviada a un worker: pocos viajes entre procesos y avance frecuente
+XML_POR_LOTE = 200
+# Lotes enviados y aun sin recoger, por worker (acota la memoria de lo pendiente)
+LOTES_EN_VUELO = 2
+# Pools vivos (reglas o lista negra distintas); el mas viejo se cierra al pasar el limite
+MAX_POOLS = 2
+# Un miembro de ZIP mas grande que esto no es una factura (o es una bomba de compresion): se salta
+MAX_BYTES_XML_ZIP = 50 * 1024 * 1024
+
+def workers_por_defecto():
+    """Workers configurados en AUDITOR_WORKERS o, si no, todos los nucleos"""
+    return int(os.environ.get("AUDITOR_WORKERS", 0)) or os.cpu_count() or 1
+
+# --- VALIDACIONES ---
+def validar_efos(rfc, blacklist):
+    if not blacklist: return "❓ No verificado"
+    if rfc in blacklist: return "⛔ ALERTA EFO"
+    return "✅ Limpio"
+
+def validar_timbrado(nodo_tfd):
+    if nodo_tfd is None: return "⛔ NO TIMBRADO"
+    if not nodo_tfd.get("UUID"): return "⛔ Sin UUID"
+    return "✅ Timbrado OK"
+
+def validar_aritmetica(subtotal, impuestos, total):
+    calculado = subtotal + impuestos
+    diff = abs(calculado - total)
+    return "✅ OK" if diff < 1.0 else f"⚠️ Descuadre (${diff:.2f})"
+
+def validar_rfc_estructura(rfc):
+    if not rfc: return "⚠️ RFC Vacío"
+    rfc = rfc.upper().strip()
+    patron = r"^[A-Z&Ñ]{3,4}\d{6}[A-V1-9][A-Z1-9]\d$"
+    if not re.match(patron, rfc): return f"⚠️ Inválido ({len(rfc)})"
+    return "✅ OK"
+
+def validar_moneda_cambio(moneda, tipo_cambio):
+    moneda = moneda.upper()
+    try: tc = float(tipo_cambio) if tipo_cambio else 1.0
+    except: return "⚠️ TC Error"
+    if moneda == "MXN" and tc != 1.0: return f"⚠️ MXN con TC {tc}"
+    if moneda != "MXN" and (not tipo_cambio or tc == 1.0): return f"⚠️ {moneda} TC dudoso"
+    return "✅ OK"
+
+def validar_metodo_pago(metodo, forma_pago):
+    if metodo == "PPD" and forma_pago != "99": return "⚠️ PPD error"
+    if metodo == "PUE" and forma_pago == "99": return "⚠️ PUE error"
+    return "✅ OK"
+
+def validar_fecha_reciente(fecha_str):
+    try:
+        fecha_dt = datetime.strptime(fecha_str[:10], "%Y-%m-%d")
+        dias = (datetime.now() - fecha_dt).days
+        return "⚠️ >1 año" if dias > 365 else "✅ OK"
+    except: return "⚠️ Fecha Error"
+
+# --- LECTURA DE UN CFDI ---
+# Nombres de elemento como los entrega expat con namespace_separator=" ": "<namespace> <nombre>"
+NS_CFDI = "http://www.sat.gob.mx/cfd/4"
+NS_TFD = "http://www.sat.gob.mx/TimbreFiscalDigital"
+EMISOR = f"{NS_CFDI} Emisor"
+IMPUESTOS = f"{NS_CFDI} Impuestos"
+TRASLADO = f"{NS_CFDI} Traslado"
+CONCEPTOS = f"{NS_CFDI} Conceptos"
+COMPLEMENTO = f"{NS_CFDI} Complemento"
+TIMBRE = f"{NS_TFD} TimbreFiscalDigital"
+
+def extraer_cfdi(fuente):
+    """
+    Atributos que usa la auditoria de un XML (bytes o archivo), sin armar el arbol:
+    {"raiz", "emisor", "impuestos", "timbre"} (dicts de atributos; None si el nodo
+    no esta) y "traslados" (Importe de cada Traslado dentro de los Impuestos del
+    comprobante). Como root.find(), toma el primer Emisor, Impuestos y Complemento
+    hijos directos de la raiz y el primer timbre hijo directo de ese Complemento.
+    Un XML mal formado lanza expat.ExpatError (el mismo mensaje que ET.ParseError).
+    Los Conceptos se saltan sin seguir su profundidad: se asume que, como pide el
+    esquema del SAT, no llevan otro cfdi:Conceptos adentro.
+    """
+    datos = {"raiz": None, "emisor": None, "impuestos": None, "timbre": None, "traslados": []}
+    profundidad = 0
+    # Impuestos y Complemento del comprobante: 0 = aun no, 1 = abierto, 2 = ya cerrado
+    impuestos = complemento = 0
+
+    def inicio(nombre, atributos):
+        nonlocal profundidad, impuestos, complemento
+        profundidad += 1
+        if profundidad == 1:
+            datos["raiz"] = atributos
+        elif profundidad == 2:
+            if nombre == EMISOR and datos["emisor"] is None:
+                datos["emisor"] = atributos
+            elif nombre == IMPUESTOS and not impuestos:
+                datos["impuestos"] = atributos
+                impuestos = 1
+            elif nombre == COMPLEMENTO and not complemento:
+                complemento = 1
+            elif nombre == CONCEPTOS:
+                # Dentro de los Conceptos no hay nada que leer: sin handler de inicio, expat solo
+                # avisa los cierres, y sin armar el dict de atributos, hasta cerrar los Conceptos
+                parser.StartElementHandler = None
+                parser.EndElementHandler = fin_conceptos
+        elif impuestos == 1:
+            if nombre == TRASLADO:
+                datos["traslados"].append(atributos.get("Importe", 0))
+        elif complemento == 1 and profundidad == 3 and nombre == TIMBRE and datos["timbre"] is None:
+            datos["timbre"] = atributos
+
+    def fin(nombre):
+        nonlocal profundidad, impuestos, complemento
+        profundidad -= 1
+        if profundidad == 1:
+            # Se cerro un hijo de la raiz: si eran los Impuestos o el Complemento, ya no estan abiertos
+            impuestos = 2 if impuestos else 0
+            complemento = 2 if complemento else 0
+
+    def fin_conceptos(nombre):
+        nonlocal profundidad
+        if nombre == CONCEPTOS:
+            profundidad -= 1
+            parser.StartElementHandler = inicio
+            parser.EndElementHandler = fin
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartElementHandler = inicio
+    parser.EndElementHandler = fin
+    if isinstance(fuente, (bytes, bytearray, memoryview)):
+        parser.Parse(fuente, True)
+    else:
+        parser.ParseFile(fuente)
+    return datos
+
+def parse_cfdi(file_content, reglas_activas, blacklist_set):
+    """(datos, True) de un XML (archivo o bytes) con las reglas activas, o ({"Error": ...}, False)"""
+    try:
+        with etapa("parsear", 1):
+            cfdi = extraer_cfdi(file_content)
+        root = cfdi["raiz"]
+
+        subtotal = float(root.get("SubTotal", 0))
+        total = float(root.get("Total", 0))
+        metodo = root.get("MetodoPago", "")
+        forma = root.get("FormaPago", "")
+        fecha = root.get("Fecha", "")
+        moneda = root.get("Moneda", "MXN")
+        tipo_cambio = root.get("TipoCambio", "")
+
+        emisor = cfdi["emisor"]
+        rfc_emisor = emisor.get("Rfc", "").upper().strip() if emisor is not None else ""
+        nombre_emisor = emisor.get("Nombre", "") if emisor is not None else ""
+
+        total_impuestos = 0.0
+        impuestos = cfdi["impuestos"]
+        if impuestos is not None:
+            traslados = impuestos.get("TotalImpuestosTrasladados")
+            if traslados: total_impuestos = float(traslados)
+            else:
+                for importe in cfdi["traslados"]:
+                    total_impuestos += float(importe)
+
+        tfd_node = cfdi["timbre"]
+
+        data = {
+            "Archivo": "...",
+            "UUID": tfd_node.get("UUID") if tfd_node is not None else "SIN TIMBRE",
+            "Fecha": fecha[:10],
+            "RFC Emisor": rfc_emisor,
+            "Nombre Emisor": nombre_emisor,
+            "Total": total,
+        }
+
+        with etapa("validar", 1):
+            if "Lista Negra SAT (EFOS)" in reglas_activas: data["Val. EFOS"] = validar_efos(rfc_emisor, blacklist_set)
+            if "Timbrado Real (SAT)" in reglas_activas: data["Val. Timbrado"] = validar_timbrado(tfd_node)
+            if "Aritmética" in reglas_activas: data["Val. Aritmética"] = validar_aritmetica(subtotal, total_impuestos, total)
+            if "Sintaxis RFC" in reglas_activas: data["Val. RFC"] = validar_rfc_estructura(rfc_emisor)
+            if "Moneda y Cambio" in reglas_activas: data["Val. Divisa"] = validar_moneda_cambio(moneda, tipo_cambio)
+            if "Lógica PUE/PPD" in reglas_activas: data["Val. Pago"] = validar_metodo_pago(metodo, forma)
+            if "Vigencia" in reglas_activas: data["Val. Fecha"] = validar_fecha_reciente(fecha)
+
+        return data, True
+    except Exception as e:
+        return {"Error": str(e)}, False
+
+# --- AUDITORIA DE UN CONJUNTO DE XML ---
+# Configuracion de cada worker del pool, fijada una vez por _inicializar_worker
+_reglas_worker = None
+_blacklist_worker = None
+
+def _inicializar_worker(reglas_activas, blacklist_set):
+    global _reglas_worker, _blacklist_worker
+    _reglas_worker = reglas_activas
+    _blacklist_worker = blacklist_set
+
+_pools = OrderedDict()
+_lock_pools = threading.Lock()
+
+def _clave_pool(workers, reglas_activas, blacklist_set):
+    return workers, tuple(sorted(reglas_activas)), firma_lista(blacklist_set)
+
+def _obtener_pool(clave, reglas_activas, blacklist_set):
+    """Pool con los workers ya inicializados para estas reglas y esta lista negra (LRU de MAX_POOLS)"""
+    with _lock_pools:
+        pool = _pools.get(clave)
+        if pool is not None:
+            _pools.move_to_end(clave)
+            return pool
+        # spawn: hacer fork de un servidor con hilos (Streamlit) no es seguro
+        pool = ProcessPoolExecutor(max_workers=clave[0], mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_inicializar_worker, initargs=(reglas_activas, blacklist_set))
+        _pools[clave] = pool
+        viejos = []
+        while len(_pools) > MAX_POOLS:
+            viejos.append(_pools.popitem(last=False)[1])
+    # Sin cancelar: otra sesion puede tener lotes en curso en el pool viejo
+    for viejo in viejos:
+        viejo.shutdown(wait=False)
+    return pool
+
+def _descartar_pool(clave, pool):
+    """Quita un pool roto (un worker murio) para que la siguiente llamada cree otro"""
+    with _lock_pools:
+        if _pools.get(clave) is pool:
+            del _pools[clave]
+    pool.shutdown(wait=False)
+
+def _auditar_lote(lote):
+    """En un worker: audita [(nombre, bytes)] y retorna (resultados, etapas medidas)"""
+    medicion = Medicion("lote_xml")
+    with medicion.activa():
+        resultados = [_resultado(nombre, contenido, _reglas_worker, _blacklist_worker) for nombre, contenido in lote]
+    return resultados, medicion.etapas
+
+def _resultado(nombre, contenido, reglas_activas, blacklist_set):
+    data, exito = parse_cfdi(contenido, reglas_activas, blacklist_set)
+    if exito:
+        data["Archivo"] = nombre
+    return nombre, data, exito
+
+def _lotes(archivos, tamano):
+    lote = []
+    for archivo in archivos:
+        lote.append(archivo)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+# --- ENTRADAS: XML SUELTOS Y ZIP ---
+def es_xml_de_zip(info):
+    """Miembros de un ZIP que se auditan: archivos .xml de cualquier carpeta, sin metadatos de macOS"""
+    nombre = os.path.basename(info.filename)
+    return (not info.is_dir() and nombre.lower().endswith(".xml") and not nombre.startswith("._")
+            and not info.filename.startswith("__MACOSX/") and info.file_size <= MAX_BYTES_XML_ZIP)
+
+def _leer_miembro(archivo_zip, info):
+    return lambda: archivo_zip.read(info)
+
+def entradas_xml(archivos):
+    """
+    (nombre, leer) por cada XML de los archivos subidos (objetos con .name y
+    .getvalue(), como los de st.file_uploader): los .xml tal cual y los
+    miembros XML de cada .zip, como "<zip>/<ruta del miembro>". leer() retorna
+    el contenido en bytes; de un ZIP se descomprime al llamarlo, no antes.
+    Carpetas, otros archivos y ZIP dentro del ZIP se saltan. Un .zip dañado
+    lanza zipfile.BadZipFile.
+    """
+    entradas = []
+    for archivo in archivos:
+        if not archivo.name.lower().endswith(".zip"):
+            entradas.append((archivo.name, archivo.getvalue))
+            continue
+        # Solo se lee el directorio central; el ZIP queda abierto hasta leer su ultimo miembro
+        archivo_zip = zipfile.ZipFile(archivo)
+        entradas.extend((f"{archivo.name}/{info.filename}", _leer_miembro(archivo_zip, info))
+                        for info in archivo_zip.infolist() if es_xml_de_zip(info))
+    return entradas
+
+def contenidos(entradas):
+    """(nombre, bytes) de cada entrada de entradas_xml(), leyendo una a la vez"""
+    for nombre, leer in entradas:
+        yield nombre, leer()
+
+def _desde_almacen(nombre, guardado, reglas_activas):
+    """Resultado guardado de un XML con el nombre de esta entrada"""
+    datos, exito = guardado
+    if not exito:
+        return nombre, datos, exito
+    datos = {"Archivo": nombre, **datos}
+    # Lo unico que depende del dia en que se audita: se recalcula con la fecha guardada
+    if "Vigencia" in reglas_activas:
+        datos["Val. Fecha"] = validar_fecha_reciente(datos["Fecha"])
+    return nombre, datos, exito
+
+def auditar_xmls(archivos, reglas_activas, blacklist_set, workers=None, progreso=None, total=None, almacen=None):
+    """
+    Audita (nombre, contenido en bytes) de cada XML y genera (nombre, datos,
+    exito) en el mismo orden de entrada. `progreso(hechos)` se llama al
+    terminar cada lote; si lanza una excepcion (p. ej. una cancelacion), la
+    auditoria se corta y los lotes pendientes se descartan.
+
+    `archivos` puede ser cualquier iterable: se consume por lotes, asi la
+    memoria no depende del numero de archivos; `total` (o len(archivos))
+    decide si conviene el pool. Las etapas de los workers se suman a la
+    Medicion activa.
+
+    Con `almacen` (AlmacenAuditorias), los XML ya auditados con las mismas
+    reglas y la misma lista negra salen de ahi sin parsearse (la Medicion
+    cuenta cuantos en "del_almacen") y los nuevos se guardan.
+    """
+    workers = workers or workers_por_defecto()
+    if total is None and hasattr(archivos, "__len__"):
+        total = len(archivos)
+    if total is not None and total < UMBRAL_PARALELO:
+        workers = 1
+    reglas_activas = list(reglas_activas)
+    medicion = medicion_activa()
+    if almacen is not None:
+        contexto, descripcion = contexto_auditoria(reglas_activas, blacklist_set)
+        almacen.usar_contexto(contexto, descripcion)
+        if medicion is not None:
+            medicion.contexto.setdefault("del_almacen", 0)
+
+    if workers > 1:
+        clave_pool = _clave_pool(workers, reglas_activas, blacklist_set)
+        pool = _obtener_pool(clave_pool, reglas_activas, blacklist_set)
+
+        def enviar(lote):
+            nonlocal pool
+            try:
+                return pool.submit(_auditar_lote, lote)
+            except BrokenProcessPool:
+                raise
+            except RuntimeError:
+                # Otra llamada lo cerro al pasar MAX_POOLS: se sigue en uno nuevo
+                pool = _obtener_pool(clave_pool, reglas_activas, blacklist_set)
+                return pool.submit(_auditar_lote, lote)
+    else:
+        pool = None
+
+        def enviar(lote):
+            # En este proceso las etapas ya se miden en la Medicion activa
+            futuro = Future()
+            futuro.set_result(([_resultado(nombre, contenido, reglas_activas, blacklist_set)
+                                for nombre, contenido in lote], {}))
+            return futuro
+
+    def preparar(lote):
+        """(lote, huellas, resultados guardados, futuro de los que faltan)"""
+        huellas, guardados, faltan = None, {}, lote
+        if almacen is not None:
+            with etapa("almacen", len(lote)):
+                huellas = [huella_contenido(contenido) for _, contenido in lote]
+                guardados = almacen.buscar(huellas, contexto)
+            faltan = [entrada for entrada, huella in zip(lote, huellas) if huella not in guardados]
+        return lote, huellas, guardados, enviar(faltan) if faltan else None
+
+    pendientes = deque()
+    hechos = 0
+    try:
+        lotes = _lotes(archivos, XML_POR_LOTE)
+        # Los lotes se recogen en el orden en que se enviaron: el orden de salida es el de entrada
+        while True:
+            for lote in lotes:
+                pendientes.append(preparar(lote))
+                if len(pendientes) >= LOTES_EN_VUELO * workers:
+                    break
+            if not pendientes:
+                break
+            lote, huellas, guardados, futuro = pendientes.popleft()
+            nuevos = []
+            if futuro is not None:
+                nuevos, etapas = futuro.result()
+                if medicion is not None:
+                    medicion.combinar(etapas)
+            if almacen is None:
+                yield from nuevos
+            else:
+                resultados, por_guardar = [], []
+                nuevos = iter(nuevos)
+                for (nombre, _), huella in zip(lote, huellas):
+                    if huella in guardados:
+                        resultados.append(_desde_almacen(nombre, guardados[huella], reglas_activas))
+                        continue
+                    resultado = next(nuevos)
+                    resultados.append(resultado)
+                    datos = {k: v for k, v in resultado[1].items() if k != "Archivo"}
+                    por_guardar.append((huella, datos, resultado[2]))
+                with etapa("almacen"):
+                    almacen.guardar(por_guardar, contexto)
+                if medicion is not None:
+                    medicion.contexto["del_almacen"] += len(lote) - len(por_guardar)
+                yield from resultados
+            hechos += len(lote)
+            if progreso is not None:
+                progreso(hechos)
+    except BrokenProcessPool:
+        _descartar_pool(clave_pool, pool)
+        raise
+    finally:
+        # El pool sigue vivo para la siguiente llamada: solo se descartan los lotes propios pendientes
+        for *_, futuro in pendientes:
+            if futuro is not None:
+                futuro.cancel()